@@ -1,23 +1,50 @@
 # api/api_handler.py
+import time
 import requests
-from requests.exceptions import HTTPError
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from requests.exceptions import HTTPError, ConnectionError, Timeout
 from utils.logger import setup_logging
 
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    import json
+    json_loads = json.loads
+
 logger = setup_logging(__name__)
 
 class APIHandler:
-    def __init__(self, base_url, auth=None):
+    def __init__(self, base_url, auth=None, pool_maxsize=10, rate_limiter=None, retry_policy=None, cache=None, metrics=None,
+                 token_provider=None):
         """
         Initialize the API Handler with a base URL and optional authentication details.
         
         :param base_url: str - The base URL for the API.
         :param auth: dict or tuple - A dictionary or tuple containing authentication details (optional).
+        :param pool_maxsize: int - Connections kept open per host; should be at least the number of concurrent callers.
+        :param rate_limiter: RateLimiter - Limiter consulted before every request (optional).
+        :param retry_policy: RetryPolicy - Backoff policy for retryable statuses and connection errors (optional).
+        :param cache: ResponseCache - Cache consulted before going to the network (optional).
+        :param metrics: RunMetrics - Collector of request counts, latencies and response sizes per endpoint (optional).
+        :param token_provider: TokenProvider - Supplies the auth token header of every request and a new token
+            after a 401, upon which the request is retried once (optional).
         """
         self.base_url = base_url
         self.auth = auth
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.cache = cache
+        self.metrics = metrics
+        self.token_provider = token_provider
         self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
 
-    def make_request(self, endpoint, method='GET', params=None, data=None, headers=None):
+    def make_request(self, endpoint, method='GET', params=None, data=None, headers=None, authenticate=True):
         """
         Make an API request to the specified endpoint using the given HTTP method.
         
@@ -26,21 +53,111 @@ class APIHandler:
         :param params: dict - Query parameters for the API call.
         :param data: dict - Data to be sent in the body of the request (for POST/PUT).
         :param headers: dict - HTTP headers to send with the request.
+        :param authenticate: bool - Send the token provider's auth header; False for the login itself.
         :return: dict - The parsed JSON response from the API, or None if an error occurred.
         """
+        if self.cache:
+            cached = self.cache.get(method, endpoint, params=params, data=data)
+            if cached is not None:
+                if self.metrics:
+                    self.metrics.inc('api_cache_hits_total', endpoint=endpoint)
+                return cached
+
         url = f"{self.base_url}/{endpoint}"
+        attempt = 0
+        start = time.perf_counter()
+        token = None
+        if self.token_provider is not None and authenticate:
+            token = self.token_provider.get_token()
+            headers = {**(headers or {}), self.token_provider.header: token}
+        while True:
+            if self.rate_limiter:
+                self.rate_limiter.acquire(url)
+            try:
+                response = self.session.request(method=method, url=url, headers=headers, params=params, json=data, auth=self.auth)
+                if response.status_code == 401 and token is not None:
+                    # The token expired or was revoked: log in again and retry once
+                    logger.warning(f"Received 401 from {url}, retrying once with a new auth token")
+                    self.token_provider.invalidate(token)
+                    token = None
+                    headers = {**headers, self.token_provider.header: self.token_provider.get_token()}
+                    continue
+                if self.retry_policy and self.retry_policy.should_retry(response.status_code, attempt):
+                    if self.rate_limiter and self.retry_policy.is_throttle(response.status_code):
+                        self.rate_limiter.on_throttle(url)
+                    delay = self.retry_policy.get_backoff(attempt, response.headers.get('Retry-After'))
+                    logger.warning(f"Received {response.status_code} from {url}, retrying in {delay:.2f}s (attempt {attempt + 1})")
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+                response.raise_for_status()
+                if self.rate_limiter:
+                    self.rate_limiter.on_success(url)
+                response_json = self.decode_json(response)
+                if self.cache:
+                    self.cache.set(method, endpoint, response_json, params=params, data=data)
+                self.record_request(endpoint, start, 'success', len(response.content))
+                return response_json
+            except HTTPError as http_err:
+                logger.error(f"HTTP error occurred: {http_err}")
+                self.record_request(endpoint, start, 'error')
+                return None
+            except (ConnectionError, Timeout) as conn_err:
+                if self.retry_policy and self.retry_policy.can_retry(attempt):
+                    delay = self.retry_policy.get_backoff(attempt)
+                    logger.warning(f"Connection error for {url}: {conn_err}, retrying in {delay:.2f}s (attempt {attempt + 1})")
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+                logger.error(f"An error occurred: {conn_err}")
+                self.record_request(endpoint, start, 'error')
+                return None
+            except Exception as err:
+                logger.error(f"An error occurred: {err}")
+                self.record_request(endpoint, start, 'error')
+                return None
+
+    def record_request(self, endpoint, start, outcome, response_bytes=0):
+        """
+        Record a finished request in the attached metrics: its outcome, its latency since
+        `start` (retries and rate limit waits included) and the size of the response body.
+        """
+        if not self.metrics:
+            return
+        self.metrics.inc('api_requests_total', endpoint=endpoint, outcome=outcome)
+        self.metrics.observe('api_request_seconds', time.perf_counter() - start, endpoint=endpoint)
+        if response_bytes:
+            self.metrics.inc('api_response_bytes_total', response_bytes, endpoint=endpoint)
+
+    @staticmethod
+    def decode_json(response):
+        """
+        Decode a JSON response body with orjson when it is installed, falling back to
+        requests' own decoder for payloads orjson rejects (e.g. NaN literals or huge integers).
+        """
         try:
-            response = self.session.request(method=method, url=url, headers=headers, params=params, json=data, auth=self.auth)
-            response.raise_for_status()
+            return json_loads(response.content)
+        except ValueError:
             return response.json()
-        except HTTPError as http_err:
-            logger.error(f"HTTP error occurred: {http_err}")
-            return None
-        except Exception as err:
-            logger.error(f"An error occurred: {err}")
-            return None
-
-    def call_api_with_pagination(self, endpoint, method, params, payload_template, break_condition):
+
+    def get_stats(self):
+        """
+        Return the retry and throttling counters of the attached policies.
+
+        :return: dict - Counters such as 'retries', 'throttle_waits' and 'throttle_wait_seconds'.
+        """
+        stats = {}
+        if self.retry_policy:
+            stats.update(self.retry_policy.get_stats())
+        if self.rate_limiter:
+            stats.update(self.rate_limiter.get_stats())
+        if self.cache:
+            stats.update(self.cache.get_stats())
+        if self.token_provider:
+            stats.update(self.token_provider.get_stats())
+        return stats
+
+    def call_api_with_pagination(self, endpoint, method, params, payload_template, break_condition, headers=None):
         """
         Calls the API and paginates through the results until a break condition is met.
 
@@ -49,20 +166,102 @@ class APIHandler:
         :param params: dict - The parameters to include with the request.
         :param payload_template: callable - A function that returns the payload for the request.
         :param break_condition: callable - A function that accepts the response and returns True if the loop should be broken.
+        :param headers: dict - Headers sent with every page (optional).
         :return: list - A list of all the collected responses.
         """
-        responses = []
-        page = 1
+        return [
+            response for response in self.iter_pages(
+                endpoint, method, params=params, payload_template=payload_template,
+                break_condition=break_condition, headers=headers
+            )
+            if response is not None
+        ]
 
-        while True:
-            payload = payload_template(page)
-            response = self.make_request(endpoint, method=method, params=params, data=payload)
-            if response is None or break_condition(response):
-                break
-            responses.append(response)
-            page += 1
-
-        return responses
+    def iter_pages(self, endpoint, method, params=None, payload_template=None, break_condition=None, headers=None,
+                   params_template=None, page_count=None, max_pages=None, prefetch=0, first_page=1):
+        """
+        Generator variant of call_api_with_pagination yielding every page as soon as it arrives, so
+        callers can process the pages one by one instead of holding the whole result set.
+
+        Pages are yielded in page order. If `page_count` knows the number of pages from the first response,
+        up to `prefetch` of the following pages are requested concurrently ahead of the caller; otherwise
+        pages are requested one after another. Pages requested ahead are discarded once the break
+        condition is met or the caller stops iterating.
+
+        :param endpoint: str - The endpoint to make the request to.
+        :param method: str - The HTTP method to use.
+        :param params: dict - The parameters to include with every request.
+        :param payload_template: callable - A function taking the page number and returning the payload (optional).
+        :param break_condition: callable - A function that accepts a response and returns True if the pages
+            have ended; that response is not yielded (optional).
+        :param headers: dict - Headers sent with every page (optional).
+        :param params_template: callable - A function taking the page number and returning the parameters,
+            for APIs paging through the query string (optional; replaces `params`).
+        :param page_count: callable - A function taking the first response and returning the total number of
+            pages, e.g. from a total row count and the page size, or None if it is unknown (optional).
+        :param max_pages: int - Most pages requested (optional).
+        :param prefetch: int - Pages requested concurrently ahead when the page count is known. 0 disables prefetching.
+        :param first_page: int - Number of the first page.
+        :return: generator - The responses in page order. A failed page is yielded as None and ends the
+            iteration, so callers can tell a failure from the last page.
+        """
+        def fetch(page):
+            return self.make_request(
+                endpoint,
+                method=method,
+                params=params_template(page) if params_template else params,
+                data=payload_template(page) if payload_template else None,
+                headers=headers
+            )
+
+        def ended(response):
+            return break_condition is not None and break_condition(response)
+
+        response = fetch(first_page)
+        if response is None:
+            yield None
+            return
+        if ended(response):
+            return
+        yield response
+
+        total_pages = page_count(response) if page_count else None
+        known = total_pages is not None
+        if max_pages is not None:
+            total_pages = max_pages if total_pages is None else min(total_pages, max_pages)
+        last_page = None if total_pages is None else first_page + total_pages - 1
+        page = first_page + 1
+
+        if not prefetch or not known:
+            while last_page is None or page <= last_page:
+                response = fetch(page)
+                if response is None:
+                    yield None
+                    return
+                if ended(response):
+                    return
+                yield response
+                page += 1
+            return
+
+        # Keep up to `prefetch` requests in flight ahead of the page being yielded
+        with ThreadPoolExecutor(max_workers=prefetch) as executor:
+            in_flight = deque()
+            try:
+                while in_flight or page <= last_page:
+                    while page <= last_page and len(in_flight) < prefetch:
+                        in_flight.append(executor.submit(fetch, page))
+                        page += 1
+                    response = in_flight.popleft().result()
+                    if response is None:
+                        yield None
+                        return
+                    if ended(response):
+                        return
+                    yield response
+            finally:
+                for future in in_flight:
+                    future.cancel()
 
 # Example usage
 # def create_payload(page):
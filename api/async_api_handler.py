@@ -0,0 +1,414 @@
+# api/async_api_handler.py
+import time
+import asyncio
+import threading
+from collections import deque
+from functools import partial
+import aiohttp
+from api.api_handler import json_loads
+from utils.logger import setup_logging
+
+logger = setup_logging(__name__)
+
+class AsyncAPIHandler:
+    def __init__(self, base_url, auth=None, max_connections=100, rate_limiter=None, retry_policy=None, cache=None, metrics=None,
+                 token_provider=None):
+        """
+        Initialize the asyncio API Handler with a base URL and optional authentication details.
+
+        The underlying aiohttp session is created on first use so that it binds to the
+        event loop the coroutines actually run on.
+
+        :param base_url: str - The base URL for the API.
+        :param auth: tuple - A (username, password) tuple for basic authentication (optional).
+        :param max_connections: int - Maximum number of simultaneous connections held by the session.
+        :param rate_limiter: RateLimiter - Limiter consulted before every request (optional).
+        :param retry_policy: RetryPolicy - Backoff policy for retryable statuses and connection errors (optional).
+        :param cache: ResponseCache - Cache consulted before going to the network (optional).
+        :param metrics: RunMetrics - Collector of request counts, latencies and response sizes per endpoint (optional).
+        :param token_provider: TokenProvider - Supplies the auth token header of every request and a new token
+            after a 401, upon which the request is retried once (optional).
+        """
+        self.base_url = base_url
+        self.auth = aiohttp.BasicAuth(*auth) if isinstance(auth, tuple) else auth
+        self.max_connections = max_connections
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.cache = cache
+        self.metrics = metrics
+        self.token_provider = token_provider
+        self.session = None
+
+    def _get_session(self):
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections)
+            )
+        return self.session
+
+    @staticmethod
+    def _prepare_params(params):
+        """
+        Convert query parameters to the string form aiohttp expects, mirroring how
+        requests drops None values, stringifies scalars and repeats list values.
+        """
+        if params is None:
+            return None
+        prepared = []
+        for key, value in params.items():
+            if value is None:
+                continue
+            values = value if isinstance(value, (list, tuple)) else [value]
+            prepared.extend((key, str(v)) for v in values)
+        return prepared
+
+    async def make_request(self, endpoint, method='GET', params=None, data=None, headers=None, authenticate=True):
+        """
+        Make an API request to the specified endpoint using the given HTTP method.
+
+        :param endpoint: str - The API endpoint to call.
+        :param method: str - The HTTP method (e.g., 'GET', 'POST', 'PUT', 'DELETE').
+        :param params: dict - Query parameters for the API call.
+        :param data: dict - Data to be sent in the body of the request (for POST/PUT).
+        :param headers: dict - HTTP headers to send with the request.
+        :param authenticate: bool - Send the token provider's auth header; False for the login itself.
+        :return: dict - The parsed JSON response from the API, or None if an error occurred.
+        """
+        loop = asyncio.get_running_loop()
+        if self.cache:
+            # The cache is SQLite backed; its I/O runs on an executor thread so it never stalls the requests in flight
+            cached = await loop.run_in_executor(None, partial(self.cache.get, method, endpoint, params=params, data=data))
+            if cached is not None:
+                if self.metrics:
+                    self.metrics.inc('api_cache_hits_total', endpoint=endpoint)
+                return cached
+
+        url = f"{self.base_url}/{endpoint}"
+        attempt = 0
+        start = time.perf_counter()
+        token = None
+        if self.token_provider is not None and authenticate:
+            token = await self.get_token()
+            headers = {**(headers or {}), self.token_provider.header: token}
+        while True:
+            unauthorized = False
+            if self.rate_limiter:
+                wait = self.rate_limiter.reserve(url)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            try:
+                async with self._get_session().request(
+                    method=method, url=url, headers=headers, params=self._prepare_params(params), json=data, auth=self.auth
+                ) as response:
+                    if response.status == 401 and token is not None:
+                        unauthorized = True
+                    elif self.retry_policy and self.retry_policy.should_retry(response.status, attempt):
+                        if self.rate_limiter and self.retry_policy.is_throttle(response.status):
+                            self.rate_limiter.on_throttle(url)
+                        delay = self.retry_policy.get_backoff(attempt, response.headers.get('Retry-After'))
+                        logger.warning(f"Received {response.status} from {url}, retrying in {delay:.2f}s (attempt {attempt + 1})")
+                    else:
+                        response.raise_for_status()
+                        if self.rate_limiter:
+                            self.rate_limiter.on_success(url)
+                        body = await response.read()
+                        response_json = await response.json(content_type=None, loads=json_loads)
+                        if self.cache:
+                            await loop.run_in_executor(
+                                None, partial(self.cache.set, method, endpoint, response_json, params=params, data=data)
+                            )
+                        self.record_request(endpoint, start, 'success', len(body))
+                        return response_json
+            except aiohttp.ClientResponseError as http_err:
+                logger.error(f"HTTP error occurred: {http_err}")
+                self.record_request(endpoint, start, 'error')
+                return None
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as conn_err:
+                if not (self.retry_policy and self.retry_policy.can_retry(attempt)):
+                    logger.error(f"An error occurred: {conn_err}")
+                    self.record_request(endpoint, start, 'error')
+                    return None
+                delay = self.retry_policy.get_backoff(attempt)
+                logger.warning(f"Connection error for {url}: {conn_err}, retrying in {delay:.2f}s (attempt {attempt + 1})")
+            except Exception as err:
+                logger.error(f"An error occurred: {err}")
+                self.record_request(endpoint, start, 'error')
+                return None
+            if unauthorized:
+                # The token expired or was revoked: log in again and retry once
+                logger.warning(f"Received 401 from {url}, retrying once with a new auth token")
+                await loop.run_in_executor(None, self.token_provider.invalidate, token)
+                token = None
+                headers = {**headers, self.token_provider.header: await self.get_token()}
+                continue
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def get_token(self):
+        """
+        Return the provider's token; a login or a read of the shared token file runs on an executor
+        thread, so it neither blocks the event loop nor waits on it.
+        """
+        token = self.token_provider.current_token()
+        if token is None:
+            token = await asyncio.get_running_loop().run_in_executor(None, self.token_provider.get_token)
+        return token
+
+    def record_request(self, endpoint, start, outcome, response_bytes=0):
+        """
+        Record a finished request in the attached metrics: its outcome, its latency since
+        `start` (retries and rate limit waits included) and the size of the response body.
+        """
+        if not self.metrics:
+            return
+        self.metrics.inc('api_requests_total', endpoint=endpoint, outcome=outcome)
+        self.metrics.observe('api_request_seconds', time.perf_counter() - start, endpoint=endpoint)
+        if response_bytes:
+            self.metrics.inc('api_response_bytes_total', response_bytes, endpoint=endpoint)
+
+    async def call_api_with_pagination(self, endpoint, method, params, payload_template, break_condition, headers=None):
+        """
+        Calls the API and paginates through the results until a break condition is met.
+
+        :param endpoint: str - The endpoint to make the request to.
+        :param method: str - The HTTP method to use.
+        :param params: dict - The parameters to include with the request.
+        :param payload_template: callable - A function that returns the payload for the request.
+        :param break_condition: callable - A function that accepts the response and returns True if the loop should be broken.
+        :param headers: dict - Headers sent with every page (optional).
+        :return: list - A list of all the collected responses.
+        """
+        return [
+            response async for response in self.iter_pages(
+                endpoint, method, params=params, payload_template=payload_template,
+                break_condition=break_condition, headers=headers
+            )
+            if response is not None
+        ]
+
+    async def iter_pages(self, endpoint, method, params=None, payload_template=None, break_condition=None, headers=None,
+                         params_template=None, page_count=None, max_pages=None, prefetch=0, first_page=1):
+        """
+        Asynchronous generator yielding every page as soon as it arrives, in page order; prefetched
+        pages are requested as concurrent tasks on the event loop. See APIHandler.iter_pages for the parameters.
+
+        :return: async generator - The responses in page order; a failed page is yielded as None and ends the iteration.
+        """
+        async def fetch(page):
+            return await self.make_request(
+                endpoint,
+                method=method,
+                params=params_template(page) if params_template else params,
+                data=payload_template(page) if payload_template else None,
+                headers=headers
+            )
+
+        def ended(response):
+            return break_condition is not None and break_condition(response)
+
+        response = await fetch(first_page)
+        if response is None:
+            yield None
+            return
+        if ended(response):
+            return
+        yield response
+
+        total_pages = page_count(response) if page_count else None
+        known = total_pages is not None
+        if max_pages is not None:
+            total_pages = max_pages if total_pages is None else min(total_pages, max_pages)
+        last_page = None if total_pages is None else first_page + total_pages - 1
+        page = first_page + 1
+
+        if not prefetch or not known:
+            while last_page is None or page <= last_page:
+                response = await fetch(page)
+                if response is None:
+                    yield None
+                    return
+                if ended(response):
+                    return
+                yield response
+                page += 1
+            return
+
+        # Keep up to `prefetch` requests in flight ahead of the page being yielded
+        in_flight = deque()
+        try:
+            while in_flight or page <= last_page:
+                while page <= last_page and len(in_flight) < prefetch:
+                    in_flight.append(asyncio.ensure_future(fetch(page)))
+                    page += 1
+                response = await in_flight.popleft()
+                if response is None:
+                    yield None
+                    return
+                if ended(response):
+                    return
+                yield response
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+    async def close(self):
+        """
+        Close the underlying aiohttp session.
+        """
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+
+class SyncAPIHandlerFacade:
+    """
+    Blocking facade over AsyncAPIHandler with the same interface as APIHandler.
+
+    A private event loop runs on a daemon thread; every call is submitted to it and
+    waited on, so existing synchronous connectors can switch to the asyncio client
+    without changes while concurrent callers share one loop and connection pool.
+    """
+    def __init__(self, base_url, auth=None, max_connections=100, rate_limiter=None, retry_policy=None, cache=None, metrics=None,
+                 token_provider=None):
+        """
+        :param base_url: str - The base URL for the API.
+        :param auth: tuple - A (username, password) tuple for basic authentication (optional).
+        :param max_connections: int - Maximum number of simultaneous connections held by the session.
+        :param rate_limiter: RateLimiter - Limiter consulted before every request (optional).
+        :param retry_policy: RetryPolicy - Backoff policy for retryable statuses and connection errors (optional).
+        :param cache: ResponseCache - Cache consulted before going to the network (optional).
+        :param metrics: RunMetrics - Collector of request counts, latencies and response sizes per endpoint (optional).
+        :param token_provider: TokenProvider - Supplies the auth token header of every request and a new token
+            after a 401, upon which the request is retried once (optional).
+        """
+        self.base_url = base_url
+        self.async_handler = AsyncAPIHandler(
+            base_url=base_url, auth=auth, max_connections=max_connections,
+            rate_limiter=rate_limiter, retry_policy=retry_policy, cache=cache, metrics=metrics,
+            token_provider=token_provider
+        )
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name='api-event-loop', daemon=True)
+        self._thread.start()
+
+    def run(self, coroutine):
+        """
+        Run a coroutine on the facade's event loop and block until it completes.
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def make_request(self, endpoint, method='GET', params=None, data=None, headers=None, authenticate=True):
+        """
+        Blocking equivalent of AsyncAPIHandler.make_request.
+        """
+        return self.run(
+            self.async_handler.make_request(
+                endpoint, method=method, params=params, data=data, headers=headers, authenticate=authenticate
+            )
+        )
+
+    def call_api_with_pagination(self, endpoint, method, params, payload_template, break_condition, headers=None):
+        """
+        Blocking equivalent of AsyncAPIHandler.call_api_with_pagination.
+        """
+        return self.run(
+            self.async_handler.call_api_with_pagination(endpoint, method, params, payload_template, break_condition, headers=headers)
+        )
+
+    def iter_pages(self, *args, **kwargs):
+        """
+        Blocking generator over AsyncAPIHandler.iter_pages; prefetched pages keep arriving on the
+        event loop while the caller processes the current one.
+        """
+        pages = self.async_handler.iter_pages(*args, **kwargs)
+        try:
+            while True:
+                try:
+                    yield self.run(pages.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            self.run(pages.aclose())
+
+    def make_requests(self, requests_kwargs, max_in_flight=None, timed=False):
+        """
+        Issue many requests concurrently on the event loop and return the responses in input order.
+
+        :param requests_kwargs: list of dicts - Keyword arguments for each make_request call.
+        :param max_in_flight: int - Most requests in flight at once; None leaves it to the connection pool.
+        :param timed: bool - Return (response, seconds) pairs, timing each request from its start.
+        :return: list - The parsed JSON responses, with None for any request that failed.
+        """
+        return self.run(self.gather(
+            [partial(self.async_handler.make_request, **kwargs) for kwargs in requests_kwargs], max_in_flight, timed
+        ))
+
+    def gather_pages(self, pages_kwargs, until=None, max_in_flight=None, timed=False):
+        """
+        Follow the pagination of many requests concurrently on the event loop.
+
+        :param pages_kwargs: list of dicts - Keyword arguments for each AsyncAPIHandler.iter_pages call.
+        :param until: callable - Called with every page; True ends the pagination of that request after the page (optional).
+        :param max_in_flight: int - Most paginated requests followed at once; None leaves it to the connection pool.
+        :param timed: bool - Return (pages, seconds) pairs, timing each request from its start.
+        :return: list - The pages of every request in input order; a failed page ends its list as None.
+        """
+        async def collect(**kwargs):
+            pages = self.async_handler.iter_pages(**kwargs)
+            collected = []
+            try:
+                async for page in pages:
+                    collected.append(page)
+                    if page is None or (until is not None and until(page)):
+                        break
+            finally:
+                # Stops the pages still being prefetched
+                await pages.aclose()
+            return collected
+
+        return self.run(self.gather([partial(collect, **kwargs) for kwargs in pages_kwargs], max_in_flight, timed))
+
+    @staticmethod
+    async def gather(calls, max_in_flight=None, timed=False):
+        """
+        Await the coroutines of `calls` concurrently, at most `max_in_flight` at a time, in input order.
+        """
+        slots = asyncio.Semaphore(max_in_flight) if max_in_flight else None
+
+        async def call(function):
+            if slots is not None:
+                await slots.acquire()
+            try:
+                start = time.perf_counter()
+                result = await function()
+                return (result, time.perf_counter() - start) if timed else result
+            finally:
+                if slots is not None:
+                    slots.release()
+
+        return await asyncio.gather(*(call(function) for function in calls))
+
+    def get_stats(self):
+        """
+        Return the retry and throttling counters of the attached policies.
+        """
+        stats = {}
+        if self.async_handler.retry_policy:
+            stats.update(self.async_handler.retry_policy.get_stats())
+        if self.async_handler.rate_limiter:
+            stats.update(self.async_handler.rate_limiter.get_stats())
+        if self.async_handler.cache:
+            stats.update(self.async_handler.cache.get_stats())
+        if self.async_handler.token_provider:
+            stats.update(self.async_handler.token_provider.get_stats())
+        return stats
+
+    def close(self):
+        """
+        Close the HTTP session and stop the background event loop.
+        """
+        if self.loop.is_closed():
+            return
+        self.run(self.async_handler.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
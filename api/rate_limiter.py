@@ -0,0 +1,235 @@
+# api/rate_limiter.py
+import math
+import random
+import threading
+import time
+import datetime as dt
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+from utils.logger import setup_logging
+
+logger = setup_logging(__name__)
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        """
+        Token bucket refilled at a fixed rate.
+
+        :param rate: float - Tokens (requests) added per second.
+        :param burst: int - Maximum number of tokens the bucket can hold.
+        """
+        self.rate = float(rate)
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def reserve(self):
+        """
+        Take one token and return how long the caller must wait before using it.
+
+        The bucket may go negative so that concurrent callers are handed consecutive
+        slots instead of all waking up at once.
+
+        :return: float - Seconds to wait, 0.0 if a token was available.
+        """
+        with self.lock:
+            self._refill()
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def set_rate(self, rate):
+        with self.lock:
+            self._refill()
+            self.rate = float(rate)
+
+
+class RateLimiter:
+    """
+    Per-host adaptive rate limiter.
+
+    Each host gets its own token bucket. The rate is cut multiplicatively when the
+    server pushes back (429/503) and grows additively while requests succeed, so
+    throughput settles close to what the server will sustain.
+    """
+    def __init__(self, rate=10.0, burst=10, min_rate=0.5, max_rate=None, decrease_factor=0.5, increase_step=0.5, cooldown=1.0):
+        """
+        :param rate: float - Initial requests per second for each host.
+        :param burst: int - Requests that may be sent back to back before the rate applies.
+        :param min_rate: float - Lower bound the rate is never cut below.
+        :param max_rate: float - Upper bound for the rate, or None to keep probing upwards.
+        :param decrease_factor: float - Multiplier applied to the rate when throttled.
+        :param increase_step: float - Approximate requests per second regained per second of successful calls.
+        :param cooldown: float - Minimum seconds between two rate cuts, so one burst of 429s counts once.
+        """
+        self.initial_rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.decrease_factor = decrease_factor
+        self.increase_step = increase_step
+        self.cooldown = cooldown
+        self.buckets = {}
+        self.last_decrease = {}
+        self.lock = threading.Lock()
+
+        # Counters
+        self.throttle_waits = 0
+        self.throttle_wait_seconds = 0.0
+        self.throttle_events = 0
+
+    def _bucket(self, url):
+        host = urlsplit(url).netloc
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.initial_rate, self.burst)
+            return host, self.buckets[host]
+
+    def reserve(self, url):
+        """
+        Reserve a request slot for the host of the given URL.
+
+        :param url: str - The URL about to be requested.
+        :return: float - Seconds the caller must wait before sending the request.
+        """
+        _, bucket = self._bucket(url)
+        wait = bucket.reserve()
+        if wait > 0:
+            with self.lock:
+                self.throttle_waits += 1
+                self.throttle_wait_seconds += wait
+        return wait
+
+    def acquire(self, url):
+        """
+        Block until a request to the host of the given URL is allowed.
+        """
+        wait = self.reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+
+    def on_success(self, url):
+        """
+        Additively raise the host's rate after a successful request.
+        """
+        _, bucket = self._bucket(url)
+        new_rate = bucket.rate + self.increase_step / max(bucket.rate, 1.0)
+        if self.max_rate is not None:
+            new_rate = min(self.max_rate, new_rate)
+        bucket.set_rate(new_rate)
+
+    def on_throttle(self, url):
+        """
+        Multiplicatively cut the host's rate after the server signalled overload.
+        """
+        host, bucket = self._bucket(url)
+        now = time.monotonic()
+        with self.lock:
+            self.throttle_events += 1
+            if now - self.last_decrease.get(host, float('-inf')) < self.cooldown:
+                return
+            self.last_decrease[host] = now
+        new_rate = max(self.min_rate, bucket.rate * self.decrease_factor)
+        bucket.set_rate(new_rate)
+        logger.warning(f"Server throttled requests to {host}; reducing rate to {new_rate:.2f} req/s")
+
+    def get_stats(self):
+        """
+        :return: dict - Throttling counters and the current rate per host.
+        """
+        with self.lock:
+            return {
+                'throttle_waits': self.throttle_waits,
+                'throttle_wait_seconds': round(self.throttle_wait_seconds, 3),
+                'throttle_events': self.throttle_events,
+                'rates': {host: round(bucket.rate, 3) for host, bucket in self.buckets.items()},
+            }
+
+
+class RetryPolicy:
+    """
+    Jittered exponential backoff for retryable responses that honours Retry-After.
+    """
+    def __init__(self, max_retries=5, backoff_factor=0.5, max_backoff=60.0, retry_statuses=(429, 500, 502, 503, 504), throttle_statuses=(429, 503)):
+        """
+        :param max_retries: int - Retries attempted after the first request before giving up.
+        :param backoff_factor: float - Base delay in seconds, doubled on each attempt.
+        :param max_backoff: float - Upper bound for a single computed delay.
+        :param retry_statuses: tuple - HTTP status codes that are retried.
+        :param throttle_statuses: tuple - HTTP status codes that also slow down the rate limiter.
+        """
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.retry_statuses = set(retry_statuses)
+        self.throttle_statuses = set(throttle_statuses)
+        self.lock = threading.Lock()
+
+        # Counters
+        self.retries = 0
+
+    def should_retry(self, status_code, attempt):
+        return status_code in self.retry_statuses and attempt < self.max_retries
+
+    def can_retry(self, attempt):
+        return attempt < self.max_retries
+
+    def is_throttle(self, status_code):
+        return status_code in self.throttle_statuses
+
+    @staticmethod
+    def parse_retry_after(value):
+        """
+        Parse a Retry-After header given either as delay seconds or an HTTP date.
+
+        :param value: str - The header value.
+        :return: float or None - Seconds to wait, or None if the header is absent, malformed or not finite.
+        """
+        if not value:
+            return None
+        try:
+            delay = float(value)
+        except ValueError:
+            pass
+        else:
+            return max(0.0, delay) if math.isfinite(delay) else None
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=dt.timezone.utc)
+        return max(0.0, (retry_at - dt.datetime.now(dt.timezone.utc)).total_seconds())
+
+    def get_backoff(self, attempt, retry_after=None):
+        """
+        Compute the delay before the next attempt and count the retry.
+
+        A server supplied Retry-After takes precedence; otherwise "full jitter" is used,
+        a uniform draw between 0 and the capped exponential delay. Either way the delay is
+        capped by `max_backoff`, so a Retry-After of hours does not stall a worker for hours.
+
+        :param attempt: int - Zero based number of the attempt that just failed.
+        :param retry_after: str - The Retry-After header of the failed response, if any.
+        :return: float - Seconds to wait.
+        """
+        with self.lock:
+            self.retries += 1
+        delay = self.parse_retry_after(retry_after)
+        if delay is not None:
+            return min(delay, self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * (2 ** attempt)))
+
+    def get_stats(self):
+        """
+        :return: dict - Retry counters.
+        """
+        with self.lock:
+            return {'retries': self.retries}
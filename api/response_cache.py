@@ -0,0 +1,218 @@
+# api/response_cache.py
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import datetime as dt
+from fnmatch import fnmatch
+
+class CacheRule:
+    def __init__(self, endpoint, ttl=None, condition=None):
+        """
+        Decide whether and for how long responses of an endpoint may be cached.
+
+        :param endpoint: str - Endpoint path or fnmatch pattern (e.g. 'api/v1/base/*').
+        :param ttl: int or None - Seconds a cached response stays valid; None never expires.
+        :param condition: callable - Optional predicate on the request params; the rule only applies when it returns True.
+        """
+        self.endpoint = endpoint.strip('/')
+        self.ttl = ttl
+        self.condition = condition
+
+    def matches(self, endpoint, params):
+        if not fnmatch(endpoint.strip('/'), self.endpoint):
+            return False
+        return self.condition is None or bool(self.condition(params or {}))
+
+
+def closed_window(end_param='endTime', time_format='%Y-%m-%d %H:%M:%S', settle_days=1):
+    """
+    Build a CacheRule condition that holds when a request's time window is closed.
+
+    A window counts as closed once it ends before midnight `settle_days` days ago,
+    i.e. with the default of 1 the window must end before the start of yesterday.
+
+    :param end_param: str - Name of the request parameter holding the window end.
+    :param time_format: str - strptime format of that parameter.
+    :param settle_days: int - Days the source is given to finalise late data.
+    :return: callable - Predicate taking the request params.
+    """
+    def condition(params):
+        value = params.get(end_param)
+        if value is None:
+            return False
+        try:
+            window_end = dt.datetime.strptime(str(value), time_format)
+        except ValueError:
+            return False
+        cutoff = dt.datetime.combine(dt.date.today() - dt.timedelta(days=settle_days), dt.time(0, 0, 0))
+        return window_end < cutoff
+    return condition
+
+
+class ResponseCache:
+    """
+    Persistent, size bounded cache of API responses backed by SQLite.
+
+    Entries are keyed on method, endpoint, normalized params and body. Only requests
+    matched by a CacheRule are cached, and least recently used entries are evicted
+    once `max_entries` or `max_bytes` is exceeded. The number and total size of the
+    entries are counted once on open and kept up to date on every write, so the bounds
+    are checked without scanning the table; entries other processes add to a shared
+    file are only counted by the next cache opened on it.
+    """
+    def __init__(self, path, rules, max_entries=None, max_bytes=None):
+        """
+        :param path: str - Location of the SQLite database file.
+        :param rules: list of CacheRule - Evaluated in order; the first match wins.
+        :param max_entries: int - Maximum number of cached responses (optional).
+        :param max_bytes: int - Maximum total size of cached payloads in bytes (optional).
+        """
+        self.path = path
+        self.rules = rules
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at)")
+        self.entries, self.total_bytes = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+
+    def find_rule(self, endpoint, params):
+        for rule in self.rules:
+            if rule.matches(endpoint, params):
+                return rule
+        return None
+
+    @staticmethod
+    def normalize_params(params):
+        """
+        Normalize params the way they end up on the wire: None dropped, values stringified.
+        """
+        if not params:
+            return {}
+        normalized = {}
+        for key, value in params.items():
+            if value is None:
+                continue
+            if isinstance(value, (list, tuple)):
+                normalized[str(key)] = [str(v) for v in value]
+            else:
+                normalized[str(key)] = str(value)
+        return normalized
+
+    def make_key(self, method, endpoint, params=None, data=None):
+        key_material = json.dumps(
+            [method.upper(), endpoint.strip('/'), self.normalize_params(params), data],
+            sort_keys=True, default=str
+        )
+        return hashlib.sha256(key_material.encode('utf-8')).hexdigest()
+
+    def get(self, method, endpoint, params=None, data=None):
+        """
+        Return the cached response for a request, or None on a miss or if the request is not cacheable.
+        """
+        if self.find_rule(endpoint, params) is None:
+            return None
+        key = self.make_key(method, endpoint, params, data)
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute("SELECT payload, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or (row[1] is not None and row[1] <= now):
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, method, endpoint, response, params=None, data=None):
+        """
+        Store a response if a rule allows caching the request.
+
+        :return: bool - True if the response was cached.
+        """
+        rule = self.find_rule(endpoint, params)
+        if rule is None or response is None:
+            return False
+        key = self.make_key(method, endpoint, params, data)
+        payload = json.dumps(response).encode('utf-8')
+        now = time.time()
+        expires_at = None if rule.ttl is None else now + rule.ttl
+        with self.lock:
+            replaced = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            if replaced is not None:
+                self.entries -= 1
+                self.total_bytes -= replaced[0]
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, endpoint, payload, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, endpoint.strip('/'), payload, len(payload), expires_at, now)
+            )
+            self.entries += 1
+            self.total_bytes += len(payload)
+            self.evict()
+        return True
+
+    def evict(self):
+        """
+        Drop expired entries, then least recently used ones until the size bounds hold.
+        """
+        self.delete(self.conn.execute("SELECT key, size FROM responses WHERE expires_at <= ?", (time.time(),)).fetchall())
+        if self.max_entries is not None and self.entries > self.max_entries:
+            self.delete(self.conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_access ASC LIMIT ?", (self.entries - self.max_entries,)
+            ).fetchall())
+        if self.max_bytes is not None and self.total_bytes > self.max_bytes:
+            evicted = []
+            excess = self.total_bytes - self.max_bytes
+            for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC"):
+                evicted.append((key, size))
+                excess -= size
+                if excess <= 0:
+                    break
+            self.delete(evicted)
+
+    def delete(self, rows):
+        """
+        Delete entries and take them off the running count and size.
+
+        :param rows: list of tuple - (key, size) of the entries to delete.
+        """
+        if not rows:
+            return
+        self.conn.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key, _ in rows])
+        self.entries -= len(rows)
+        self.total_bytes -= sum(size for _, size in rows)
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM responses")
+            self.entries = self.total_bytes = 0
+
+    def get_stats(self):
+        """
+        :return: dict - Cache hit and miss counters.
+        """
+        with self.lock:
+            return {'cache_hits': self.hits, 'cache_misses': self.misses}
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,139 @@
+# api/token_provider.py
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from utils.logger import setup_logging
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = setup_logging(__name__)
+
+class TokenProvider:
+    """
+    Auth token cache shared by every request, scheduled run and process of a connector.
+
+    The token is kept on disk with its expiry, so a new run or a second process reuses it instead
+    of logging in again, and it is replaced `refresh_margin` seconds before it expires. A token the
+    API rejects with a 401 is invalidated, after which the next caller logs in; concurrent callers
+    wait for that one login instead of each logging in themselves.
+    """
+    def __init__(self, login, path=None, ttl=3600, refresh_margin=300, header='authorization', scope=None):
+        """
+        :param login: callable - Logs in and returns the token and its lifetime in seconds (None if unknown).
+        :param path: str - JSON file the token is shared through, or None to keep it in memory only.
+        :param ttl: float - Lifetime assumed for tokens whose login response does not tell it.
+        :param refresh_margin: float - Seconds before expiry a token is replaced.
+        :param header: str - The request header carrying the token.
+        :param scope: str - What the token is valid for, e.g. the API's base URL; a cached token of another scope is ignored.
+        """
+        self.login = login
+        self.path = path
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.header = header
+        self.scope = scope
+        self.lock = threading.Lock()
+        self.entry = None
+
+        # Counters
+        self.logins = 0
+        self.token_reuses = 0
+        self.token_rejections = 0
+
+    def is_fresh(self, entry):
+        return (
+            entry is not None and entry.get('scope') == self.scope
+            and time.time() < entry['expires_at'] - self.refresh_margin
+        )
+
+    def current_token(self):
+        """
+        :return: str - The token held in memory if it is still fresh, otherwise None. Never blocks.
+        """
+        entry = self.entry
+        return entry['token'] if self.is_fresh(entry) else None
+
+    def get_token(self):
+        """
+        Return a fresh token: the one in memory, the one cached on disk, or a new one from logging in.
+        """
+        token = self.current_token()
+        if token is not None:
+            return token
+        with self.lock, self.file_lock():
+            if not self.is_fresh(self.entry):
+                entry = self.read()
+                if self.is_fresh(entry):
+                    self.token_reuses += 1
+                    logger.info("Reusing the cached auth token")
+                else:
+                    entry = self.refresh()
+                    self.write(entry)
+                self.entry = entry
+            return self.entry['token']
+
+    def refresh(self):
+        token, expires_in = self.login()
+        if not token:
+            raise RuntimeError("Login did not return an auth token")
+        self.logins += 1
+        now = time.time()
+        return {'token': token, 'scope': self.scope, 'obtained_at': now, 'expires_at': now + (expires_in or self.ttl)}
+
+    def invalidate(self, token):
+        """
+        Drop a token the API rejected, unless it has already been replaced.
+        """
+        with self.lock, self.file_lock():
+            self.token_rejections += 1
+            if self.entry is not None and self.entry['token'] == token:
+                self.entry = None
+            entry = self.read()
+            if entry is not None and entry['token'] == token:
+                os.remove(self.path)
+            logger.warning("Auth token was rejected; the next request logs in again")
+
+    @contextmanager
+    def file_lock(self):
+        # Serialize logins across processes sharing the token file
+        if self.path is None or fcntl is None:
+            yield
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(f"{self.path}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def read(self):
+        if self.path is None:
+            return None
+        try:
+            with open(self.path, 'r') as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def write(self, entry):
+        if self.path is None:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Readable by the owner only, swapped in atomically so other processes never read a partial file
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with os.fdopen(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as file:
+            json.dump(entry, file)
+        os.replace(tmp_path, self.path)
+
+    def get_stats(self):
+        return {'logins': self.logins, 'token_reuses': self.token_reuses, 'token_rejections': self.token_rejections}
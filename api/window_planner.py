@@ -0,0 +1,121 @@
+# api/window_planner.py
+import datetime as dt
+from utils.logger import setup_logging
+
+logger = setup_logging(__name__)
+
+class WindowPlanner:
+    """
+    Adaptive planner for the request windows of a time-series endpoint.
+
+    Starting from `initial_days`, the window doubles while responses stay comfortably
+    below the record and latency thresholds, and halves when a request fails (e.g. on a
+    timeout) or returns an oversized payload, so long catch-ups need far fewer round trips
+    without ever asking the API for more than it can serve. A failed or oversized window is
+    requested again at the smaller size rather than kept, since the API may have truncated it
+    (see is_oversized, which lets the caller discard it before using it). A window size that
+    failed or was oversized becomes the ceiling for the rest of the run, so the planner settles
+    instead of growing back into the same failure.
+    """
+    def __init__(self, initial_days=1, min_days=1, max_days=31, max_records=5000, max_latency=10.0, growth_factor=2, shrink_factor=0.5):
+        """
+        :param initial_days: int - Days covered by the first window.
+        :param min_days: int - Smallest window; a failure at this size is reported instead of retried smaller.
+        :param max_days: int - Largest window the planner may grow to.
+        :param max_records: int - Records a single response may hold before the window is shrunk.
+        :param max_latency: float - Seconds a single request may take before the window is shrunk.
+        :param growth_factor: float - Multiplier applied to the window while responses stay under half the thresholds.
+        :param shrink_factor: float - Multiplier applied to the window on failures and oversized responses.
+        """
+        self.min_days = min_days
+        self.max_days = max(min_days, max_days)
+        self.days = min(self.max_days, max(min_days, initial_days))
+        self.max_records = max_records
+        self.max_latency = max_latency
+        self.growth_factor = growth_factor
+        self.shrink_factor = shrink_factor
+
+        # Counters
+        self.windows = 0
+        self.retried_windows = 0
+
+    def next_window(self, start_date, end_date):
+        """
+        :param start_date: date - First day not extracted yet.
+        :param end_date: date - Last day of the range being extracted.
+        :return: tuple - The first and last day of the next window.
+        """
+        return start_date, min(end_date, start_date + dt.timedelta(days=self.days - 1))
+
+    def shrink(self, window_days):
+        """
+        Shrink the window after a window of `window_days` failed or was oversized, and keep
+        later windows below that size.
+        """
+        self.max_days = max(self.min_days, min(self.max_days, window_days - 1))
+        self.days = max(self.min_days, min(self.max_days, int(min(self.days, window_days) * self.shrink_factor)))
+
+    def is_oversized(self, max_records, max_latency):
+        """
+        :return: bool - True if a response of the window exceeded the record or latency threshold.
+        """
+        return max_records > self.max_records or max_latency > self.max_latency
+
+    def grow(self):
+        self.days = min(self.max_days, max(self.days + 1, int(self.days * self.growth_factor)))
+
+    def record(self, window_days, max_records, max_latency, failed=False):
+        """
+        Adjust the window size after a window has been requested.
+
+        :param window_days: int - Days covered by the window that was requested.
+        :param max_records: int - Largest number of records in one response of the window.
+        :param max_latency: float - Slowest request of the window in seconds.
+        :param failed: bool - True if some requests failed or the responses could not be used.
+        :return: bool - True if the window should be requested again with the smaller size; failed and
+            oversized windows are, unless they are already at `min_days`.
+        """
+        self.windows += 1
+        if failed:
+            retry = window_days > self.min_days
+            if retry:
+                self.shrink(window_days)
+                self.retried_windows += 1
+                logger.warning(f"Request window of {window_days} days failed; retrying with {self.days} days")
+            return retry
+        if self.is_oversized(max_records, max_latency):
+            if window_days <= self.min_days:
+                logger.warning(f"Responses of a {window_days} day window reached {max_records} records / {max_latency:.2f}s at the smallest window size")
+                return False
+            self.shrink(window_days)
+            self.retried_windows += 1
+            logger.info(f"Responses of a {window_days} day window reached {max_records} records / {max_latency:.2f}s; retrying with {self.days} days")
+            return True
+        elif window_days == self.days and max_records <= self.max_records / 2 and max_latency <= self.max_latency / 2:
+            self.grow()
+        return False
+
+    @staticmethod
+    def split_by_day(records, time_field, time_format='%Y-%m-%d %H:%M:%S'):
+        """
+        Group the records of a multi-day response by the day of their timestamp.
+
+        :param records: list of dicts - The records of the response.
+        :param time_field: str - Record field holding the timestamp.
+        :param time_format: str - strptime format of the timestamp; only its date part is used.
+        :return: dict or None - {date: records} in response order, or None if a record has no usable timestamp.
+        """
+        by_day = {}
+        for record in records:
+            try:
+                day = dt.datetime.strptime(str(record[time_field]), time_format).date()
+            except (KeyError, TypeError, ValueError):
+                return None
+            by_day.setdefault(day, []).append(record)
+        return by_day
+
+    def get_stats(self):
+        """
+        :return: dict - Window counters and the current window size.
+        """
+        return {'windows': self.windows, 'retried_windows': self.retried_windows, 'window_days': self.days}
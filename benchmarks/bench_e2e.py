@@ -0,0 +1,196 @@
+# benchmarks/bench_e2e.py
+"""
+End-to-end throughput benchmark of XpandRetail.extract_and_stage.
+
+Runs a full extraction against a local mock of the Xpand API (benchmarks.mock_xpand_api)
+and loads into a SQLite stand-in for Snowflake (benchmarks.snowflake_standin), inside a
+scratch directory with its own config.ini, state, checkpoints and staging folders.
+Reports stores x days per second, the time spent per stage (summed over endpoints running
+concurrently), peak RSS and the loaded row counts, optionally as JSON so runs can be compared over time.
+
+Usage: python -m benchmarks.bench_e2e --stores 50 --days 7 --api-latency 0.02 --max-workers 8
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import resource
+import tempfile
+import datetime as dt
+from collections import defaultdict
+import snowflake.connector
+from benchmarks.mock_xpand_api import MockXpandAPI
+from benchmarks.snowflake_standin import SnowflakeStandIn
+
+CONFIG = """[snowflake]
+user = benchmark
+password = benchmark
+account = benchmark
+warehouse = BENCHMARK
+database = BENCHMARK
+schema = PUBLIC
+role = BENCHMARK
+
+[xpandretail]
+appkey = benchmark
+username = benchmark
+password = benchmark
+"""
+
+HOURLY_DATASETS = ('store_counts', 'store_cust_seg_counts')
+
+
+class StageTimer:
+    """
+    Accumulates the wall time of instance methods under stage labels.
+    """
+    def __init__(self):
+        self.seconds = defaultdict(float)
+
+    def wrap(self, owner, method_name, stage):
+        method = getattr(owner, method_name)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.seconds[stage] += time.perf_counter() - start
+
+        setattr(owner, method_name, timed)
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+    unit = 1 if sys.platform == 'darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit
+    return round(own / 2 ** 20, 1), round(children / 2 ** 20, 1)
+
+
+def run(args, workdir):
+    api = MockXpandAPI(stores=args.stores, gates_per_store=args.gates, latency=args.api_latency).start()
+    standin = SnowflakeStandIn(os.path.join(workdir, 'snowflake'), latency=args.sf_latency)
+    snowflake.connector.connect = standin.connect
+
+    os.chdir(workdir)
+    with open('config.ini', 'w') as file:
+        file.write(CONFIG)
+    # The connector extracts from the state's last run up to yesterday
+    start_date = dt.date.today() - dt.timedelta(days=args.days)
+    with open('state.json', 'w') as file:
+        json.dump({'xpand_retail': {'last_run': start_date.strftime('%Y-%m-%d')}}, file)
+
+    # Imported here so the connector's app.log and SQLite files land in the scratch directory
+    from xpand_retail import XpandRetail
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    timer = StageTimer()
+    for stage in ('setup', 'extract_hourly', 'preprocess', 'load', 'other'):
+        timer.seconds[stage] = 0.0
+    xpand_retail = None
+    try:
+        start = time.perf_counter()
+        xpand_retail = XpandRetail(
+            max_workers=args.max_workers,
+            async_http=args.async_http,
+            requests_per_second=args.requests_per_second,
+            burst=max(1, int(args.requests_per_second)),
+            cache_path=None,
+            streaming=args.streaming,
+            staging_format=args.staging_format,
+            processes=args.processes,
+            merge_keys={name: ['plaza_unid' if name == 'store_counts' else 'plazaUnid', 'hour'] for name in HOURLY_DATASETS} if args.merge else None,
+            load_parallelism=args.load_parallelism,
+            window_fields={name: 'hour' for name in HOURLY_DATASETS} if args.windowed else None,
+            pipelined=args.pipelined,
+            base_url=api.url,
+        )
+        timer.seconds['setup'] = time.perf_counter() - start
+
+        timer.wrap(xpand_retail, 'extract_range', 'extract_hourly')
+        timer.wrap(xpand_retail, 'prepare_upload', 'preprocess')
+        timer.wrap(xpand_retail.dataloader, 'load_tables', 'load')
+
+        start = time.perf_counter()
+        xpand_retail.extract_and_stage()
+        elapsed = time.perf_counter() - start
+        # Endpoints extract and load side by side, so the stages can add up to more than the run took
+        timer.seconds['other'] = max(0.0, elapsed - sum(timer.seconds[stage] for stage in ('extract_hourly', 'preprocess', 'load')))
+    finally:
+        if xpand_retail is not None and hasattr(xpand_retail.api_handler, 'close'):
+            xpand_retail.api_handler.close()
+        api.stop()
+
+    peak_rss, peak_rss_children = peak_rss_mb()
+    row_counts = standin.row_counts()
+    expected_rows = args.stores * args.days * 24
+    for name in HOURLY_DATASETS:
+        loaded = row_counts.get(f'{name.upper()}_TABLE', 0)
+        if loaded != expected_rows:
+            raise SystemExit(f"{name} loaded {loaded} rows, expected {expected_rows}")
+    return {
+        'stores': args.stores,
+        'days': args.days,
+        'seconds': round(elapsed, 3),
+        'store_days_per_second': round(args.stores * args.days / elapsed, 2),
+        'stages': {stage: round(seconds, 3) for stage, seconds in timer.seconds.items()},
+        'api_requests': api.requests,
+        'snowflake_statements': standin.statements,
+        'peak_rss_mb': peak_rss,
+        'peak_rss_children_mb': peak_rss_children,
+        'rows': row_counts,
+        'options': {key: value for key, value in vars(args).items() if key not in ('json', 'verbose')},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stores', type=int, default=20)
+    parser.add_argument('--days', type=int, default=7, help='Days to extract; at least 2, a one-day range is skipped as up to date')
+    parser.add_argument('--gates', type=int, default=2, help='Entrances per store')
+    parser.add_argument('--api-latency', type=float, default=0.0, help='Seconds every mock API response is delayed by')
+    parser.add_argument('--sf-latency', type=float, default=0.0, help='Seconds every Snowflake statement is delayed by')
+    parser.add_argument('--max-workers', type=int, default=1)
+    parser.add_argument('--requests-per-second', type=float, default=1000.0)
+    parser.add_argument('--async-http', action='store_true')
+    parser.add_argument('--streaming', action='store_true')
+    parser.add_argument('--staging-format', choices=('csv', 'parquet'), default='csv')
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--load-parallelism', type=int, default=2)
+    parser.add_argument('--windowed', action='store_true', help='Request the hourly datasets over adaptive multi-day windows')
+    parser.add_argument('--merge', action='store_true', help='Upsert the hourly datasets instead of appending them')
+    parser.add_argument('--pipelined', action='store_true', help='Load the hourly datasets in micro-batches while they are extracted')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    parser.add_argument('--verbose', action='store_true', help='Keep the connector INFO logging on the console')
+    args = parser.parse_args()
+    if args.days < 2:
+        parser.error('--days must be at least 2')
+    json_path = os.path.abspath(args.json) if args.json else None
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='bench_e2e_') as workdir:
+        try:
+            results = run(args, workdir)
+        finally:
+            os.chdir(cwd)
+
+    print(f"stores={results['stores']} days={results['days']} api_requests={results['api_requests']} "
+          f"snowflake_statements={results['snowflake_statements']}")
+    print(f"total             {results['seconds']:8.3f}s")
+    for stage, seconds in results['stages'].items():
+        print(f"  {stage:<16}{seconds:8.3f}s")
+    print(f"throughput        {results['store_days_per_second']:8.2f} store-days/s")
+    print(f"peak RSS          {results['peak_rss_mb']:8.1f} MB (child processes {results['peak_rss_children_mb']:.1f} MB)")
+    for table, rows in results['rows'].items():
+        print(f"  {table:<32}{rows:>8} rows")
+    if json_path:
+        with open(json_path, 'w') as file:
+            json.dump(results, file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
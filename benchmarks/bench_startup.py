@@ -0,0 +1,99 @@
+# benchmarks/bench_startup.py
+"""
+Startup benchmark of XpandRetail: the import time of the connector and the time of a no-op run.
+
+Every measurement runs in a fresh interpreter, so module caches never carry over. The no-op run
+starts from a state that is already up to date, the way most runs of a frequent schedule do, in a
+scratch directory against a local mock of the Xpand API; it must finish without a single API request
+and without importing the heavy modules, which are only loaded once a run has work to do.
+
+Usage: python -m benchmarks.bench_startup --repeat 5
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import tempfile
+import datetime as dt
+from benchmarks.bench_e2e import CONFIG
+from benchmarks.mock_xpand_api import MockXpandAPI
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('pandas', 'numpy', 'pyarrow', 'snowflake.connector', 'aiohttp', 'requests')
+
+IMPORT_SCRIPT = """
+import sys, json, time
+start = time.perf_counter()
+import xpand_retail
+seconds = time.perf_counter() - start
+print(json.dumps({'seconds': seconds, 'modules': [name for name in %r if name in sys.modules]}))
+"""
+
+NOOP_SCRIPT = """
+import sys, json, time, logging
+start = time.perf_counter()
+from xpand_retail import XpandRetail
+logging.getLogger().setLevel(logging.WARNING)
+connector = XpandRetail(base_url=%r, metrics_dir=None)
+connector.extract_and_stage()
+connector.close()
+seconds = time.perf_counter() - start
+print(json.dumps({'seconds': seconds, 'modules': [name for name in %r if name in sys.modules]}))
+"""
+
+
+def measure(script, workdir, repeat):
+    env = {**os.environ, 'PYTHONPATH': ROOT + os.pathsep + os.environ.get('PYTHONPATH', '')}
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', script], cwd=workdir, env=env, check=True,
+                                capture_output=True, text=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        'median_seconds': round(statistics.median(run['seconds'] for run in runs), 4),
+        'min_seconds': round(min(run['seconds'] for run in runs), 4),
+        'heavy_modules': runs[-1]['modules'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    api = MockXpandAPI().start()
+    try:
+        with tempfile.TemporaryDirectory(prefix='bench_startup_') as workdir:
+            with open(os.path.join(workdir, 'config.ini'), 'w') as file:
+                file.write(CONFIG)
+            # Already extracted up to yesterday, so the run has nothing to do
+            last_run = (dt.date.today() - dt.timedelta(days=1)).strftime('%Y-%m-%d')
+            with open(os.path.join(workdir, 'state.json'), 'w') as file:
+                json.dump({'xpand_retail': {'last_run': last_run}}, file)
+
+            results = {
+                'import': measure(IMPORT_SCRIPT % (HEAVY_MODULES,), workdir, args.repeat),
+                'noop_run': measure(NOOP_SCRIPT % (api.url, HEAVY_MODULES), workdir, args.repeat),
+                'api_requests': api.requests,
+            }
+    finally:
+        api.stop()
+
+    print(f"repeat={args.repeat} (median / min per fresh interpreter)")
+    for name in ('import', 'noop_run'):
+        result = results[name]
+        modules = ', '.join(result['heavy_modules']) or 'none'
+        print(f"{name:<10}{result['median_seconds']:8.3f}s {result['min_seconds']:8.3f}s  heavy modules: {modules}")
+    print(f"api requests of the no-op runs: {results['api_requests']}")
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=4)
+    if results['api_requests'] or results['noop_run']['heavy_modules']:
+        raise SystemExit("The no-op run made API requests or imported heavy modules")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+# benchmarks/mock_xpand_api.py
+"""
+Local stand-in for the Xpand Retail API, serving synthetic payloads for benchmarks.
+
+Serves the login, plazaInfo, gateInfo, storeCountingDataHourly and plazaHour endpoints
+used by XpandRetail. Hourly endpoints return 24 records per store and requested day, so
+multi-day windows are served as well. Every response can be delayed to emulate network
+and server latency, and issued tokens can be made to expire, after which requests get a 401.
+"""
+import json
+import time
+import threading
+import datetime as dt
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+
+class MockServer(ThreadingHTTPServer):
+    # The default backlog of 5 drops connection attempts of concurrent clients, which then stall for a SYN retry
+    request_queue_size = 128
+
+
+class MockXpandAPI:
+    def __init__(self, stores=10, gates_per_store=2, latency=0.0, token_lifetime=None, host='127.0.0.1', port=0):
+        """
+        :param stores: int - Number of stores returned by plazaInfo.
+        :param gates_per_store: int - Number of entrances returned by gateInfo for each store.
+        :param latency: float - Seconds every response is delayed by.
+        :param token_lifetime: float - Seconds a login token is accepted for; None accepts any request.
+        :param host: str - Interface to listen on.
+        :param port: int - Port to listen on; 0 picks a free port.
+        """
+        self.stores = stores
+        self.gates_per_store = gates_per_store
+        self.latency = latency
+        self.token_lifetime = token_lifetime
+        self.tokens = {}
+        self.requests = 0
+        self.logins = 0
+        self.lock = threading.Lock()
+        self.server = MockServer((host, port), self.handler_class())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def handler_class(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, as the client pools its connections; headers and body go out in separate
+            # writes, so Nagle's algorithm is disabled to not stall each response
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                api.respond(self, {'atoken': api.issue_token()})
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                if not api.accepts(self.headers.get('authorization')):
+                    api.respond(self, None, status=401)
+                    return
+                api.respond(self, api.payload(url.path, params))
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def issue_token(self):
+        with self.lock:
+            self.logins += 1
+            token = f'benchmark-token-{self.logins}'
+            self.tokens[token] = time.monotonic()
+        return token
+
+    def accepts(self, token):
+        if self.token_lifetime is None:
+            return True
+        issued_at = self.tokens.get(token)
+        return issued_at is not None and time.monotonic() - issued_at < self.token_lifetime
+
+    def respond(self, handler, payload, status=404):
+        with self.lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if payload is None:
+            handler.send_response(status)
+            handler.send_header('Content-Length', '0')
+            handler.end_headers()
+            return
+        body = json.dumps(payload).encode('utf-8')
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def store_id(self, index):
+        return f'00000000-0000-0000-0000-{index:012d}'
+
+    def payload(self, path, params):
+        if path.endswith('/plazaInfo'):
+            return {'data': [
+                {'plaza_unid': self.store_id(i), 'plaza_name': f'Plaza "{i}"', 'city': 'Benchmark', 'open_time': '09:00:00'}
+                for i in range(self.stores)
+            ]}
+        if path.endswith('/gateInfo'):
+            store_id = params.get('plaza_unid')
+            return {'data': [
+                {'gate_unid': f'{store_id}-{j}', 'plaza_unid': store_id, 'gate_name': f'Gate {j}', 'is_main': j == 0}
+                for j in range(self.gates_per_store)
+            ]}
+        if path.endswith('/storeCountingDataHourly') or path.endswith('/plazaHour'):
+            store_id = params.get('plaza_unid') or params.get('plazaUnid')
+            first_day = dt.datetime.strptime(params['startTime'], '%Y-%m-%d %H:%M:%S').date()
+            last_day = dt.datetime.strptime(params['endTime'], '%Y-%m-%d %H:%M:%S').date()
+            seed = int(store_id[-6:]) if store_id and store_id[-6:].isdigit() else 0
+            records = []
+            day = first_day
+            while day <= last_day:
+                for hour in range(24):
+                    count = (seed * 31 + day.toordinal() * 7 + hour * 13) % 500
+                    if path.endswith('/plazaHour'):
+                        records.append({
+                            'plazaUnid': store_id, 'hour': f'{day} {hour:02d}:00:00',
+                            'male': count // 2, 'female': count - count // 2,
+                            'age_group': None if hour % 5 == 0 else f'{20 + hour % 4 * 10}-{29 + hour % 4 * 10}',
+                        })
+                    else:
+                        records.append({
+                            'plaza_unid': store_id, 'hour': f'{day} {hour:02d}:00:00',
+                            'in_count': count, 'out_count': None if count % 11 == 0 else count - count % 7,
+                        })
+                day += dt.timedelta(days=1)
+            return {'code': 0, 'data': records}
+        return None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name='mock-xpand-api', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
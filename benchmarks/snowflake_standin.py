@@ -0,0 +1,233 @@
+# benchmarks/snowflake_standin.py
+"""
+SQLite backed stand-in for snowflake.connector, for running DataLoader locally in benchmarks.
+
+Understands the statements DataLoader issues: stages, PUT, file formats, INFORMATION_SCHEMA
+lookups, CREATE/ALTER/TRUNCATE/DROP TABLE, table swaps, COPY INTO from a stage (CSV written by
+LocalStageOrchestrator or Parquet), INSERT ... SELECT, MERGE and explicit transactions.
+Stages are directories, tables live in one SQLite file shared by every connection, and
+fully qualified DATABASE.SCHEMA.TABLE names are reduced to the table name.
+"""
+import os
+import re
+import glob
+import time
+import shutil
+import sqlite3
+import itertools
+import threading
+import datetime as dt
+import pandas as pd
+
+NULL_VALUES = ['\\N', 'Null', 'NULL', 'null', '\\n', 'nan']
+
+
+class SnowflakeStandIn:
+    def __init__(self, root, latency=0.0):
+        """
+        :param root: str - Directory holding the SQLite database and the stage directories.
+        :param latency: float - Seconds every statement is delayed by, emulating the round trip to Snowflake.
+        """
+        self.root = root
+        self.db_file = os.path.join(root, 'snowflake.db')
+        self.stage_root = os.path.join(root, 'stages')
+        self.latency = latency
+        self.statements = 0
+        self.lock = threading.Lock()
+        self.query_ids = itertools.count(1)
+        os.makedirs(self.stage_root, exist_ok=True)
+        with sqlite3.connect(self.db_file) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+
+    def connect(self, **kwargs):
+        """
+        Drop-in replacement for snowflake.connector.connect; the connection arguments are ignored.
+        """
+        return StandInConnection(self)
+
+    def stage_directory(self, stage_name):
+        return os.path.join(self.stage_root, stage_name.split('.')[-1].upper())
+
+    def next_query_id(self):
+        with self.lock:
+            self.statements += 1
+            return f'standin-{next(self.query_ids):08d}'
+
+    def row_counts(self):
+        """
+        :return: dict - Number of rows of every table, by upper-cased table name as Snowflake reports it.
+        """
+        with sqlite3.connect(self.db_file) as conn:
+            tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+            return {table.upper(): conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0] for table in tables}
+
+
+class StandInConnection:
+    def __init__(self, standin):
+        self.standin = standin
+        self.db = sqlite3.connect(standin.db_file, timeout=60, isolation_level=None, check_same_thread=False)
+        self.closed = False
+
+    def cursor(self):
+        return StandInCursor(self)
+
+    def is_closed(self):
+        return self.closed
+
+    def close(self):
+        if not self.closed:
+            self.db.close()
+            self.closed = True
+
+
+class StandInCursor:
+    qualified_name = re.compile(r'\b\w+\.\w+\.(\w+)\b')
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.standin = connection.standin
+        self.db = connection.db
+        self.sfqid = None
+        self.description = None
+        self.rows = []
+
+    def execute(self, query, *args, **kwargs):
+        if self.standin.latency:
+            time.sleep(self.standin.latency)
+        self.sfqid = self.standin.next_query_id()
+        self.description = None
+        self.rows = []
+
+        query = ' '.join(query.split()).rstrip(';').strip()
+        keyword = query.upper()
+        if keyword.startswith('PUT '):
+            self.put(query)
+            return self
+        query = self.qualified_name.sub(r'\1', query)
+        keyword = query.upper()
+
+        if keyword.startswith('CREATE OR REPLACE STAGE'):
+            stage_directory = self.standin.stage_directory(query.split()[-1])
+            shutil.rmtree(stage_directory, ignore_errors=True)
+            os.makedirs(stage_directory)
+        elif 'FILE FORMAT' in keyword:
+            pass
+        elif 'INFORMATION_SCHEMA.TABLES' in keyword:
+            table_name = re.search(r"TABLE_NAME = '([^']+)'", query).group(1)
+            self.rows = self.db.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = ? COLLATE NOCASE", (table_name,)
+            ).fetchall()
+        elif 'INFORMATION_SCHEMA.COLUMNS' in keyword:
+            table_name = re.search(r"TABLE_NAME = '([^']+)'", query).group(1)
+            self.rows = [(row[1], row[2].upper()) for row in self.db.execute(f'PRAGMA table_info("{table_name}")')]
+        elif keyword.startswith('CREATE'):
+            self.create_table(query)
+        elif keyword.startswith('ALTER TABLE') and ' SWAP WITH ' in keyword:
+            match = re.match(r'ALTER TABLE (\w+) SWAP WITH (\w+)$', query, re.IGNORECASE)
+            self.swap(*match.groups())
+        elif keyword.startswith('ALTER TABLE'):
+            match = re.match(r'ALTER TABLE (\w+) ADD COLUMN (.*)$', query, re.IGNORECASE)
+            for column in re.findall(r'"(?:[^"]|"")+"\s+\w+', match.group(2)):
+                self.db.execute(f'ALTER TABLE {match.group(1)} ADD COLUMN {column}')
+        elif keyword.startswith('TRUNCATE TABLE'):
+            self.db.execute(f'DELETE FROM {query.split()[-1]}')
+        elif keyword.startswith('COPY INTO'):
+            self.copy_into(query)
+        elif keyword.startswith('MERGE INTO'):
+            self.merge(query)
+        elif keyword.startswith('INSERT'):
+            rows_inserted = self.db.execute(query).rowcount
+            self.description = [('number of rows inserted',)]
+            self.rows = [(rows_inserted,)]
+        else:
+            # DROP TABLE, BEGIN, COMMIT, ROLLBACK and SELECT 1 are valid SQLite as they are
+            cursor = self.db.execute(query)
+            self.description = cursor.description
+            self.rows = cursor.fetchall()
+        return self
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def close(self):
+        pass
+
+    def put(self, query):
+        match = re.match(r"PUT '?file://(.+?)'? @(\S+)$", query, re.IGNORECASE)
+        stage_directory = self.standin.stage_directory(match.group(2))
+        os.makedirs(stage_directory, exist_ok=True)
+        for file_path in glob.glob(match.group(1)):
+            shutil.copy(file_path, stage_directory)
+
+    def create_table(self, query):
+        match = re.match(r'CREATE (OR REPLACE )?(?:TRANSIENT )?TABLE (IF NOT EXISTS )?(\w+) \((.*)\)$', query, re.IGNORECASE)
+        replace, if_not_exists, table_name, columns = match.groups()
+        if replace:
+            self.db.execute(f'DROP TABLE IF EXISTS {table_name}')
+        self.db.execute(f'CREATE TABLE {if_not_exists or ""}{table_name} ({columns})')
+
+    def swap(self, table_name, other_table_name):
+        """Exchange two tables by renaming them, as ALTER TABLE ... SWAP WITH does in one step."""
+        self.db.execute(f'ALTER TABLE {table_name} RENAME TO swap_{table_name}')
+        self.db.execute(f'ALTER TABLE {other_table_name} RENAME TO {table_name}')
+        self.db.execute(f'ALTER TABLE swap_{table_name} RENAME TO {other_table_name}')
+
+    def copy_into(self, query):
+        match = re.match(r'COPY INTO (\w+) FROM @(\S+)', query, re.IGNORECASE)
+        table_name, stage_name = match.groups()
+        columns = {row[1].upper(): row[1] for row in self.db.execute(f'PRAGMA table_info("{table_name}")')}
+        # One result row per file, as Snowflake reports a COPY
+        self.description = [('file',), ('status',), ('rows_parsed',), ('rows_loaded',)]
+        for file_path in sorted(glob.glob(os.path.join(self.standin.stage_directory(stage_name), '*'))):
+            if file_path.endswith('.parquet'):
+                df = pd.read_parquet(file_path)
+            else:
+                df = pd.read_csv(file_path, sep='~', quotechar='"', dtype=str, keep_default_na=False, na_values=NULL_VALUES)
+            # MATCH_BY_COLUMN_NAME = 'CASE_INSENSITIVE': unmatched file columns are skipped
+            df = df[[column for column in df.columns if column.upper() in columns]]
+            column_list = ', '.join(f'"{columns[column.upper()]}"' for column in df.columns)
+            placeholders = ', '.join('?' for _ in df.columns)
+            rows = [tuple(self.to_sqlite(value) for value in row) for row in df.astype(object).itertuples(index=False, name=None)]
+            self.db.executemany(f'INSERT INTO {table_name} ({column_list}) VALUES ({placeholders})', rows)
+            self.rows.append((os.path.basename(file_path), 'LOADED', len(rows), len(rows)))
+
+    @staticmethod
+    def to_sqlite(value):
+        if value is None or (isinstance(value, float) and value != value) or value is pd.NaT:
+            return None
+        if isinstance(value, (dt.datetime, dt.date, pd.Timestamp)):
+            return str(value)
+        return value
+
+    def merge(self, query):
+        """
+        Run MERGE as a deduplicated source table, an UPDATE ... FROM of the changed rows and an
+        INSERT of the unmatched keys, reporting the row counts the way Snowflake does.
+        """
+        match = re.match(
+            r'MERGE INTO (\w+) AS target USING \((SELECT (.+?) FROM (\w+) QUALIFY ROW_NUMBER\(\) OVER \((.+?)\) = 1)\) AS source'
+            r' ON (.+?)(?: WHEN MATCHED AND \((.+)\) THEN UPDATE SET (.+?))? WHEN NOT MATCHED THEN INSERT \((.+?)\) VALUES \((.+)\)$',
+            query, re.IGNORECASE
+        )
+        table_name, _, column_list, temp_table_name, window, on, changed, assignments, insert_columns, values = match.groups()
+        self.db.execute('DROP TABLE IF EXISTS temp.merge_source')
+        self.db.execute(
+            f'CREATE TEMP TABLE merge_source AS SELECT {column_list} FROM '
+            f'(SELECT *, ROW_NUMBER() OVER ({window}) AS merge_row FROM {temp_table_name}) WHERE merge_row = 1'
+        )
+        rows_updated = 0
+        if assignments:
+            assignments = re.sub(r'(^|, )target\.', r'\1', assignments)
+            rows_updated = self.db.execute(
+                f'UPDATE {table_name} AS target SET {assignments} FROM temp.merge_source AS source WHERE ({on}) AND ({changed})'
+            ).rowcount
+        rows_inserted = self.db.execute(
+            f'INSERT INTO {table_name} ({insert_columns}) SELECT {values} FROM temp.merge_source AS source '
+            f'WHERE NOT EXISTS (SELECT 1 FROM {table_name} AS target WHERE {on})'
+        ).rowcount
+        self.db.execute('DROP TABLE temp.merge_source')
+        self.description = [('number of rows inserted',), ('number of rows updated',)]
+        self.rows = [(rows_inserted, rows_updated)]
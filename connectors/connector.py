@@ -0,0 +1,939 @@
+# connectors/connector.py
+import os
+import re
+import time
+import argparse
+import threading
+import datetime as dt
+from functools import partial
+from contextlib import contextmanager
+from utils.logger import setup_logging
+from utils.utils import ProjectDirectory, fan_out, has_csv_files, has_files, lazy_property
+from utils.metrics import RunMetrics
+from utils.dag import TaskGraph
+from utils.pipeline import BatchPipeline
+from api.rate_limiter import RateLimiter, RetryPolicy
+from api.response_cache import ResponseCache, CacheRule, closed_window
+from api.window_planner import WindowPlanner
+from api.token_provider import TokenProvider
+from state_manager.state_manager import StateManager
+from state_manager.checkpoint_store import CheckpointStore
+from credentials.credential_manager import CredentialManager
+from db.schema_registry import SchemaRegistry
+from scheduler.scheduler import Scheduler
+from connectors.definition import ConnectorDefinition
+
+logger = setup_logging(__name__)
+
+class Connector:
+    """
+    Extracts the endpoints of a declarative connector definition (see connectors.definition) and
+    loads each into its Snowflake table.
+
+    Every endpoint becomes an extract task and a load task in a dependency graph: an endpoint that
+    fans out over a parent's keys waits for the parent's extraction, and a dataset is loaded as soon
+    as its own extraction finishes. Independent tasks run side by side, so the dimension loads no
+    longer hold up the fact extraction and a run takes the time of its critical path.
+
+    The HTTP client, the data processor and the Snowflake loader are built on first use, and with
+    them pandas, aiohttp and the Snowflake connector are imported; a run the state shows to be up
+    to date returns before any of them, so it costs no login, session or heavy import.
+    """
+    def __init__(self, definition, max_workers=1, async_http=False, requests_per_second=10.0, burst=10,
+                 cache_path='.cache/{name}_responses.db', cache_max_bytes=512 * 1024 * 1024, streaming=False,
+                 staging_format='csv', processes=1, memory_budget=None, merge_keys=None, load_parallelism=2,
+                 window_fields=None, max_window_days=31, min_window_days=1, max_window_records=5000,
+                 max_window_latency=10.0, base_url=None, metrics_dir='metrics', graph_parallelism=4,
+                 pipelined=False, pipeline_depth=4, micro_batch_days=4, token_path='.cache/{name}_token.json',
+                 skip_unchanged_snapshots=True, metrics_retention=10):
+        """
+        :param definition: ConnectorDefinition, dict or str - The connector definition or the path of its JSON file.
+        :param max_workers: int - Maximum number of per-key API requests in flight per endpoint. 1 keeps the serial behaviour.
+        :param async_http: bool - Route API calls through the asyncio client: the per-key requests of an endpoint go out
+            concurrently on its event loop instead of over worker threads.
+        :param requests_per_second: float - Starting request rate against the API host; adapts to server pushback.
+        :param burst: int - Requests allowed back to back before the rate applies.
+        :param cache_path: str - SQLite file for the API response cache, formatted with the connector's name,
+            or None to disable caching. Endpoints are cached by the rules of their definitions.
+        :param cache_max_bytes: int - Size bound of the response cache before least recently used entries are evicted.
+        :param streaming: bool - Preprocess each extracted batch once and write it straight into the Snowflake stage
+            directory instead of round tripping through intermediate CSV files.
+        :param staging_format: str - 'csv' or 'parquet'; Parquet keeps native types and skips text escaping.
+        :param processes: int - Worker processes used to preprocess the extracted files before upload.
+        :param memory_budget: int - Bytes each extracted file may take while it is preprocessed; larger files are
+            staged in chunks (optional).
+        :param merge_keys: dict - Key columns per windowed dataset, e.g. {'store_counts': ['plaza_unid', 'hour']}. Datasets
+            listed here are upserted with a MERGE on those keys, so re-extracted days replace their rows instead of
+            being inserted again. Adds to the key columns of the definition's merge targets.
+        :param load_parallelism: int - Tables loaded into Snowflake at the same time, each beyond the first on its own session.
+        :param window_fields: dict - Timestamp field of the records per windowed dataset, e.g. {'store_counts': 'hour'}.
+            Datasets listed here are requested over adaptive multi-day windows and split back into daily files;
+            other datasets are requested one day at a time.
+        :param max_window_days: int - Largest request window in days.
+        :param min_window_days: int - Smallest request window in days; failed or oversized windows are split down to it.
+        :param max_window_records: int - Records one response of a window may hold; a window with a larger response
+            is discarded and requested again in smaller windows.
+        :param max_window_latency: float - Seconds one request of a window may take before the window is discarded
+            and requested again in smaller windows. An endpoint's window definition overrides these per endpoint.
+        :param base_url: str - Root URL of the API, e.g. a local mock server for benchmarks; defaults to the definition's.
+        :param metrics_dir: str - Directory the run metrics are exported to, as a JSON summary per run and a
+            Prometheus textfile overwritten by every run; None keeps them in memory only.
+        :param graph_parallelism: int - Extract and load tasks of different endpoints running at the same time.
+        :param pipelined: bool - Load windowed datasets while they are extracted: every extracted day goes into a
+            bounded queue whose consumer stages, loads and checkpoints the days in micro-batches, advancing the
+            state as each batch commits. Otherwise a dataset is loaded once its whole date range is extracted.
+        :param pipeline_depth: int - Extracted days waiting to be loaded before the extraction pauses.
+        :param micro_batch_days: int - Most days loaded by one PUT and COPY in pipelined mode.
+        :param token_path: str - File the auth token is cached in with its expiry, formatted with the connector's
+            name, so runs and processes share one login; None keeps the token in memory.
+        :param skip_unchanged_snapshots: bool - Skip staging and loading a truncated or merged snapshot whose content
+            fingerprint matches the one of its last successful load, as long as its table still holds rows. The
+            fingerprint ignores row and column order.
+        :param metrics_retention: int - JSON summaries of past runs kept in `metrics_dir`; older ones are deleted
+            after every export. None keeps them all.
+        """
+        self.definition = ConnectorDefinition.load(definition)
+
+        # Initializing API Attributes
+        self.name = self.definition.name
+        self.base_url = base_url or self.definition.base_url
+        self.max_workers = max_workers
+        self.streaming = streaming
+        self.stage_writers = {}
+        self.merge_keys = {
+            endpoint.name: endpoint.key_columns
+            for endpoint in self.definition.endpoints.values() if endpoint.load_type == 'merge'
+        }
+        self.merge_keys.update(merge_keys or {})
+        self.load_parallelism = load_parallelism
+        self.window_fields = window_fields or {}
+        self.max_window_days = max_window_days
+        self.min_window_days = min_window_days
+        self.max_window_records = max_window_records
+        self.max_window_latency = max_window_latency
+        self.metrics_dir = metrics_dir
+        self.metrics_retention = metrics_retention
+        self.graph_parallelism = graph_parallelism
+        self.load_slots = threading.BoundedSemaphore(max(1, load_parallelism))
+        self.session_lock = threading.Lock()
+        self.pipelined = pipelined
+        self.pipeline_depth = pipeline_depth
+        self.micro_batch_days = micro_batch_days
+        self.skip_unchanged_snapshots = skip_unchanged_snapshots
+        self.watermark_lock = threading.Lock()
+        if pipelined:
+            truncated = [endpoint.name for endpoint in self.definition.endpoints.values() if endpoint.window and endpoint.load_type == 'truncate']
+            if truncated:
+                raise ValueError(f"Windowed endpoints cannot be truncated batch by batch in pipelined mode: {', '.join(truncated)}")
+
+        # Settings of the components built on first use
+        self.async_http = async_http
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.cache_path = cache_path.format(name=self.name) if cache_path else None
+        self.cache_max_bytes = cache_max_bytes
+        self.staging_format = staging_format
+        self.processes = processes
+        self.memory_budget = memory_budget
+
+        # Initializing Necessary Helper Objects
+        self.metrics = RunMetrics(job=self.name)
+        self.credentials = CredentialManager()
+        auth = self.definition.auth
+        self.token_provider = TokenProvider(
+            login=self.login,
+            path=token_path.format(name=self.name) if token_path else None,
+            ttl=auth['ttl'],
+            refresh_margin=auth['refresh_margin'],
+            header=auth['header'],
+            scope=self.base_url
+        ) if auth is not None else None
+        self.state = StateManager(name=self.name)
+        self.checkpoints = CheckpointStore(name=self.name)
+        self.project_dir = ProjectDirectory(name=self.name)
+
+        # Initializing class attributes
+        self.start_run()
+
+    @lazy_property
+    def api_handler(self):
+        rate_limiter = RateLimiter(rate=self.requests_per_second, burst=self.burst)
+        retry_policy = RetryPolicy()
+        response_cache = ResponseCache(
+            path=self.cache_path,
+            rules=self.get_cache_rules(),
+            max_bytes=self.cache_max_bytes
+        ) if self.cache_path else None
+        if self.async_http:
+            from api.async_api_handler import SyncAPIHandlerFacade
+            return SyncAPIHandlerFacade(
+                base_url=self.base_url, max_connections=max(10, self.max_workers),
+                rate_limiter=rate_limiter, retry_policy=retry_policy, cache=response_cache, metrics=self.metrics,
+                token_provider=self.token_provider
+            )
+        from api.api_handler import APIHandler
+        return APIHandler(
+            base_url=self.base_url, pool_maxsize=max(10, self.max_workers),
+            rate_limiter=rate_limiter, retry_policy=retry_policy, cache=response_cache, metrics=self.metrics,
+            token_provider=self.token_provider
+        )
+
+    @lazy_property
+    def data_processor(self):
+        from data_processor.data_processor import DataProcessor
+        return DataProcessor(metrics=self.metrics)
+
+    @lazy_property
+    def dataloader(self):
+        from db.snowflake_loader import DataLoader
+        return DataLoader(
+            staging_format=self.staging_format, persistent_session=True, schema_registry=SchemaRegistry(),
+            metrics=self.metrics, credentials=self.credentials
+            )
+
+    @lazy_property
+    def local_stage_orchestrator(self):
+        from data_processor.data_processor import LocalStageOrchestrator
+        return LocalStageOrchestrator(
+            staging_location=self.project_dir.get_directories('snowflake_stage'),
+            file_format=self.staging_format,
+            processes=self.processes,
+            memory_budget=self.memory_budget,
+            metrics=self.metrics
+            )
+
+    def start_run(self):
+        """
+        Reset the attributes scoped to one run: its timestamp, the date range and watermark from the
+        state, the streaming writers, the extracted keys, the pipelines and the metrics. Called by every
+        extract_and_stage, so one instance can be run repeatedly on warm sessions (see scheduler.Scheduler).
+        """
+        self.timestamp_run = dt.datetime.now().strftime("%Y%m%d%H%M%S")
+        self.startDate = dt.datetime.strptime(self.state.get_last_state(),"%Y-%m-%d").date()
+        self.endDate = (dt.datetime.now() - dt.timedelta(days=1)).date()
+        self.stage_writers = {}
+        self.fan_out_keys = {}
+        self.window_keys = {}
+        self.pipelines = {}
+        self.queued_units = {}
+        self.staged_units = {}
+        self.frontiers = {}
+        self.snapshot_fingerprints = {}
+        self.unchanged_snapshots = set()
+        self.watermark = self.startDate
+        self.batch_number = 0
+        self.metrics.reset()
+
+    def get_cache_rules(self):
+        """
+        :return: list - The response cache rules of the definition's endpoints.
+        """
+        rules = []
+        for endpoint in self.definition.endpoints.values():
+            if not endpoint.cache:
+                continue
+            if endpoint.cache.get('closed_window'):
+                # Windows that closed before yesterday can no longer change
+                condition = closed_window(endpoint.window['end_param'], time_format=endpoint.window['format'])
+                rules.append(CacheRule(endpoint.path, ttl=None, condition=condition))
+            else:
+                rules.append(CacheRule(endpoint.path, ttl=endpoint.cache.get('ttl')))
+        return rules
+
+    def login(self):
+        """
+        Log in with the credentials of the definition's auth section. Called by the token provider
+        only when no fresh token is cached.
+
+        :return: tuple - The token and its lifetime in seconds, or None if the response does not tell it.
+        """
+        auth = self.definition.auth
+        login_credentials = self.credentials.get_credentials(**auth['credentials'])
+
+        response_json = self.api_handler.make_request(
+            endpoint=auth['path'],
+            method=auth['method'],
+            data=login_credentials,
+            headers=auth['headers'],
+            authenticate=False
+        )
+        if response_json is None:
+            raise RuntimeError(f"Login to {self.base_url} failed")
+        logger.info("Auth Token retrived successfully")
+        expires_in = response_json.get(auth['expires_in_field']) if auth['expires_in_field'] else None
+        return response_json[auth['token_field']], expires_in
+
+    def request(self, endpoint, params):
+        """
+        Request an endpoint, following its pagination if it has one. The auth header is added by the token provider.
+
+        :param endpoint: EndpointDefinition - The endpoint to request.
+        :param params: dict - The query parameters.
+        :return: dict - The response, with the records of all pages under the records key; None if a request
+            failed, so a unit is never staged with pages missing.
+        """
+        if endpoint.pagination is None:
+            return self.api_handler.make_request(
+                endpoint=endpoint.path, method=endpoint.method, params=params
+            )
+        pages = self.api_handler.iter_pages(**self.get_page_kwargs(endpoint, params))
+        try:
+            return self.merge_pages(endpoint, params, pages)
+        finally:
+            # Stops the pages still being prefetched
+            pages.close()
+
+    def request_many(self, endpoint, params_list):
+        """
+        Request an endpoint once per set of query parameters, up to `max_workers` requests at a time: on
+        worker threads, or with `async_http` as concurrent requests on the asyncio client's event loop.
+
+        :param endpoint: EndpointDefinition - The endpoint to request.
+        :param params_list: list - The query parameters of every request.
+        :return: list - (response as returned by request, seconds the request took) per set of parameters, in order.
+        """
+        if not self.async_http:
+            def timed_request(params):
+                start = time.perf_counter()
+                response = self.request(endpoint, params)
+                return response, time.perf_counter() - start
+            return fan_out(timed_request, params_list, max_workers=self.max_workers)
+        if endpoint.pagination is None:
+            return self.api_handler.make_requests(
+                [{'endpoint': endpoint.path, 'method': endpoint.method, 'params': params} for params in params_list],
+                max_in_flight=self.max_workers, timed=True
+            )
+        results = self.api_handler.gather_pages(
+            [self.get_page_kwargs(endpoint, params) for params in params_list],
+            until=lambda page: not endpoint.get_records(page),
+            max_in_flight=self.max_workers, timed=True
+        )
+        return [(self.merge_pages(endpoint, params, pages), seconds) for params, (pages, seconds) in zip(params_list, results)]
+
+    def get_page_kwargs(self, endpoint, params):
+        """
+        :return: dict - Keyword arguments of the API handler's iter_pages for a paginated endpoint.
+        """
+        pagination = endpoint.pagination
+        page_param = pagination['page_param']
+        in_params = pagination['location'] == 'params'
+        return {
+            'endpoint': endpoint.path,
+            'method': endpoint.method,
+            'params': params,
+            'params_template': (lambda page: {**params, page_param: page}) if in_params else None,
+            'payload_template': None if in_params else (lambda page: {page_param: page}),
+            'page_count': endpoint.get_page_count,
+            'max_pages': pagination['max_pages'],
+            'prefetch': pagination['prefetch'],
+            'first_page': pagination['start'],
+        }
+
+    def merge_pages(self, endpoint, params, pages):
+        """
+        Merge the records of every page into the first response, stopping at the first page without records.
+
+        :return: dict - The merged response; None if a page failed.
+        """
+        first_response, records = None, []
+        for response in pages:
+            page_records = endpoint.get_records(response)
+            if page_records is None:
+                logger.warning(f"A page of {endpoint.name} failed for {params}")
+                return None
+            first_response = first_response or response
+            if not page_records:
+                break
+            records.extend(page_records)
+        return {**first_response, endpoint.records: records}
+
+    def get_params(self, endpoint, key):
+        """
+        :return: dict - The query parameters of the endpoint for one fan-out key.
+        """
+        params = dict(endpoint.params)
+        if endpoint.fan_out:
+            params[endpoint.fan_out['param']] = key
+        return params
+
+    def fetch_windows(self, endpoint, keys, startTime, endTime):
+        """
+        Request a windowed endpoint for every fan-out key; the window bounds arrive as '%Y-%m-%d %H:%M:%S'.
+
+        :return: list - (response, seconds) per key, in order (see request_many).
+        """
+        window = endpoint.window
+        start = dt.datetime.strptime(startTime, "%Y-%m-%d %H:%M:%S").strftime(window['format'])
+        end = dt.datetime.strptime(endTime, "%Y-%m-%d %H:%M:%S").strftime(window['format'])
+        params_list = [
+            {**self.get_params(endpoint, key), window['start_param']: start, window['end_param']: end} for key in keys
+        ]
+        return self.request_many(endpoint, params_list)
+
+    def extract_window(self, name, fetch, store_ids, first_day, last_day, records_key='data', planner=None):
+        """
+        Extract one endpoint for a window of days and stage the responses as one CSV file per day.
+
+        Stores already checkpointed for every day of the window are skipped, and only stores whose
+        response was staged are checkpointed per day, so a rerun after a crash or a failed request
+        resumes with exactly the missing units. Multi-day responses are split on the dataset's
+        timestamp field (see `window_fields`) so the staged files match one-day requests. In pipelined
+        mode the days are handed to the dataset's pipeline instead (see commit_batch).
+
+        :param name: str - Name of the dataset, used for the staging folder and file names.
+        :param fetch: callable - Function taking the store ids, startTime and endTime and returning a
+            (response, seconds) pair per store, in order.
+        :param store_ids: list - The stores to extract.
+        :param first_day: date - The first day of the window.
+        :param last_day: date - The last day of the window.
+        :param records_key: str - Key of the record list in a response.
+        :param planner: WindowPlanner - Planner of the window sizes; a window above its smallest size whose responses
+            it finds oversized is discarded unstaged, to be requested again in smaller windows (optional).
+        :return: tuple - Store ids whose request failed (None if multi-day responses could not be
+            split by day and nothing was staged), the largest response in records and the slowest request in seconds.
+        """
+        days = [first_day + dt.timedelta(days=offset) for offset in range((last_day - first_day).days + 1)]
+        done = {
+            day: self.checkpoints.done_units(name, day.strftime("%Y-%m-%d")) | self.queued_units.get((name, day.strftime("%Y-%m-%d")), set())
+            for day in days
+        }
+        pending = [store_id for store_id in store_ids if any(str(store_id) not in done[day] for day in days)]
+        window_key = first_day.strftime("%Y-%m-%d") if len(days) == 1 else f"{first_day:%Y-%m-%d}..{last_day:%Y-%m-%d}"
+        if not pending:
+            logger.info(f"All stores of {name} already extracted for {window_key}. Skipping...")
+            return [], 0, 0.0
+
+        startTime = dt.datetime.combine(first_day, dt.time(0,0,0)).strftime("%Y-%m-%d %H:%M:%S")
+        endTime = dt.datetime.combine(last_day, dt.time(23,59,59)).strftime("%Y-%m-%d %H:%M:%S")
+
+        with self.metrics.stage('extract', dataset=name):
+            results = fetch(pending, startTime=startTime, endTime=endTime)
+        fetched = [(store_id, response) for store_id, (response, _) in zip(pending, results) if response is not None]
+        failed = [store_id for store_id, (response, _) in zip(pending, results) if response is None]
+        max_latency = max(latency for _, latency in results)
+        records = [len(response.get(records_key) or []) for _, response in fetched if isinstance(response, dict)]
+        max_records = max(records, default=0)
+        if planner is not None and len(days) > planner.min_days and planner.is_oversized(max_records, max_latency):
+            # The API may have truncated or barely served the window; it is requested again smaller
+            logger.info(f"Discarding the oversized window {window_key} of {name}")
+            return [], max_records, max_latency
+        self.metrics.inc('records_extracted_total', sum(records), dataset=name)
+
+        # Normalize the responses back to one response per store and day
+        if len(days) == 1:
+            responses_by_day = {first_day: fetched}
+        else:
+            time_field = self.window_fields[name]
+            responses_by_day = {day: [] for day in days}
+            for store_id, response in fetched:
+                records = response.get(records_key) if isinstance(response, dict) else None
+                records_by_day = WindowPlanner.split_by_day(records, time_field) if isinstance(records, list) else None
+                if records_by_day is None:
+                    logger.warning(f"Responses of {name} for {window_key} cannot be split by '{time_field}'")
+                    return None, max_records, max_latency
+                for day in days:
+                    responses_by_day[day].append((store_id, {**response, records_key: records_by_day.get(day, [])}))
+
+        for day, day_responses in responses_by_day.items():
+            day_key = day.strftime("%Y-%m-%d")
+            day_responses = [(store_id, response) for store_id, response in day_responses if str(store_id) not in done[day]]
+            if not day_responses:
+                continue
+            # converting list dict into single data frame
+            df = self.data_processor.list_json_to_dataframe(list_dict=[response for _, response in day_responses], key=records_key)
+            units = [store_id for store_id, _ in day_responses]
+            self.queued_units.setdefault((name, day_key), set()).update(map(str, units))
+            if name in self.pipelines:
+                # The consumer stages, loads and checkpoints the day while the extraction goes on
+                self.pipelines[name].put((day, df, units))
+                continue
+
+            # staging the dataframe into persistent memory; a resumed day gets its own file
+            timestamp_day = dt.datetime.combine(day, dt.time(0,0,0)).strftime("%Y%m%d%H%M%S")
+            file_name = f'{name}_{timestamp_day}.csv' if not done[day] else f'{name}_{timestamp_day}_{self.timestamp_run}.csv'
+            self.stage_dataframe(name, df, file_name)
+            # Checkpointed by load_endpoint once the load has committed
+            self.staged_units.setdefault(name, []).append((units, day_key))
+
+        if failed:
+            logger.warning(f"{len(failed)} stores of {name} failed for {window_key}")
+        return failed, max_records, max_latency
+
+    def extract_range(self, name, fetch, store_ids, start_date, end_date, records_key='data'):
+        """
+        Extract one endpoint for every day of [start_date, end_date] with adaptive request windows.
+
+        Datasets without a timestamp field in `window_fields` are requested one day at a time.
+        A window with failed requests is retried smaller for the stores still missing, and an oversized
+        window is discarded and requested again smaller; failures of a one-day window are left to the next run.
+
+        :return: date - The first day with stores still missing, or None if the range is complete.
+        """
+        planner = self.get_planner(self.definition.endpoints[name])
+        first_incomplete_day = None
+        day = start_date
+        while day <= end_date:
+            first_day, last_day = planner.next_window(day, end_date)
+            window_days = (last_day - first_day).days + 1
+            failed, max_records, max_latency = self.extract_window(
+                name, fetch, store_ids, first_day, last_day, records_key=records_key, planner=planner
+            )
+            if failed is None:
+                # The responses carry no usable timestamp; fall back to one-day windows for good
+                planner.max_days = 1
+            if planner.record(window_days, max_records, max_latency, failed=failed is None or bool(failed)):
+                continue
+            if failed:
+                logger.warning(f"{len(failed)} stores of {name} failed for {first_day} and will be retried on the next run")
+                if first_incomplete_day is None:
+                    first_incomplete_day = first_day
+            logger.info(f"Completed extraction of {name} for {first_day} to {last_day}")
+            day = last_day + dt.timedelta(days=1)
+        logger.info(f"Request windows of {name}: {planner.get_stats()}")
+        return first_incomplete_day
+
+    def get_planner(self, endpoint):
+        """
+        :return: WindowPlanner - Planner of the request windows of a windowed endpoint, with the sizes and thresholds of
+            its window definition and the connector's for the unset ones. Datasets without a timestamp field in
+            `window_fields` are requested one day at a time.
+        """
+        window = endpoint.window
+
+        def setting(key, default):
+            return window[key] if window.get(key) is not None else default
+
+        # Responses that cannot be split by day take one-day windows
+        windowed = endpoint.name in self.window_fields
+        return WindowPlanner(
+            min_days=setting('min_days', self.min_window_days) if windowed else 1,
+            max_days=setting('max_days', self.max_window_days) if windowed else 1,
+            max_records=setting('max_records', self.max_window_records),
+            max_latency=setting('max_latency', self.max_window_latency)
+        )
+
+    def get_stage_writer(self, name):
+        """
+        Return the streaming writer of a dataset, staging into its own folder under snowflake_stage.
+        """
+        if name not in self.stage_writers:
+            from data_processor.data_processor import StreamingStageWriter
+            self.stage_writers[name] = StreamingStageWriter(
+                orchestrator=self.local_stage_orchestrator,
+                stage_location=self.get_stage_directory(name)
+            )
+        return self.stage_writers[name]
+
+    def stage_dataframe(self, name, df, file_name):
+        """
+        Persist an extracted DataFrame: straight into the Snowflake stage when streaming,
+        otherwise as a CSV in the dataset's folder for process_flat_files to pick up.
+        """
+        if self.streaming:
+            self.get_stage_writer(name).write_batch(df, file_name)
+        else:
+            with self.metrics.stage('write_csv', dataset=name):
+                df.to_csv(os.path.join(self.project_dir.get_directories(name), file_name))
+
+    def get_stage_directory(self, name):
+        """
+        Return the dataset's own folder under snowflake_stage, so datasets can be staged and loaded side by side.
+        """
+        stage_directory = os.path.join('snowflake_stage', name)
+        self.project_dir.create_ds_if_not_exists(stage_directory)
+        return self.project_dir.get_directories(stage_directory)
+
+    def prepare_upload(self, name, load_type='truncate'):
+        """
+        Preprocess a dataset into its Snowflake stage folder.
+
+        :return: dict - Keyword arguments for DataLoader.manage_data_loading, or None if nothing was staged.
+        """
+        if self.streaming:
+            stage_writer = self.get_stage_writer(name)
+            snowflake_stage = stage_writer.stage_location
+            if not has_files(snowflake_stage, extension=self.local_stage_orchestrator.file_extension):
+                logger.info(f"Nothing staged for {name}. Skipping upload...")
+                return None
+            col_definition_string = stage_writer.generate_col_definitions()
+        else:
+            local_stage = self.project_dir.get_directories(name)
+            if not has_csv_files(local_stage):
+                logger.info(f"Nothing staged for {name}. Skipping upload...")
+                return None
+            snowflake_stage = self.get_stage_directory(name)
+            orchestrator = self.local_stage_orchestrator.for_staging_location(snowflake_stage)
+            col_definition_string = orchestrator.process_flat_files(local_stage)
+        return {
+            'name': name, 'local_stage_path': snowflake_stage, 'col_def_str': col_definition_string,
+            'load_type': load_type, 'key_columns': self.merge_keys.get(name)
+        }
+
+    def finish_upload(self, name, snowflake_stage):
+        """
+        Remove the staged files of a loaded dataset so they are not picked up again if a later step of the run fails.
+        """
+        self.local_stage_orchestrator.delete_folder_contents(folder_path=snowflake_stage)
+        if self.streaming:
+            self.get_stage_writer(name).reset()
+            logger.info(f"Upload of streamed {name} has been completed.")
+        else:
+            self.local_stage_orchestrator.delete_folder_contents(folder_path=self.project_dir.get_directories(name))
+            logger.info(f"Preprocessing & Upload of {name} has been completed.")
+
+    def upload(self, load_types):
+        """
+        Preprocess and load independent datasets, loading up to `load_parallelism` tables at once.
+
+        Datasets that loaded are cleaned up even if another one failed; the failures are raised together
+        afterwards so the state is not advanced past data that never reached Snowflake.
+
+        :param load_types: dict - Load type ('truncate', 'insert' or 'merge') per dataset name.
+        :return: dict - Per table outcome as returned by DataLoader.load_tables.
+        """
+        loads = [load for load in (self.prepare_upload(name, load_type) for name, load_type in load_types.items()) if load]
+        results = self.dataloader.load_tables(loads, max_parallel=self.load_parallelism)
+        for load in loads:
+            if results[load['name']]['status'] == 'succeeded':
+                self.finish_upload(load['name'], load['local_stage_path'])
+        failed = {name: outcome['error'] for name, outcome in results.items() if outcome['status'] == 'failed'}
+        if failed:
+            raise RuntimeError(f"Loading failed for {', '.join(failed)}: {failed}")
+        return results
+
+    def preprocess_and_upload(self, name, load_type='truncate'):
+        self.upload({name: load_type})
+        return None
+
+    def export_metrics(self, success=True):
+        """
+        Finish the run's metrics and write them to `metrics_dir`: a JSON summary named after the run's
+        timestamp and a Prometheus textfile for node_exporter's textfile collector. Only the latest
+        `metrics_retention` summaries are kept.
+        """
+        # A run skipped as up to date never built the HTTP client
+        api_stats = self.api_handler.get_stats() if lazy_property.is_built(self, 'api_handler') else {}
+        for stat, value in api_stats.items():
+            if isinstance(value, (int, float)):
+                self.metrics.set(f'api_{stat}', value)
+        self.metrics.finish(success=success)
+        if self.metrics_dir:
+            self.metrics.write(
+                json_path=os.path.join(self.metrics_dir, f'{self.name}_{self.timestamp_run}.json'),
+                prometheus_path=os.path.join(self.metrics_dir, f'{self.name}.prom')
+            )
+            self.prune_metrics()
+
+    def prune_metrics(self):
+        """
+        Delete the connector's oldest JSON run summaries in `metrics_dir` beyond `metrics_retention`.
+        """
+        if not self.metrics_dir or self.metrics_retention is None:
+            return
+        summary = re.compile(rf'{re.escape(self.name)}_\d{{14}}\.json')
+        # The run timestamp in the name sorts the summaries chronologically
+        summaries = sorted(file_name for file_name in os.listdir(self.metrics_dir) if summary.fullmatch(file_name))
+        for file_name in summaries[:max(0, len(summaries) - self.metrics_retention)]:
+            try:
+                os.remove(os.path.join(self.metrics_dir, file_name))
+            except FileNotFoundError:
+                # Another process of the same connector pruned it first
+                pass
+
+    def extract_and_stage(self, close_sessions=True):
+        """
+        Run the extraction and load, then export the run's metrics, recording whether the run failed.
+
+        :param close_sessions: bool - Close the Snowflake session after the run. A scheduler running the
+            same instance repeatedly passes False to keep it warm for the next run, and calls close() at shutdown.
+        """
+        self.start_run()
+        try:
+            self.run_extraction()
+        except Exception:
+            self.export_metrics(success=False)
+            raise
+        finally:
+            if close_sessions and lazy_property.is_built(self, 'dataloader'):
+                self.dataloader.close()
+        self.export_metrics(success=True)
+
+    def close(self):
+        """
+        Close the Snowflake session and the HTTP client, if they were opened.
+        """
+        if lazy_property.is_built(self, 'dataloader'):
+            self.dataloader.close()
+        if lazy_property.is_built(self, 'api_handler') and hasattr(self.api_handler, 'close'):
+            self.api_handler.close()
+
+    def extract_endpoint(self, endpoint):
+        """
+        Extract one endpoint, once per key of its fan-out parent, and stage the responses.
+
+        Snapshots are staged as one file, unless their content is unchanged since their last load;
+        windowed endpoints are extracted over the run's date range (see extract_range). Snapshots that
+        other endpoints fan out over keep their keys for them either way.
+
+        :param endpoint: EndpointDefinition - The endpoint to extract.
+        :return: date - For windowed endpoints the first day with keys still missing, otherwise None.
+        """
+        name = endpoint.name
+        keys = self.fan_out_keys[endpoint.parent][endpoint.fan_out['field']] if endpoint.fan_out else [None]
+        if endpoint.window is not None:
+            self.window_keys[name] = {str(key) for key in keys}
+            # Days staged by a run that failed or was killed before loading them were never checkpointed
+            # and are extracted again, so their files must not be loaded as well
+            self.discard_staged(name)
+            if not self.pipelined:
+                return self.extract_range(
+                    name=name,
+                    fetch=partial(self.fetch_windows, endpoint),
+                    store_ids=keys,
+                    start_date=self.startDate,
+                    end_date=self.endDate,
+                    records_key=endpoint.records
+                )
+            pipeline = self.pipelines[name] = BatchPipeline(
+                partial(self.commit_batch, endpoint),
+                max_pending=self.pipeline_depth,
+                max_batch=self.micro_batch_days,
+                name=f'{name}_pipeline'
+            )
+            with pipeline:
+                first_incomplete_day = self.extract_range(
+                    name=name,
+                    fetch=partial(self.fetch_windows, endpoint),
+                    store_ids=keys,
+                    start_date=self.startDate,
+                    end_date=self.endDate,
+                    records_key=endpoint.records
+                )
+            stats = pipeline.get_stats()
+            self.metrics.inc('pipeline_batches_total', stats['batches'], dataset=name)
+            self.metrics.inc('pipeline_blocked_seconds_total', stats['blocked_seconds'], dataset=name)
+            logger.info(f"Pipeline of {name}: {stats}")
+            return first_incomplete_day
+
+        with self.metrics.stage('extract', dataset=name):
+            responses = [
+                response for response, _ in self.request_many(endpoint, [self.get_params(endpoint, key) for key in keys])
+            ]
+        failed = [key for key, response in zip(keys, responses) if response is None]
+        if failed:
+            # A snapshot replaces its table, so it is never loaded with keys missing
+            raise RuntimeError(f"{len(failed)} requests of {name} failed")
+        df = self.data_processor.list_json_to_dataframe(list_dict=responses, key=endpoint.records)
+        self.metrics.inc('records_extracted_total', len(df), dataset=name)
+        fields = [child.fan_out['field'] for child in self.definition.endpoints.values() if child.parent == name]
+        self.fan_out_keys[name] = {
+            field: list(dict.fromkeys(df[field].dropna().tolist())) if field in df.columns else [] for field in fields
+        }
+        # Truncating or merging the same content again leaves the table as it is; appends are always loaded
+        if self.skip_unchanged_snapshots and self.get_load_type(endpoint) in ('truncate', 'merge'):
+            fingerprint = self.data_processor.fingerprint(df)
+            if fingerprint == self.checkpoints.get_fingerprint(name):
+                # Pinned like a load, so the count never runs on a connection another thread's load holds in a transaction
+                with self.snowflake_session():
+                    rows = self.dataloader.count_rows(f'{name}_TABLE')
+                if rows:
+                    logger.info(f"Snapshot of {name} is unchanged since its last load; skipping staging and load")
+                    self.unchanged_snapshots.add(name)
+                    self.metrics.inc('snapshots_unchanged_total', dataset=name)
+                    return None
+                # The table was dropped or emptied since, so the snapshot is loaded again
+                logger.warning(f"Table of the unchanged snapshot {name} is missing or empty; loading it again")
+                self.checkpoints.clear_fingerprint(name)
+            self.snapshot_fingerprints[name] = fingerprint
+        self.stage_dataframe(name, df, f'{name}.csv')
+        return None
+
+    def load_endpoint(self, endpoint):
+        """
+        Load one extracted dataset while other endpoints are still extracting.
+
+        At most `load_parallelism` datasets load at once; the first takes the persistent session,
+        the others open sessions of their own so their statements run concurrently. The days staged
+        for the dataset are only checkpointed once the load has committed; if it fails they are discarded.
+
+        :param endpoint: EndpointDefinition - The endpoint whose dataset is loaded.
+        :return: dict - Per table outcome as returned by DataLoader.load_tables; empty for an unchanged snapshot.
+        """
+        name = endpoint.name
+        if name in self.unchanged_snapshots:
+            return {}
+        with self.load_slots:
+            try:
+                with self.snowflake_session():
+                    results = self.upload({name: self.get_load_type(endpoint)})
+            except Exception:
+                if name in self.staged_units:
+                    del self.staged_units[name]
+                    self.discard_staged(name)
+                raise
+        for units, day_key in self.staged_units.pop(name, []):
+            self.checkpoints.mark_done(name, units, day_key)
+        if name in self.snapshot_fingerprints:
+            # Only recorded once the load committed, so a failed load is retried in full
+            self.checkpoints.set_fingerprint(name, self.snapshot_fingerprints[name])
+        return results
+
+    @contextmanager
+    def snowflake_session(self):
+        """
+        Pin a Snowflake session to the calling thread for the block: the persistent session if no other
+        thread holds it, otherwise one of its own, so statements of different threads never share a
+        connection or run inside each other's transactions.
+        """
+        persistent = self.session_lock.acquire(blocking=False)
+        try:
+            with self.dataloader.session(dedicated=not persistent):
+                yield
+        finally:
+            if persistent:
+                self.session_lock.release()
+
+    def get_load_type(self, endpoint):
+        """
+        :return: str - How the endpoint's dataset is loaded: 'merge' if it has merge keys, else its target's load type.
+        """
+        return 'merge' if endpoint.name in self.merge_keys else endpoint.load_type
+
+    def commit_batch(self, endpoint, batch):
+        """
+        Stage, load and checkpoint a micro-batch of extracted days on the pipeline's consumer thread,
+        then advance the watermark. The days are only checkpointed once their load has committed.
+
+        :param endpoint: EndpointDefinition - The windowed endpoint the days belong to.
+        :param batch: list - (day, DataFrame, keys) per extracted day.
+        """
+        name = endpoint.name
+        for day, df, _ in batch:
+            timestamp_day = dt.datetime.combine(day, dt.time(0,0,0)).strftime("%Y%m%d%H%M%S")
+            self.batch_number += 1
+            self.stage_dataframe(name, df, f'{name}_{timestamp_day}_{self.timestamp_run}_{self.batch_number}.csv')
+        try:
+            self.load_endpoint(endpoint)
+        except Exception:
+            # The days are not checkpointed and get extracted again, so their staged files must not linger
+            self.discard_staged(name)
+            raise
+        for day, _, keys in batch:
+            self.checkpoints.mark_done(name, keys, day.strftime("%Y-%m-%d"))
+        logger.info(f"Committed {len(batch)} days of {name} up to {max(day for day, _, _ in batch)}")
+        self.advance_watermark()
+
+    def discard_staged(self, name):
+        """
+        Delete the files staged for a dataset but not loaded, from its Snowflake stage folder and its
+        streaming writer or extraction folder.
+        """
+        self.local_stage_orchestrator.delete_folder_contents(folder_path=self.get_stage_directory(name))
+        if self.streaming:
+            self.get_stage_writer(name).reset()
+        else:
+            self.local_stage_orchestrator.delete_folder_contents(folder_path=self.project_dir.get_directories(name))
+
+    def advance_watermark(self):
+        """
+        Move the state forward to the first day not yet committed for every key of every windowed endpoint,
+        so a run that fails halfway resumes after the batches that reached Snowflake.
+        """
+        with self.watermark_lock:
+            frontiers = []
+            for endpoint in self.definition.endpoints.values():
+                if endpoint.window is None:
+                    continue
+                day = self.frontiers.get(endpoint.name, self.startDate)
+                keys = self.window_keys.get(endpoint.name)
+                if keys is not None:
+                    while day <= self.endDate and keys <= self.checkpoints.done_units(endpoint.name, day.strftime("%Y-%m-%d")):
+                        day += dt.timedelta(days=1)
+                    self.frontiers[endpoint.name] = day
+                frontiers.append(day)
+            watermark = min(frontiers + [self.endDate])
+            if watermark > self.watermark:
+                self.state.update_state(last_run_date=watermark.strftime("%Y-%m-%d"))
+                self.watermark = watermark
+                logger.info(f"Watermark of {self.name} advanced to {watermark}")
+
+    def build_graph(self):
+        """
+        :return: TaskGraph - An extract and a load task per endpoint. Extractions wait for the parent they
+            fan out over, loads for their own extraction and the loads of the datasets they depend on.
+        """
+        graph = TaskGraph()
+        for name, endpoint in self.definition.endpoints.items():
+            graph.add(
+                f'extract:{name}',
+                partial(self.extract_endpoint, endpoint),
+                depends_on=[f'extract:{endpoint.parent}'] if endpoint.parent else []
+            )
+            graph.add(
+                f'load:{name}',
+                partial(self.load_endpoint, endpoint),
+                depends_on=[f'extract:{name}', *(f'load:{dependency}' for dependency in endpoint.depends_on)]
+            )
+        return graph
+
+    def run_extraction(self):
+
+        # Checked before anything touches the network, so an up to date run returns at once
+        if self.startDate >= self.endDate:
+            logger.info("State indicated injestion completed for the day. Skipping injestion...")
+            return None
+
+        self.project_dir.create_ds_if_not_exists(*self.definition.endpoints)
+
+        results = self.build_graph().run(max_parallel=self.graph_parallelism)
+        logger.info(f"Task timings of {self.name}: { {task: outcome['seconds'] for task, outcome in results.items()} }")
+        failed = {task: outcome['error'] for task, outcome in results.items() if outcome['status'] != 'succeeded'}
+        if failed:
+            # The state is not advanced past data that never reached Snowflake
+            raise RuntimeError(f"Tasks of {self.name} did not complete: {failed}")
+        incomplete_days = [
+            outcome['result'] for task, outcome in results.items()
+            if task.startswith('extract:') and outcome['result'] is not None
+        ]
+        first_incomplete_day = min(incomplete_days) if incomplete_days else None
+
+        # update the state
+        if first_incomplete_day is None:
+            self.state.update_state(last_run_date=self.endDate.strftime("%Y-%m-%d"))
+            self.checkpoints.clear()
+        else:
+            # Hold the watermark at the first day with missing keys; checkpoints are kept
+            # so the next run only re-requests the keys that failed.
+            self.state.update_state(last_run_date=first_incomplete_day.strftime("%Y-%m-%d"))
+            logger.warning(f"Some requests failed to extract; state held at {first_incomplete_day} for retry")
+        self.local_stage_orchestrator.delete_folder_contents(folder_path=self.project_dir.name)
+        logger.info(f"API request statistics: {self.api_handler.get_stats()}")
+        logger.info("Extraction job completed successfully")
+
+
+def run_connector(connector, every=None, jitter=0.0):
+    """
+    Run a connector once, or every `every` seconds under a Scheduler on warm sessions until interrupted.
+    """
+    if every:
+        scheduler = Scheduler(max_concurrent=1)
+        scheduler.schedule_task(every, connector.extract_and_stage, name=connector.name, jitter=jitter, close_sessions=False)
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            logger.info("Scheduler interrupted")
+        finally:
+            connector.close()
+    else:
+        connector.extract_and_stage()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Extract the API of a connector definition into Snowflake.")
+    parser.add_argument('definition', help="Path of the connector definition JSON file, e.g. connectors/xpand_retail.json")
+    parser.add_argument('--every', type=float, help="Keep running and start a run every this many seconds on warm sessions")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Up to this many seconds added at random to every scheduled start")
+    args = parser.parse_args()
+
+    run_connector(Connector(args.definition), every=args.every, jitter=args.jitter)
@@ -0,0 +1,199 @@
+# connectors/definition.py
+import json
+import copy
+import math
+from utils.logger import setup_logging
+
+logger = setup_logging(__name__)
+
+class EndpointDefinition:
+    load_types = ('truncate', 'insert', 'merge')
+
+    def __init__(self, name, path, method='GET', params=None, records='data', fan_out=None, window=None,
+                 pagination=None, target=None, cache=None, depends_on=()):
+        """
+        One endpoint of a connector, extracted into a dataset of its own and loaded into one table.
+
+        :param name: str - Name of the dataset; names the staging folders and the target table.
+        :param path: str - Endpoint path relative to the connector's base URL.
+        :param method: str - HTTP method.
+        :param params: dict - Query parameters sent with every request.
+        :param records: str - Key of the record list in a response.
+        :param fan_out: dict - Request the endpoint once per value of a column of a parent dataset:
+            {'parent': 'store_info', 'field': 'plaza_unid', 'param': 'plaza_unid'}.
+        :param window: dict - Request the endpoint over the run's date range in day windows (see
+            Connector.extract_range): {'start_param': 'startTime', 'end_param': 'endTime', 'format': '%Y-%m-%d %H:%M:%S',
+            'min_days': None, 'max_days': None, 'max_records': None, 'max_latency': None}. A window whose responses
+            exceed 'max_records' records or 'max_latency' seconds is requested again in smaller windows, down to
+            'min_days'; unset sizes and thresholds take the connector's. Endpoints without a window are snapshots,
+            extracted whole on every run.
+        :param pagination: dict - Request numbered pages until one comes back without records:
+            {'page_param': 'page', 'location': 'params' or 'data', 'start': 1, 'max_pages': None}. If the first
+            response tells the number of pages ('total_pages_field') or rows ('total_records_field' and
+            'page_size'), the pages end there and up to 'prefetch' of them are requested concurrently.
+        :param target: dict - Load of the dataset into its table: {'load_type': 'truncate', 'insert' or 'merge',
+            'key_columns': [...]}. Snapshots default to truncate, windowed endpoints to insert; merge needs key_columns.
+        :param cache: dict - Response cache rule: {'ttl': seconds} or {'closed_window': True} to keep responses
+            of windows that can no longer change.
+        :param depends_on: iterable - Further datasets that must be loaded before this one is.
+        """
+        self.name = name
+        self.path = path
+        self.method = method.upper()
+        self.params = params or {}
+        self.records = records
+        self.fan_out = fan_out
+        self.window = window
+        self.pagination = pagination
+        self.target = target or {}
+        self.cache = cache
+        self.depends_on = tuple(depends_on)
+
+        if fan_out is not None:
+            missing = [key for key in ('parent', 'field', 'param') if key not in fan_out]
+            if missing:
+                raise ValueError(f"fan_out of endpoint '{name}' is missing {', '.join(missing)}")
+        if window is not None:
+            window.setdefault('start_param', 'startTime')
+            window.setdefault('end_param', 'endTime')
+            window.setdefault('format', '%Y-%m-%d %H:%M:%S')
+            for setting in ('min_days', 'max_days', 'max_records', 'max_latency'):
+                window.setdefault(setting, None)
+        if pagination is not None:
+            if 'page_param' not in pagination:
+                raise ValueError(f"pagination of endpoint '{name}' is missing page_param")
+            if pagination.setdefault('location', 'params') not in ('params', 'data'):
+                raise ValueError(f"pagination location of endpoint '{name}' must be 'params' or 'data'")
+            pagination.setdefault('start', 1)
+            pagination.setdefault('prefetch', 0)
+            if 'total_records_field' in pagination and not pagination.get('page_size'):
+                raise ValueError(f"pagination of endpoint '{name}' needs page_size to count pages from total_records_field")
+            if pagination.setdefault('max_pages', None) is not None and pagination['max_pages'] < 1:
+                raise ValueError(f"max_pages of endpoint '{name}' must be at least 1")
+            if not records:
+                raise ValueError(f"Paginated endpoint '{name}' needs the records key to detect the last page")
+        if cache and cache.get('closed_window') and window is None:
+            raise ValueError(f"Only windowed endpoints can cache closed windows, not '{name}'")
+        if self.load_type not in self.load_types:
+            raise ValueError(f"Unknown load type '{self.load_type}' of endpoint '{name}'")
+
+    @property
+    def parent(self):
+        return self.fan_out['parent'] if self.fan_out else None
+
+    @property
+    def load_type(self):
+        return self.target.get('load_type', 'insert' if self.window else 'truncate')
+
+    @property
+    def key_columns(self):
+        return self.target.get('key_columns')
+
+    def get_page_count(self, response):
+        """
+        :return: int - Number of pages announced by the first response of a paginated endpoint, or None if unknown.
+        """
+        pagination = self.pagination
+        try:
+            if 'total_pages_field' in pagination:
+                return int(response[pagination['total_pages_field']])
+            if 'total_records_field' in pagination:
+                return math.ceil(int(response[pagination['total_records_field']]) / pagination['page_size'])
+        except (KeyError, TypeError, ValueError):
+            logger.warning(f"The first page of {self.name} does not tell the number of pages")
+        return None
+
+    def get_records(self, response):
+        """
+        :return: list - The records of a response, or None if it holds no record list.
+        """
+        if not isinstance(response, dict):
+            return None
+        records = response.get(self.records) if self.records else response
+        if records is None:
+            return []
+        return records if isinstance(records, list) else None
+
+
+class ConnectorDefinition:
+    """
+    Declarative description of a connector: where the API lives, how to log in, and its endpoints
+    with the parameters, fan-out keys, pagination and target tables of each. Connector turns it into
+    a dependency graph in which every endpoint waits only for its parent.
+
+    Definitions are JSON files, e.g. connectors/xpand_retail.json:
+
+        {
+            "name": "xpand_retail",
+            "base_url": "http://dlapi.xpandretail.com:18085",
+            "auth": {"path": "api/v1/user/login", "credentials": {"appkey": "xpandretail", ...}, "token_field": "atoken"},
+            "endpoints": {
+                "store_info": {"path": "api/v1/base/plazaInfo"},
+                "store_entrance_info": {"path": "api/v1/base/gateInfo",
+                                        "fan_out": {"parent": "store_info", "field": "plaza_unid", "param": "plaza_unid"}},
+                ...
+            }
+        }
+    """
+    def __init__(self, name, endpoints, base_url=None, auth=None):
+        """
+        :param name: str - Name of the connector; keys its state, checkpoints, staging folders and metrics.
+        :param endpoints: dict - Keyword arguments of EndpointDefinition per dataset name.
+        :param base_url: str - Root URL of the API.
+        :param auth: dict - Token login: {'path': ..., 'method': 'POST', 'headers': {...}, 'credentials': {field: config
+            section}, 'token_field': 'atoken', 'header': 'authorization', 'expires_in_field': None, 'ttl': 3600,
+            'refresh_margin': 300}. Credentials are read from config.ini through CredentialManager, never from the
+            definition itself. Tokens whose login response has no 'expires_in_field' are assumed to live 'ttl'
+            seconds and are replaced 'refresh_margin' seconds before they expire. None for APIs without a login.
+        """
+        self.name = name
+        self.base_url = base_url
+        self.auth = auth
+        if auth is not None:
+            auth.setdefault('method', 'POST')
+            auth.setdefault('headers', {'Content-Type': 'application/json'})
+            auth.setdefault('credentials', {})
+            auth.setdefault('token_field', 'token')
+            auth.setdefault('header', 'authorization')
+            auth.setdefault('expires_in_field', None)
+            auth.setdefault('ttl', 3600)
+            auth.setdefault('refresh_margin', 300)
+        self.endpoints = {
+            endpoint_name: endpoint if isinstance(endpoint, EndpointDefinition) else EndpointDefinition(name=endpoint_name, **endpoint)
+            for endpoint_name, endpoint in endpoints.items()
+        }
+        self.validate()
+
+    @classmethod
+    def from_dict(cls, definition):
+        return cls(**copy.deepcopy(definition))
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, 'r') as file:
+            definition = json.load(file)
+        logger.info(f"Loaded connector definition {definition.get('name')} from {path}")
+        return cls(**definition)
+
+    @classmethod
+    def load(cls, definition):
+        """
+        :param definition: ConnectorDefinition, dict or str - A definition, its dict form or the path of its JSON file.
+        """
+        if isinstance(definition, cls):
+            return definition
+        if isinstance(definition, dict):
+            return cls.from_dict(definition)
+        return cls.from_file(definition)
+
+    def validate(self):
+        """
+        Check that every parent and dependency is an endpoint of the definition and that fan-out
+        parents are snapshots, whose whole record set is known before the children start.
+        """
+        for endpoint in self.endpoints.values():
+            for dependency in filter(None, (endpoint.parent, *endpoint.depends_on)):
+                if dependency not in self.endpoints:
+                    raise ValueError(f"Endpoint '{endpoint.name}' depends on unknown endpoint '{dependency}'")
+            if endpoint.parent and self.endpoints[endpoint.parent].window is not None:
+                raise ValueError(f"Endpoint '{endpoint.name}' fans out over '{endpoint.parent}', which is windowed")
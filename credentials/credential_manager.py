@@ -1,20 +1,35 @@
 # credentials/credential_manager.py
+import os
+import threading
 from configparser import ConfigParser
-import requests
 
 class CredentialManager:
     def __init__(self, config_path = 'config.ini'):
         self.config_path = config_path
+        # The parsed file and its modification time, so it is only parsed again once it changes
+        self.parser = None
+        self.parsed_mtime = None
+        self.lock = threading.Lock()
 
+    def get_parser(self):
+        try:
+            mtime = os.stat(self.config_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        with self.lock:
+            if self.parser is None or mtime != self.parsed_mtime:
+                parser = ConfigParser()
+                parser.read(self.config_path)
+                self.parser, self.parsed_mtime = parser, mtime
+            return self.parser
 
     def get_credentials(self, **kwargs):
         """
         Retrieve the stored credentials securely.
-        
+
         :return: dict - The credentials (e.g., API keys, database credentials).
         """
-        parser = ConfigParser()
-        parser.read(self.config_path)
+        parser = self.get_parser()
 
         credential_dict = {}
         for k, v in kwargs.items():
@@ -23,4 +38,4 @@ class CredentialManager:
             except KeyError:
                 raise KeyError("The provided key do not exist in the config file. Please check the placement of the config file or the keys defined")
 
-        return credential_dict
\ No newline at end of file
+        return credential_dict
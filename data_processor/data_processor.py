@@ -1,9 +1,17 @@
 # data_processor/data_processor.py
 import os
 import csv
+import copy
 import glob
+import json
+import hashlib
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import numpy as np
 import pandas as pd
 from utils.logger import setup_logging 
+from utils.column_types import merge_columns, format_col_definitions
 
 logger = setup_logging("data_processor")
 
@@ -11,6 +19,11 @@ class DataProcessor:
     """
     Object to process response data from an API call into a format suitable for data analysis.
     """
+    def __init__(self, metrics=None):
+        """
+        :param metrics: RunMetrics - Collector of the time spent building DataFrames and the rows built (optional).
+        """
+        self.metrics = metrics
 
     @staticmethod
     def normalize_json_to_dataframe(json_data, key=None):
@@ -22,17 +35,131 @@ class DataProcessor:
         :return: DataFrame - The normalized data as a Pandas DataFrame.
         """
         return pd.json_normalize(json_data, record_path=key)
+
+    @staticmethod
+    def fingerprint(df):
+        """
+        Stable content hash of a DataFrame, insensitive to the order of its rows and columns.
+
+        Columns are taken in name order and nested values (lists, dicts) in their sorted JSON form.
+        The rows are hashed with pandas' fixed hash key and the row hashes sorted before they are
+        digested, so the same records hash alike across runs and processes whatever order the API
+        returned them in.
+
+        :param df: DataFrame - The data to hash.
+        :return: str - Hex SHA-256 digest of the column names, their types and the rows.
+        """
+        columns = sorted(df.columns, key=str)
+        normalized = df[columns].copy()
+        for column in columns:
+            if normalized[column].dtype == object:
+                normalized[column] = normalized[column].map(
+                    lambda value: json.dumps(value, sort_keys=True, default=str) if isinstance(value, (list, dict)) else value
+                )
+        row_hashes = np.sort(pd.util.hash_pandas_object(normalized, index=False).to_numpy())
+        digest = hashlib.sha256()
+        digest.update(json.dumps([[str(column), str(normalized[column].dtype)] for column in columns]).encode('utf-8'))
+        digest.update(row_hashes.tobytes())
+        return digest.hexdigest()
     
     def list_json_to_dataframe(self, list_dict, key=None):
         """
         Convert a list of dictionaries to a Pandas DataFrame.
 
+        All records are flattened in one pass and built into a single DataFrame instead of
+        normalizing every response and concatenating the frames. Batches where the single build
+        could type a column differently from the concatenation are handed to the per-response
+        path, so the result always matches it column for column.
+
         :param list_dict: list of dicts - The list of dictionaries to convert.
         :param key: str or None - Optional key to specify which nested dictionaries to convert.
         :return: DataFrame - The concatenated DataFrame from the list of dictionaries.
         """
+        with self.metrics.stage('normalize') if self.metrics else nullcontext():
+            records = self.collect_records(list_dict, key=key)
+            if records is None:
+                df = self.list_json_to_dataframe_per_response(list_dict, key=key)
+            else:
+                df = pd.DataFrame(records)
+        if self.metrics:
+            self.metrics.inc('dataframe_rows_total', len(df))
+        return df
+
+    def list_json_to_dataframe_per_response(self, list_dict, key=None):
+        """
+        Reference implementation: normalize each response separately and concatenate the frames.
+        """
         frames = [self.normalize_json_to_dataframe(dict_unit, key=key) for dict_unit in list_dict if key is None or key in dict_unit]
         return pd.concat(frames, ignore_index=True)
+
+    @classmethod
+    def collect_records(cls, list_dict, key=None):
+        """
+        Gather the flattened records of every response into one list.
+
+        While flattening, the value types of every column are tracked per response. Concatenating
+        per-response frames only types a column like a single build would when the column holds one
+        kind of value (ints and floats counting as one) and, in every response where it appears, at
+        least one non-null value; otherwise pandas infers per response (e.g. a store with only nulls
+        becomes an object column) and the concatenation differs.
+
+        :return: list of dicts, or None when the batch must go through the per-response path.
+        """
+        records = []
+        column_types = {}
+        found = False
+        for dict_unit in list_dict:
+            if key is None:
+                units = [dict_unit]
+            elif key in dict_unit:
+                units = dict_unit[key]
+                if units is None:
+                    units = []
+                elif not isinstance(units, list):
+                    return None
+            else:
+                continue
+            found = True
+
+            present = set()
+            valued = set()
+            for record in units:
+                if not isinstance(record, dict):
+                    return None
+                record = cls.flatten_record(record)
+                records.append(record)
+                for column, value in record.items():
+                    present.add(column)
+                    if value is not None:
+                        valued.add(column)
+                        column_types.setdefault(column, set()).add(type(value))
+            if present != valued:
+                return None
+
+        if not found:
+            return None
+        for types in column_types.values():
+            if len(types) > 1 and not types <= {int, float}:
+                return None
+        return records
+
+    @classmethod
+    def flatten_record(cls, record, prefix='', level=0):
+        """
+        Flatten nested dictionaries into '.' separated keys, with the same key order as pd.json_normalize.
+        """
+        if level == 0 and not any(isinstance(value, dict) for value in record.values()):
+            return record
+        flat = dict(record)
+        for k, v in record.items():
+            new_key = k if level == 0 else f"{prefix}.{k}"
+            if not isinstance(v, dict):
+                if level != 0:
+                    flat[new_key] = flat.pop(k)
+                continue
+            flat.pop(k)
+            flat.update(cls.flatten_record(v, new_key, level + 1))
+        return flat
     
 
 class ColumnMismatch:
@@ -66,17 +193,121 @@ class ColumnMismatch:
 
 
 class LocalStageOrchestrator:
-    def __init__(self, staging_location) -> None:
+    file_extensions = {'csv': '.csv', 'parquet': '.parquet'}
+
+    # Rows sampled to estimate the memory a chunk of rows needs, and the multiple of the raw
+    # chunk size that reading, preprocessing and writing hold at the same time
+    memory_sample_rows = 1000
+    chunk_memory_overhead = 4
+
+    # Single pass equivalent of the three scrub patterns: escaped \t \n \r sequences,
+    # literal tab/newline/carriage return characters and double quotes
+    special_characters = r'\\[tnr]|[\t\n\r"]'
+
+    def __init__(self, staging_location, file_format='csv', preprocess_engine='vectorized', processes=1,
+                 chunk_rows=None, memory_budget=None, metrics=None) -> None:
+        """
+        :param staging_location: str - Directory the staged files are written to.
+        :param file_format: str - 'csv' for quoted, '~' delimited text or 'parquet' for typed, compressed columnar files.
+        :param preprocess_engine: str - 'vectorized' (column-wise) or 'legacy' (row-wise reference) CSV preprocessing.
+        :param processes: int - Worker processes for process_flat_files. 1 processes the files serially.
+        :param chunk_rows: int - Stream CSV inputs through preprocessing in chunks of this many rows (optional).
+        :param memory_budget: int - Bytes a single file may hold in memory; sizes the chunks when chunk_rows is not given (optional).
+        :param metrics: RunMetrics - Collector of the preprocessing time and the files, rows and bytes staged (optional).
+        """
+        if file_format not in self.file_extensions:
+            raise ValueError(f"Unsupported staging format '{file_format}'. Only 'csv' and 'parquet' are supported.")
         # Configuration parameters
         self.sentinel_value = "0001-01-01 00:00:00.000"
         self.datetime_format = "%Y-%m-%d %H:%M:%S.%f"
         self.staging_location = staging_location
         self.column_context = None
+        self.file_format = file_format
+        self.file_extension = self.file_extensions[file_format]
+        self.preprocess_engine = preprocess_engine
+        self.processes = processes
+        self.chunk_rows = chunk_rows
+        self.memory_budget = memory_budget
+        self.metrics = metrics
         
-    def preprocess(self, df):
+    def preprocess(self, df, mixed_columns=()):
         """
         Clean the DataFrame: replace 'NaT' values, convert datetime columns to strings,
         and convert columns with more than one type to string
+
+        :param mixed_columns: iterable - Columns known to be mixed-type across the whole file, converted
+            to string even when this DataFrame (a chunk of the file) holds a single type.
+        """
+        if self.file_format == 'parquet':
+            return self.preprocess_parquet(df, mixed_columns)
+        if self.preprocess_engine == 'legacy':
+            return self.preprocess_legacy(df, mixed_columns)
+
+        # Column-wise datetime conversion and 'NaT' replacement
+        datetime_cols = df.select_dtypes(include=['datetime64[ns]', '<M8[ns]']).columns
+        for column in datetime_cols:
+            df[column] = df[column].dt.strftime(self.datetime_format).fillna(self.sentinel_value)
+
+        # Column level adjustments
+        string_cols = []
+        for column in df.columns:
+            # Convert columns with mixed data types into string
+            if column in mixed_columns or self.has_mixed_types(df[column]):
+                df[column] = df[column].astype(str)
+                string_cols.append(column)
+
+            # check if the column contains numeric values and replace with null
+            elif pd.api.types.is_numeric_dtype(df[column]):
+                df[column] = df[column].fillna('NULL')
+
+            elif df[column].dtype == object:
+                string_cols.append(column)
+
+        # Remove any special characters from the text columns: pure string columns take a
+        # single-pass regex, object columns holding other values keep the frame level replace
+        pure_string_cols = [column for column in string_cols if pd.api.types.infer_dtype(df[column], skipna=False) == 'string']
+        other_object_cols = [column for column in string_cols if column not in pure_string_cols]
+        try:
+            if other_object_cols:
+                df[other_object_cols] = df[other_object_cols].replace(to_replace=[r"\\t|\\n|\\r", "\\t|\\n|\\r",'"'], value=["","",""], regex=True)
+        except ValueError:
+            df.replace("\\n", "", inplace=True)
+            return df
+        except Exception as e:
+            logger.error(f"Error while replacing special characters: {e}")
+            raise
+        for column in pure_string_cols:
+            df[column] = df[column].str.replace(self.special_characters, '', regex=True)
+
+        return df
+
+    @staticmethod
+    def has_mixed_types(series):
+        """
+        Vectorized equivalent of `series.apply(type).nunique() > 1`.
+
+        NumPy dtypes hold one scalar type, NaT aside; for the others pandas' type inference
+        reports mixed values, and a single kind of values only mixes with the nulls next to it.
+        Object columns inference cannot pin to one kind, such as nested lists and dicts, count
+        as mixed too, so no column is scanned value by value.
+        """
+        dtype = series.dtype
+        if isinstance(dtype, np.dtype) and dtype.kind != 'O':
+            if dtype.kind in 'mM':
+                notna = series.notna()
+                return bool(notna.any() and not notna.all())
+            return False
+        inferred = pd.api.types.infer_dtype(series, skipna=False)
+        if inferred in ('mixed', 'mixed-integer', 'mixed-integer-float', 'integer-na'):
+            # A column of nothing but nulls holds a single type
+            return not (inferred == 'mixed' and series.isna().all())
+        if inferred in ('empty', 'string', 'floating'):
+            return False
+        return bool(series.isna().any())
+
+    def preprocess_legacy(self, df, mixed_columns=()):
+        """
+        Row-wise reference implementation of preprocess, kept for comparison and benchmarking.
         """
 
         # Vectorized operation for datetime columns conversion and 'NaT' replacement
@@ -86,7 +317,7 @@ class LocalStageOrchestrator:
         # Column level adjustments
         for column in df.columns:
             # Convert columns with mixed data types into string
-            if df[column].apply(type).nunique() > 1:
+            if column in mixed_columns or df[column].apply(type).nunique() > 1:
                 df[column] = df[column].astype(str)
             
             # check if the column contains numeric values and replace with null
@@ -104,14 +335,31 @@ class LocalStageOrchestrator:
 
         return df
 
-    def stage_locally(self, df ,file_path):
+    def preprocess_parquet(self, df, mixed_columns=()):
+        """
+        Prepare the DataFrame for Parquet: native types, nulls and special characters are kept
+        as they are, only columns mixing several non-null types are converted to string.
+        """
+        for column in df.columns:
+            if column in mixed_columns or self.has_mixed_types(df[column].dropna()):
+                df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+        return df
+
+    def stage_locally(self, df ,file_path, append=False):
         """
         Preprocess the DataFrame and save it as a CSV file
+
+        :param append: bool - Append the rows to an existing CSV file without repeating the header.
         """
+        if self.file_format == 'parquet':
+            return self.stage_parquet(df, file_path)
+
         # Export the DataFrame to a CSV file
         try:
             df.to_csv(
                 file_path,
+                mode='a' if append else 'w',
+                header=not append,
                 index=False,
                 sep='~',
                 encoding='utf-8',
@@ -125,13 +373,33 @@ class LocalStageOrchestrator:
             logger.error(f"Error while saving DataFrame to CSV: {e}")
             return False
         
+    def stage_parquet(self, df, file_path):
+        """
+        Save the DataFrame as a Snappy compressed Parquet file
+        """
+        try:
+            df.to_parquet(
+                file_path,
+                index=False,
+                engine='pyarrow',
+                compression='snappy',
+                coerce_timestamps='us',  # Snowflake reads microsecond timestamps natively
+                allow_truncated_timestamps=True
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error while saving DataFrame to Parquet: {e}")
+            return False
+
     def generate_col_definitions(self, df):
-        column_definitions = [f'"{col}" {self.map_dtype_to_snowflake(dtype)}' for col, dtype in zip(df.columns, df.dtypes)]
+        column_definitions = [f'"{col}" {self.map_dtype_to_snowflake(dtype, self.file_format)}' for col, dtype in zip(df.columns, df.dtypes)]
         return ', '.join(column_definitions)
 
     @staticmethod
-    def map_dtype_to_snowflake(dtype):
-        if pd.api.types.is_integer_dtype(dtype):
+    def map_dtype_to_snowflake(dtype, file_format='csv'):
+        if pd.api.types.is_bool_dtype(dtype) and file_format == 'parquet':
+            return 'BOOLEAN'
+        elif pd.api.types.is_integer_dtype(dtype):
             return 'NUMBER'
         elif pd.api.types.is_float_dtype(dtype):
             return 'FLOAT'
@@ -139,43 +407,238 @@ class LocalStageOrchestrator:
             return 'TIMESTAMP'
         return 'TEXT'  # Default to TEXT for string and other types
 
+    def for_staging_location(self, staging_location):
+        """
+        Return an orchestrator with the same settings that stages into another directory,
+        e.g. one per dataset so several datasets can be staged and loaded side by side.
+        """
+        orchestrator = copy.copy(self)
+        orchestrator.staging_location = staging_location
+        return orchestrator
+
+    @staticmethod
+    def is_flat_file(file_path):
+        file_name = os.path.basename(file_path)
+        return os.path.isfile(file_path) and file_name.endswith(('.xlsx', '.XLSX', '.xls', '.csv'))
+
+    def process_file(self, input_location, file_name):
+        """
+        Read, clean and stage a single flat file.
+
+        :return: tuple - The columns as read (for the mismatch check), the (column, dtype)
+            pairs of the staged DataFrame (for the column definitions) and the number of rows staged.
+        """
+        file_path = os.path.join(input_location, file_name)
+        if file_name.endswith('.csv') and (self.chunk_rows or self.memory_budget):
+            return self.process_file_chunked(input_location, file_name)
+        try:
+            if file_name.endswith('.xlsx') or file_name.endswith('.XLSX') or file_name.endswith('.xls'):
+                # Read the Excel file
+                df = pd.read_excel(file_path)
+            else:
+                df = pd.read_csv(file_path)
+        except Exception as e:
+            logger.error(f"Error while reading the files in the input folder: {e}")
+            raise
+        read_columns = list(df.columns)
+
+        # Clean the DataFrame
+        df = self.preprocess(df)
+        
+        # Add Column for file identifier
+        df['File Name'] = file_name
+        
+        # Save the DataFrame as a CSV file
+        stage_file_path = os.path.join(self.staging_location, f'{os.path.splitext(file_name)[0]}{self.file_extension}')
+        self.stage_locally(df, stage_file_path)
+
+        return read_columns, list(zip(df.columns, df.dtypes)), len(df)
+
+    def get_chunk_rows(self, file_path):
+        """
+        Rows per chunk: `chunk_rows` if set, otherwise estimated from the memory a sample of
+        the file takes once loaded, so that a chunk and its working copies fit the memory budget.
+        """
+        if self.chunk_rows:
+            return self.chunk_rows
+        sample = pd.read_csv(file_path, nrows=self.memory_sample_rows)
+        bytes_per_row = sample.memory_usage(index=True, deep=True).sum() / max(len(sample), 1)
+        return max(1, int(self.memory_budget // (bytes_per_row * self.chunk_memory_overhead)))
+
+    @staticmethod
+    def merge_dtypes(left, right):
+        """
+        Widen two dtypes of the same column the way a whole-file read would type it:
+        integers and floats give float, any other disagreement gives object.
+        """
+        if left is None or left == right:
+            return right
+        if pd.api.types.is_numeric_dtype(left) and pd.api.types.is_numeric_dtype(right) \
+                and not pd.api.types.is_bool_dtype(left) and not pd.api.types.is_bool_dtype(right):
+            return np.dtype('float64')
+        return np.dtype('object')
+
+    def scan_csv(self, file_path, chunk_rows):
+        """
+        Resolve the column types of a CSV file chunk by chunk, before any chunk is staged.
+
+        :return: tuple - The columns as read, the dtype to read each column with, the columns
+            that are mixed-type (text with gaps) over the whole file, and the object columns that
+            only hold booleans and gaps.
+        """
+        dtypes = {}
+        null_counts = {}
+        value_counts = {}
+        boolean_only = {}
+        for chunk in pd.read_csv(file_path, chunksize=chunk_rows):
+            for column in chunk.columns:
+                dtypes[column] = self.merge_dtypes(dtypes.get(column), chunk[column].dtype)
+                nulls = int(chunk[column].isna().sum())
+                null_counts[column] = null_counts.get(column, 0) + nulls
+                value_counts[column] = value_counts.get(column, 0) + len(chunk) - nulls
+                boolean_only[column] = boolean_only.get(column, True) and (
+                    nulls == len(chunk) or pd.api.types.infer_dtype(chunk[column], skipna=True) == 'boolean'
+                )
+        # Text columns are read as str in every chunk; once they hold gaps anywhere they are
+        # mixed-type for the whole file, as in a whole-file pass
+        read_dtypes = {column: (str if dtype == object else dtype) for column, dtype in dtypes.items()}
+        mixed_columns = {
+            column for column, dtype in dtypes.items()
+            if dtype == object and null_counts[column] and value_counts[column]
+        }
+        boolean_columns = {
+            column for column, dtype in dtypes.items()
+            if dtype == object and boolean_only[column] and value_counts[column]
+        }
+        return list(dtypes), read_dtypes, mixed_columns, boolean_columns
+
+    def process_file_chunked(self, input_location, file_name):
+        """
+        Read, clean and stage a CSV file in chunks with bounded memory.
+
+        A first pass settles the type of every column over the whole file; the second pass reads
+        each chunk with those types, preprocesses it and appends it to the staging file, so a
+        column that only turns mixed-type late in the file is staged the same in every chunk.
+        """
+        file_path = os.path.join(input_location, file_name)
+        stage_file_path = os.path.join(self.staging_location, f'{os.path.splitext(file_name)[0]}{self.file_extension}')
+        try:
+            chunk_rows = self.get_chunk_rows(file_path)
+            read_columns, read_dtypes, mixed_columns, boolean_columns = self.scan_csv(file_path, chunk_rows)
+            if self.file_format == 'parquet':
+                # Parquet keeps gaps as nulls, so text with gaps is not mixed-type there,
+                # and booleans with gaps stay booleans rather than text
+                mixed_columns = set()
+                for column in boolean_columns:
+                    del read_dtypes[column]
+            chunks = pd.read_csv(file_path, chunksize=chunk_rows, dtype=read_dtypes)
+        except Exception as e:
+            logger.error(f"Error while reading the files in the input folder: {e}")
+            raise
+
+        staged_dtypes = {}
+        staged_rows = 0
+        parquet_writer = None
+        try:
+            for chunk in chunks:
+                if self.file_format == 'parquet':
+                    for column in boolean_columns:
+                        chunk[column] = chunk[column].astype(object)
+                chunk = self.preprocess(chunk, mixed_columns)
+                chunk['File Name'] = file_name
+                if self.file_format == 'parquet':
+                    parquet_writer = self.stage_parquet_chunk(chunk, stage_file_path, parquet_writer, boolean_columns)
+                else:
+                    self.stage_locally(chunk, stage_file_path, append=bool(staged_dtypes))
+                for column, dtype in chunk.dtypes.items():
+                    staged_dtypes[column] = dtype if staged_dtypes.get(column, dtype) == dtype else np.dtype('object')
+                staged_rows += len(chunk)
+        finally:
+            if parquet_writer is not None:
+                parquet_writer.close()
+
+        logger.info(f"Staged {file_name} in chunks of {chunk_rows} rows")
+        return read_columns, list(staged_dtypes.items()), staged_rows
+
+    def stage_parquet_chunk(self, df, file_path, writer=None, boolean_columns=()):
+        """
+        Append a chunk to a Parquet file, opening the writer on the first chunk.
+
+        The schema is fixed from the column dtypes rather than inferred per chunk, so a text
+        column that happens to be empty in the first chunk is still written as a string column.
+
+        :param boolean_columns: iterable - Object columns holding booleans, written as boolean.
+        :return: pyarrow.parquet.ParquetWriter - The writer to pass with the next chunk.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if writer is None:
+            schema = pa.schema([
+                (column, pa.bool_() if column in boolean_columns else pa.string() if dtype == object else pa.from_numpy_dtype(dtype))
+                for column, dtype in df.dtypes.items()
+            ])
+            writer = pq.ParquetWriter(file_path, schema, compression='snappy', coerce_timestamps='us', allow_truncated_timestamps=True)
+        writer.write_table(pa.Table.from_pandas(df, schema=writer.schema, preserve_index=False))
+        return writer
+
     def process_flat_files(self, input_location):
         """
-        Process Excel files: read the files, clean the data, and save it as CSV files
+        Process Excel files: read the files, clean the data, and save it as CSV files.
+
+        With `processes` > 1 the files are handled by a process pool. Results are collected in
+        directory order, so the column mismatch log and the column definitions are the same as
+        in serial mode.
+
+        :return: str - Column definitions covering every staged file: columns are merged in the
+            order they are first seen and their types widened across files.
         """
-        for i, file_name in enumerate(os.listdir(input_location), start=1):
-            file_path = os.path.join(input_location, file_name)
-            try:
-                if (file_name.endswith('.xlsx') or file_name.endswith('.XLSX') or file_name.endswith('.xls')) and os.path.isfile(file_path):
-                    # Read the Excel file
-                    df = pd.read_excel(file_path)
-                elif file_name.endswith('.csv') and os.path.isfile(file_path):
-                    df = pd.read_csv(file_path)
-            except Exception as e:
-                logger.error(f"Error while reading the files in the input folder: {e}")
-                raise
+        file_names = [
+            file_name for file_name in os.listdir(input_location)
+            if self.is_flat_file(os.path.join(input_location, file_name))
+        ]
+        if not file_names:
+            logger.warning(f"No flat files found in {input_location}")
+            return ''
 
+        dataset = os.path.basename(os.path.normpath(input_location))
+        with self.metrics.stage('preprocess', dataset=dataset) if self.metrics else nullcontext():
+            if self.processes > 1 and len(file_names) > 1:
+                with ProcessPoolExecutor(max_workers=min(self.processes, len(file_names))) as executor:
+                    results = list(executor.map(self.process_file, repeat(input_location), file_names))
+            else:
+                results = [self.process_file(input_location, file_name) for file_name in file_names]
+
+        log_col_mismatch = None
+        column_types = {}
+        for file_name, (read_columns, column_dtypes, rows) in zip(file_names, results):
+            if self.metrics:
+                stage_file_path = os.path.join(self.staging_location, f'{os.path.splitext(file_name)[0]}{self.file_extension}')
+                self.record_staged_file(dataset, stage_file_path, rows)
             # Log Column mismatch if any
-            if i == 1:
-                log_col_mismatch = ColumnMismatch(column_context=set(df.columns))
-            log_col_mismatch.log_column_mismatch(df, file_name)
-            
-            # Clean the DataFrame
-            df = self.preprocess(df)
-            
-            # Add Column for file identifier
-            df['File Name'] = file_name
-            
-            # Save the DataFrame as a CSV file
-            stage_file_path = os.path.join(self.staging_location, f'{os.path.splitext(file_name)[0]}.csv')
-            self.stage_locally(df, stage_file_path)
+            if log_col_mismatch is None:
+                log_col_mismatch = ColumnMismatch(column_context=set(read_columns))
+            log_col_mismatch.log_column_mismatch(pd.DataFrame(columns=read_columns), file_name)
+            merge_columns(
+                column_types,
+                [(col, self.map_dtype_to_snowflake(dtype, self.file_format)) for col, dtype in column_dtypes]
+            )
 
         logger.info(f"Contents of {input_location} have successfully been staged in {self.staging_location}")
         
-        column_definition = self.generate_col_definitions(df)
+        column_definition = format_col_definitions(column_types)
 
         return column_definition
     
+    def record_staged_file(self, dataset, stage_file_path, rows):
+        """
+        Count a staged file, its rows and its size on disk in the attached metrics.
+        """
+        self.metrics.inc('files_staged_total', dataset=dataset)
+        self.metrics.inc('rows_staged_total', rows, dataset=dataset)
+        if os.path.isfile(stage_file_path):
+            self.metrics.inc('bytes_staged_total', os.path.getsize(stage_file_path), dataset=dataset)
+
     def delete_folder_contents(self,folder_path):
         """
         Recursively delete the contents of a folder.
@@ -192,8 +655,120 @@ class LocalStageOrchestrator:
         except Exception as e:
             logger.error(f"Error while deleting folder contents: {e}", exc_info=True)
             raise
-    
 
 
+class StreamingStageWriter:
+    """
+    Stage DataFrames straight into a Snowflake stage directory, one batch at a time.
+
+    Each batch goes through LocalStageOrchestrator.preprocess once and is written as a
+    staging file, skipping the intermediate CSV file that process_flat_files would read back.
+    Its columns are first typed the way pd.read_csv types them in the file based path (see
+    type_like_csv), so both paths create the same table.
+    Column definitions are accumulated across batches and persisted next to the staged
+    files so that a resumed run still knows the columns of batches staged before it.
+    """
+    columns_file = '.columns.json'
+
+    # pd.read_csv's default na_values, which the file based path reads as nulls
+    na_values = frozenset([
+        '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+        '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+    ])
+    boolean_values = {'True': True, 'TRUE': True, 'true': True, 'False': False, 'FALSE': False, 'false': False}
+
+    def __init__(self, orchestrator, stage_location) -> None:
+        self.orchestrator = orchestrator
+        self.stage_location = stage_location
+        self.column_types = {}
+        self.log_col_mismatch = None
+        self.columns_path = os.path.join(stage_location, self.columns_file)
+        if os.path.isfile(self.columns_path):
+            with open(self.columns_path, 'r') as file:
+                self.column_types = json.load(file)
 
+    def write_batch(self, df, file_name):
+        """
+        Preprocess a batch and write it into the stage directory.
+
+        :param df: DataFrame - The normalized batch.
+        :param file_name: str - Identifier recorded in the 'File Name' column; also names the staged file.
+        :return: bool - True if the batch was staged.
+        """
+        metrics = self.orchestrator.metrics
+        dataset = os.path.basename(os.path.normpath(self.stage_location))
+        with metrics.stage('preprocess', dataset=dataset) if metrics else nullcontext():
+            staged, stage_file_path = self.stage_batch(df, file_name)
+        if metrics and staged:
+            self.orchestrator.record_staged_file(dataset, stage_file_path, len(df))
+        return staged
+
+    def stage_batch(self, df, file_name):
+        """
+        :return: tuple - Whether the batch was staged and the path of the staged file.
+        """
+        df = self.type_like_csv(df)
+
+        # Log Column mismatch if any
+        if self.log_col_mismatch is None:
+            self.log_col_mismatch = ColumnMismatch(column_context=set(df.columns))
+        self.log_col_mismatch.log_column_mismatch(df, file_name)
+
+        df = self.orchestrator.preprocess(df)
+        df['File Name'] = file_name
+
+        merge_columns(
+            self.column_types,
+            [(col, self.orchestrator.map_dtype_to_snowflake(dtype, self.orchestrator.file_format)) for col, dtype in zip(df.columns, df.dtypes)]
+        )
+
+        stage_file_path = os.path.join(self.stage_location, f'{os.path.splitext(file_name)[0]}{self.orchestrator.file_extension}')
+        staged = self.orchestrator.stage_locally(df, stage_file_path)
 
+        # Persist the accumulated definitions atomically alongside the staged files
+        tmp_path = f"{self.columns_path}.tmp"
+        with open(tmp_path, 'w') as file:
+            json.dump(self.column_types, file)
+        os.replace(tmp_path, self.columns_path)
+        return staged, stage_file_path
+
+    @classmethod
+    def type_like_csv(cls, df):
+        """
+        Type a batch the way writing it to the intermediate CSV file and reading it back with pd.read_csv
+        does, without the text round trip: the row index becomes the 'Unnamed: 0' column, and the values
+        of every other column that is not numeric or boolean are taken as their text, with pd.read_csv's
+        null markers as nulls, numeric text as numbers and all-boolean text as booleans.
+        """
+        df = df.reset_index(drop=True)
+        if df.empty:
+            # A file of headers only reads back as text columns
+            return pd.DataFrame({column: pd.Series([], dtype=object) for column in ['Unnamed: 0', *df.columns]})
+        columns = {'Unnamed: 0': pd.Series(np.arange(len(df), dtype='int64'))}
+        for column in df.columns:
+            series = df[column]
+            if isinstance(series.dtype, np.dtype) and series.dtype.kind in 'biuf':
+                columns[column] = series
+                continue
+            values = series[series.notna()].astype(str)
+            values = values[~values.isin(cls.na_values)]
+            try:
+                values = pd.to_numeric(values)
+            except (ValueError, TypeError):
+                if values.isin(cls.boolean_values.keys()).all():
+                    values = values.map(cls.boolean_values)
+            # Nulls turn integers into floats, and a column of nulls only reads back as floats
+            columns[column] = values.reindex(series.index).infer_objects()
+        return pd.DataFrame(columns)
+
+    def generate_col_definitions(self):
+        return format_col_definitions(self.column_types)
+
+    def reset(self):
+        """
+        Forget the accumulated columns, e.g. after the staged files have been loaded.
+        """
+        self.column_types = {}
+        self.log_col_mismatch = None
+        if os.path.isfile(self.columns_path):
+            os.remove(self.columns_path)
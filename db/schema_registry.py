@@ -0,0 +1,99 @@
+import os
+import json
+import sqlite3
+import datetime as dt
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+from utils.logger import setup_logging
+from utils.column_types import normalize_type, widen_type, merge_columns, parse_col_definitions, format_col_definitions
+
+# Set up logging
+logger = setup_logging(name='schema_registry')
+
+class SchemaRegistry:
+    """
+    Keeps track of table schemas as ordered {column: Snowflake type} mappings.
+
+    Column sets of staged files are merged and their types widened so that a table is
+    defined from every file of a load, not just the last one. The schema last seen for
+    each remote table is cached locally in SQLite, so a load only has to go back to
+    INFORMATION_SCHEMA when the cache is empty or has been invalidated.
+    """
+    # The column type helpers, shared with the staging of files in data_processor
+    normalize_type = staticmethod(normalize_type)
+    widen_type = staticmethod(widen_type)
+    merge_columns = staticmethod(merge_columns)
+    parse_col_definitions = staticmethod(parse_col_definitions)
+    format_col_definitions = staticmethod(format_col_definitions)
+
+    def __init__(self, db_path: str = '.', db_file: str = 'schemas.db') -> None:
+        """
+        Parameters:
+        - db_path: Directory of the SQLite file caching the remote table schemas.
+        - db_file: Name of that SQLite file.
+        """
+        self.db_file = os.path.join(db_path, db_file)
+        with self.connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS table_schemas (
+                    table_name TEXT PRIMARY KEY,
+                    columns TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )"""
+            )
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Open a short lived connection; the block commits on success and rolls back on error."""
+        conn = sqlite3.connect(self.db_file, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @classmethod
+    def diff(cls, known: Dict[str, str], desired: Dict[str, str]) -> Tuple[Dict[str, str], Dict[str, Tuple[str, str]]]:
+        """
+        Compare the desired columns of a load with the known columns of a table.
+
+        Column names are compared case-insensitively, the way COPY ... MATCH_BY_COLUMN_NAME
+        = 'CASE_INSENSITIVE' matches them.
+
+        Returns:
+        - The columns missing from the table, in load order.
+        - The columns whose known type cannot hold the loaded type, as {column: (known, widened)}.
+        """
+        known_by_name = {column.upper(): sf_type for column, sf_type in known.items()}
+        added = {}
+        conflicts = {}
+        for column, sf_type in desired.items():
+            known_type = known_by_name.get(column.upper())
+            if known_type is None:
+                added[column] = sf_type
+                continue
+            widened = cls.widen_type(known_type, sf_type)
+            if widened != cls.normalize_type(known_type):
+                conflicts[column] = (known_type, widened)
+        return added, conflicts
+
+    def get(self, table_name: str) -> Optional[Dict[str, str]]:
+        """Return the cached columns of a table, or None if the table is not cached."""
+        with self.connection() as conn:
+            row = conn.execute("SELECT columns FROM table_schemas WHERE table_name = ?", (table_name.upper(),)).fetchone()
+        return None if row is None else dict(json.loads(row[0]))
+
+    def put(self, table_name: str, columns: Dict[str, str]) -> None:
+        """Cache the columns of a table."""
+        with self.connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO table_schemas (table_name, columns, updated_at) VALUES (?, ?, ?)",
+                (table_name.upper(), json.dumps(list(columns.items())), dt.datetime.now().isoformat())
+            )
+
+    def invalidate(self, table_name: str) -> None:
+        """Forget the cached columns of a table, e.g. after a load against it failed."""
+        with self.connection() as conn:
+            conn.execute("DELETE FROM table_schemas WHERE table_name = ?", (table_name.upper(),))
+        logger.info(f"Invalidated cached schema of {table_name}")
@@ -1,6 +1,10 @@
-from contextlib import contextmanager
-from typing import Tuple, Dict, Any, Optional
-from utils.utils import has_csv_files, py_file_name
+import time
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import Tuple, Dict, Any, Optional, Iterator, List
+from utils.utils import fan_out, has_files, py_file_name
+from db.schema_registry import SchemaRegistry
+from utils.metrics import RunMetrics
 import snowflake.connector
 import datetime as dt
 from utils.logger import setup_logging
@@ -14,20 +18,74 @@ class DataLoader:
     A class to load data into Snowflake using Python best practices, including dynamic configuration,
     improved error handling, and a Pythonic approach to resource management and documentation.
     """
-    def __init__(self) -> None:
+    file_formats = {
+        'csv': ('.csv', 'CSV_LOCAL_DEVICE_UPLOAD'),
+        'parquet': ('.parquet', 'PARQUET_LOCAL_DEVICE_UPLOAD'),
+    }
+
+    def __init__(self, staging_format: str = 'csv', persistent_session: bool = False, health_check_interval: int = 300,
+                 schema_registry: Optional[SchemaRegistry] = None, metrics: Optional[RunMetrics] = None,
+                 credentials: Optional[CredentialManager] = None) -> None:
+        """
+        Parameters:
+        - staging_format: Format of the locally staged files, 'csv' or 'parquet'.
+        - persistent_session: Keep one Snowflake session open across statements and loads instead of
+          logging in for every statement. Call close() (or use the loader as a context manager) when done.
+        - health_check_interval: Seconds a reused session may sit idle before it is probed with SELECT 1.
+        - schema_registry: Cache of the remote table schemas. When given, tables are created once and only
+          altered when the loaded columns drift, instead of being checked and recreated on every load.
+        - metrics: Collector of the query IDs and elapsed time of every statement, the rows loaded per
+          table and the time and outcome of every table load.
+        - credentials: Source of the connection details, e.g. one shared with the API login so config.ini
+          is parsed once; a CredentialManager reading config.ini by default.
+        """
+        if staging_format not in self.file_formats:
+            raise ValueError(f"Unsupported staging format '{staging_format}'. Only 'csv' and 'parquet' are supported.")
+        self.staging_format = staging_format
+        self.file_extension, self.file_format_name = self.file_formats[staging_format]
 
         # Initializing helper objects
-        self.credentials = CredentialManager()
+        self.credentials = credentials or CredentialManager()
 
         # Classes level initializations
         self.conn_details = self.prepare_conn_details()
         self.timestamp = dt.datetime.now().strftime("%Y%m%d%H%M%S")
+        self._load_state = threading.local()
         self.stage_name: Optional[str] = None
         self.table_name: Optional[str] = None
         self.snowflake_database = self.conn_details['database']
         self.snowflake_schema = self.conn_details['schema']
+        self.schema_registry = schema_registry
+        self.metrics = metrics
+
+        # Session reuse
+        self.persistent_session = persistent_session
+        self.health_check_interval = health_check_interval
+        self._session: Optional[snowflake.connector.SnowflakeConnection] = None
+        self._session_last_used = 0.0
+        self._session_lock = threading.Lock()
+        self._session_users = 0
+        self._pinned = threading.local()
         
 
+    # The stage and table of a load are kept per thread, so loads running concurrently on
+    # different threads (see load_tables) never see each other's names.
+    @property
+    def stage_name(self) -> Optional[str]:
+        return getattr(self._load_state, 'stage_name', None)
+
+    @stage_name.setter
+    def stage_name(self, value: Optional[str]) -> None:
+        self._load_state.stage_name = value
+
+    @property
+    def table_name(self) -> Optional[str]:
+        return getattr(self._load_state, 'table_name', None)
+
+    @table_name.setter
+    def table_name(self, value: Optional[str]) -> None:
+        self._load_state.table_name = value
+
     def prepare_conn_details(self) -> Dict[str, str]:
         """Prepare the connection details using environment variables or config file settings."""
         details = self.credentials.get_credentials(
@@ -41,10 +99,9 @@ class DataLoader:
         )
         return details
 
-    @contextmanager
-    def snowflake_connection(self) -> snowflake.connector.SnowflakeConnection:
-        """Context manager for Snowflake connection, ensuring it's closed after use."""
-        conn = snowflake.connector.connect(
+    def connect(self) -> snowflake.connector.SnowflakeConnection:
+        """Open a new Snowflake connection."""
+        return snowflake.connector.connect(
             user=self.conn_details['user'],
             password=self.conn_details['password'],
             account=self.conn_details['account'],
@@ -53,34 +110,258 @@ class DataLoader:
             schema=self.conn_details['schema'],
             role=self.conn_details['role'],
         )
+
+    def is_healthy(self, conn: snowflake.connector.SnowflakeConnection) -> bool:
+        """Check that a connection is open and, if it has been idle for a while, still answers queries."""
+        if conn is None or conn.is_closed():
+            return False
+        if time.monotonic() - self._session_last_used < self.health_check_interval:
+            return True
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT 1")
+            finally:
+                cursor.close()
+            return True
+        except Exception as e:
+            logger.warning(f"Snowflake session failed health check, reconnecting: {e}")
+            return False
+
+    def get_session(self, hold: bool = False) -> snowflake.connector.SnowflakeConnection:
+        """
+        Return the shared long-lived session, logging in again if it is missing or unhealthy. A session
+        another thread holds (see shared_session) is neither probed nor replaced, unless it has closed.
+
+        Parameters:
+        - hold: Count the caller as a holder of the session, atomically with the check; release it through
+          shared_session, which is the only caller passing True.
+        """
+        with self._session_lock:
+            held = self._session_users > 0 and self._session is not None and not self._session.is_closed()
+            if not held and not self.is_healthy(self._session):
+                if self._session is not None and not self._session.is_closed():
+                    self._session.close()
+                self._session = self.connect()
+                logger.info("Opened Snowflake session")
+            self._session_last_used = time.monotonic()
+            if hold:
+                self._session_users += 1
+            return self._session
+
+    @contextmanager
+    def shared_session(self) -> Iterator[snowflake.connector.SnowflakeConnection]:
+        """Hold the shared session for the block, so no other thread closes or replaces it meanwhile."""
+        conn = self.get_session(hold=True)
         try:
             yield conn
         finally:
-            conn.close()
+            with self._session_lock:
+                self._session_users -= 1
 
-    def execute_query(self, query: str) -> str:
-        """Execute a query against the Snowflake database and return the query ID."""
+    @contextmanager
+    def snowflake_connection(self) -> Iterator[snowflake.connector.SnowflakeConnection]:
+        """
+        Context manager for Snowflake connection. Yields the connection pinned by session() or the
+        persistent session when one is in use; otherwise a fresh connection that is closed after use.
+        """
+        pinned = getattr(self._pinned, 'conn', None)
+        if pinned is not None:
+            yield pinned
+        elif self.persistent_session:
+            with self.shared_session() as conn:
+                yield conn
+        else:
+            conn = self.connect()
+            try:
+                yield conn
+            finally:
+                conn.close()
+
+    @contextmanager
+    def session(self, dedicated: bool = False) -> Iterator[snowflake.connector.SnowflakeConnection]:
+        """
+        Pin one connection for every statement issued by this thread inside the block, so a
+        multi-statement load logs in once. Nested blocks reuse the outer connection.
+
+        Parameters:
+        - dedicated: Open a connection of its own even when a persistent session is in use, so
+          statements of this thread run concurrently with those of other threads.
+        """
+        if getattr(self._pinned, 'conn', None) is not None:
+            yield self._pinned.conn
+            return
+        owned = dedicated or not self.persistent_session
+        with self.shared_session() if not owned else nullcontext(self.connect()) as conn:
+            self._pinned.conn = conn
+            try:
+                yield conn
+            finally:
+                self._pinned.conn = None
+                if owned:
+                    conn.close()
+
+    @contextmanager
+    def cursor(self) -> Iterator[snowflake.connector.cursor.SnowflakeCursor]:
+        """Context manager yielding a cursor on the current connection and closing it after use."""
         with self.snowflake_connection() as conn:
             cursor = conn.cursor()
             try:
-                cursor.execute(query)
-                return cursor.sfqid
+                yield cursor
             finally:
                 cursor.close()
 
+    @contextmanager
+    def transaction(self) -> Iterator[snowflake.connector.cursor.SnowflakeCursor]:
+        """
+        Run the statements of the block in one explicit transaction on a pinned session, committing
+        on success and rolling back on error. Snowflake commits DDL implicitly, so only DML belongs here.
+        """
+        with self.session():
+            with self.cursor() as cursor:
+                cursor.execute("BEGIN")
+                try:
+                    yield cursor
+                except Exception:
+                    cursor.execute("ROLLBACK")
+                    raise
+                else:
+                    cursor.execute("COMMIT")
+
+    def execute_query(self, query: str) -> str:
+        """Execute a query against the Snowflake database and return the query ID."""
+        return self.execute_statement(query)[0]
+
+    def execute_statement(self, query: str) -> Tuple[str, Optional[int]]:
+        """Execute a query and return the query ID and the rows it loaded, inserted or updated, if it reports any."""
+        with self.cursor() as cursor:
+            start = time.monotonic()
+            cursor.execute(query)
+            rows = self.affected_rows(cursor)
+            self.record_query(cursor.sfqid, query, time.monotonic() - start, rows)
+            return cursor.sfqid, rows
+
+    def run_query(self, cursor: snowflake.connector.cursor.SnowflakeCursor, query: str) -> None:
+        """Execute a query on a cursor whose result the caller fetches, recording its elapsed time."""
+        start = time.monotonic()
+        cursor.execute(query)
+        self.record_query(cursor.sfqid, query, time.monotonic() - start)
+
+    @staticmethod
+    def affected_rows(cursor: snowflake.connector.cursor.SnowflakeCursor) -> Optional[int]:
+        """
+        Sum the row counts a COPY (rows_loaded per file), INSERT or MERGE reports in its result;
+        None for statements without such counts.
+        """
+        columns = [description[0].lower() for description in cursor.description or []]
+        counted = [index for index, column in enumerate(columns) if column in ('rows_loaded', 'number of rows inserted', 'number of rows updated')]
+        if not counted:
+            return None
+        return sum(int(row[index] or 0) for row in cursor.fetchall() for index in counted)
+
+    def record_query(self, query_id: str, query: str, seconds: float, rows: Optional[int] = None) -> None:
+        """Record a statement's query ID, type and elapsed time in the metrics, if any are collected."""
+        if self.metrics is not None:
+            self.metrics.record_query(query_id, query.split(None, 1)[0].upper(), seconds, table=self.table_name, rows=rows)
+
+    def record_rows_loaded(self, rows: Optional[int]) -> None:
+        """Count rows loaded into the current table in the metrics, if any are collected."""
+        if self.metrics is not None and rows:
+            self.metrics.inc('rows_loaded_total', rows, table=self.table_name)
+
+    def execute_queries(self, queries: List[str]) -> List[str]:
+        """Execute several queries on one session and return their query IDs."""
+        with self.session():
+            return [self.execute_query(query) for query in queries]
+
+    def close(self) -> None:
+        """Close the persistent session, if one is open."""
+        with self._session_lock:
+            if self._session is not None and not self._session.is_closed():
+                self._session.close()
+                logger.info("Closed Snowflake session")
+            self._session = None
+
+    def __enter__(self) -> "DataLoader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
     def table_exists(self, table_name: str) -> bool:
         """Check if a table exists in the Snowflake schema."""
         query = f"""SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES 
                     WHERE TABLE_SCHEMA = '{self.snowflake_schema.upper()}' 
                     AND TABLE_NAME = '{table_name.upper()}';"""
-        with self.snowflake_connection() as conn:
-            cursor = conn.cursor()
-            try:
-                cursor.execute(query)
-                result = cursor.fetchone()
-                return result[0] > 0
-            finally:
-                cursor.close()
+        with self.cursor() as cursor:
+            self.run_query(cursor, query)
+            result = cursor.fetchone()
+            return result[0] > 0
+
+    def count_rows(self, table_name: str) -> Optional[int]:
+        """
+        Return the number of rows of a table, or None if it does not exist. The schema registry forgets a
+        missing table, so the next load creates it again.
+        """
+        if not self.table_exists(table_name):
+            if self.schema_registry is not None:
+                self.schema_registry.invalidate(f"{self.snowflake_database}.{self.snowflake_schema}.{table_name}")
+            return None
+        with self.cursor() as cursor:
+            self.run_query(cursor, f"SELECT COUNT(*) FROM {self.snowflake_database}.{self.snowflake_schema}.{table_name};")
+            return cursor.fetchone()[0]
+
+    def describe_table(self, table_name: str) -> Dict[str, str]:
+        """Return the columns of a table as {column: type} in ordinal order; empty if the table does not exist."""
+        query = f"""SELECT COLUMN_NAME, DATA_TYPE FROM INFORMATION_SCHEMA.COLUMNS 
+                    WHERE TABLE_SCHEMA = '{self.snowflake_schema.upper()}' 
+                    AND TABLE_NAME = '{table_name.upper()}' 
+                    ORDER BY ORDINAL_POSITION;"""
+        with self.cursor() as cursor:
+            self.run_query(cursor, query)
+            return {column: SchemaRegistry.normalize_type(data_type) for column, data_type in cursor.fetchall()}
+
+    def ensure_table(self, col_def_str: str, load_type: str = 'truncate') -> bool:
+        """
+        Make sure the target table can take the load, using the schema registry instead of
+        INFORMATION_SCHEMA whenever the table's schema is cached.
+
+        A missing table is created. Columns missing from the table are added with a single
+        ALTER TABLE ... ADD COLUMN. If an existing column's type cannot hold the loaded values,
+        a truncate load recreates the table with the widened types; an insert load keeps the
+        table and logs the conflict, since recreating it would drop the loaded history.
+
+        Returns True if the table was (re)created and is therefore empty.
+        """
+        full_table_name = f"{self.snowflake_database}.{self.snowflake_schema}.{self.table_name}"
+        desired = SchemaRegistry.parse_col_definitions(col_def_str)
+        known = self.schema_registry.get(full_table_name)
+        if known is None:
+            known = self.describe_table(self.table_name)
+            if known:
+                self.schema_registry.put(full_table_name, known)
+
+        if not known:
+            logger.info(f"Table {self.table_name} does not exist. Creating table.")
+            self.execute_query(f"CREATE TABLE IF NOT EXISTS {full_table_name} ({col_def_str});")
+            self.schema_registry.put(full_table_name, desired)
+            return True
+
+        added, conflicts = SchemaRegistry.diff(known, desired)
+        if conflicts and load_type == 'truncate':
+            columns = SchemaRegistry.merge_columns(dict(known), desired.items())
+            logger.info(f"Column types of {self.table_name} changed ({', '.join(conflicts)}). Recreating table.")
+            self.execute_query(f"CREATE OR REPLACE TABLE {full_table_name} ({SchemaRegistry.format_col_definitions(columns)});")
+            self.schema_registry.put(full_table_name, columns)
+            return True
+        for column, (known_type, widened) in conflicts.items():
+            logger.warning(f"Column {column} of {self.table_name} is {known_type} but the loaded data needs {widened}")
+
+        if added:
+            logger.info(f"Adding columns to {self.table_name}: {', '.join(added)}")
+            self.execute_query(f"ALTER TABLE {full_table_name} ADD COLUMN {SchemaRegistry.format_col_definitions(added)};")
+            self.schema_registry.put(full_table_name, {**known, **added})
+        return False
 
     def local_stage_sf_stage(self, name: str, local_stage_path: str, replace: bool = False) -> str:
         """Create or replace a Snowflake stage for loading data and return the query ID."""
@@ -89,12 +370,13 @@ class DataLoader:
         if replace:
             stage_name += f'_{self.timestamp}'
         
-        if has_csv_files(folder_path=local_stage_path):
+        if has_files(folder_path=local_stage_path, extension=self.file_extension):
             stage_create = f"""CREATE OR REPLACE STAGE {self.snowflake_database+'.'+self.snowflake_schema+'.'+stage_name}"""
             self.execute_query(stage_create)
 
             local_stage_path = local_stage_path.replace('\\', '/')
-            put_command = f"PUT file://{local_stage_path}/*.csv @{stage_name};" if ' ' not in local_stage_path else f"PUT 'file://{local_stage_path}/*.csv' @{stage_name};"
+            file_pattern = f"{local_stage_path}/*{self.file_extension}"
+            put_command = f"PUT file://{file_pattern} @{stage_name};" if ' ' not in local_stage_path else f"PUT 'file://{file_pattern}' @{stage_name};"
             put_qid = self.execute_query(put_command)
 
             self.stage_name = stage_name
@@ -102,7 +384,7 @@ class DataLoader:
             print(self.table_name)
             return put_qid
         else:
-            logger.warning("No CSV files in the local stage folder")
+            logger.warning(f"No {self.file_extension} files in the local stage folder")
             return ""
 
     def file_format(self) -> str:
@@ -117,22 +399,41 @@ class DataLoader:
             '''
         return self.execute_query(file_format_handling)
 
-    def create_table(self, col_def_str: str, temp_table: bool = False) -> Tuple[str, str]:
+    def parquet_file_format(self) -> str:
+        """Create the file format for Parquet uploads if it does not exist and return the query ID."""
+        file_format_handling = '''
+            CREATE FILE FORMAT IF NOT EXISTS PARQUET_LOCAL_DEVICE_UPLOAD 
+            TYPE = 'PARQUET' BINARY_AS_TEXT = FALSE USE_LOGICAL_TYPE = TRUE
+            '''
+        return self.execute_query(file_format_handling)
+
+    def create_table(self, col_def_str: str, temp_table: bool = False, transient: bool = False) -> Tuple[str, str]:
         """Create a table in Snowflake and return the query ID and table name."""
         table_name = f"temp_{self.table_name}" if temp_table else self.table_name
-        create_table_query = f"""CREATE OR REPLACE TABLE {self.snowflake_database+'.'+self.snowflake_schema+'.'+table_name} ({col_def_str});"""
+        table_kind = 'TRANSIENT TABLE' if transient else 'TABLE'
+        create_table_query = f"""CREATE OR REPLACE {table_kind} {self.snowflake_database+'.'+self.snowflake_schema+'.'+table_name} ({col_def_str});"""
         ct_qid = self.execute_query(create_table_query)
         return ct_qid, table_name
 
-    def copy_into(self, col_def_str: str, temp_table: bool = False, explicit_stage: Optional[str] = None) -> Tuple[str, str]:
-        """Copy data from a stage into a Snowflake table and return the query ID and table name."""
+    def copy_into(self, col_def_str: str, temp_table: bool = False, explicit_stage: Optional[str] = None, create: bool = True,
+                  count_rows: Optional[bool] = None) -> Tuple[str, str]:
+        """
+        Copy data from a stage into a Snowflake table and return the query ID and table name.
+        With create=False the table is expected to exist and is not recreated first. The copied rows
+        count as loaded unless count_rows says otherwise; by default only for the table itself.
+        """
         stage_name = explicit_stage if explicit_stage else self.stage_name
         if not stage_name:
             raise ValueError("No stage defined!")
         
-        _, table_name = self.create_table(col_def_str=col_def_str, temp_table=temp_table)
-        copy_command = f'''COPY INTO {table_name} FROM @{stage_name} FILE_FORMAT = (FORMAT_NAME = csv_local_device_upload) MATCH_BY_COLUMN_NAME = 'CASE_INSENSITIVE';'''
-        copy_qid = self.execute_query(copy_command)
+        if create:
+            _, table_name = self.create_table(col_def_str=col_def_str, temp_table=temp_table)
+        else:
+            table_name = f"temp_{self.table_name}" if temp_table else self.table_name
+        copy_command = f'''COPY INTO {table_name} FROM @{stage_name} FILE_FORMAT = (FORMAT_NAME = {self.file_format_name}) MATCH_BY_COLUMN_NAME = 'CASE_INSENSITIVE';'''
+        copy_qid, rows_loaded = self.execute_statement(copy_command)
+        if not temp_table if count_rows is None else count_rows:
+            self.record_rows_loaded(rows_loaded)
         return copy_qid, table_name
 
     def insert_into(self, col_def_str: str) -> Tuple[str, str]:
@@ -142,47 +443,234 @@ class DataLoader:
             return "", ""
 
         _, temp_table_name = self.copy_into(col_def_str=col_def_str, temp_table=True)
-        insert_query = f'''INSERT INTO {self.snowflake_database}.{self.snowflake_schema}.{self.table_name} SELECT * FROM {temp_table_name};'''
-        insert_qid = self.execute_query(insert_query)
+        # Name the columns so the insert still lines up once the table has columns the load does not
+        column_list = ', '.join(f'"{column}"' for column in SchemaRegistry.parse_col_definitions(col_def_str))
+        insert_query = f'''INSERT INTO {self.snowflake_database}.{self.snowflake_schema}.{self.table_name} ({column_list}) SELECT {column_list} FROM {temp_table_name};'''
+        insert_qid, rows_inserted = self.execute_statement(insert_query)
+        self.record_rows_loaded(rows_inserted)
         drop_query = f"DROP TABLE IF EXISTS {temp_table_name};"
         drop_qid = self.execute_query(drop_query)
         return insert_qid, drop_qid
 
+    @staticmethod
+    def validate_key_columns(col_def_str: str, key_columns: Optional[List[str]]) -> None:
+        """Raise a ValueError unless merge key columns are given and all of them are loaded."""
+        columns = SchemaRegistry.parse_col_definitions(col_def_str)
+        missing_keys = [column for column in key_columns or [] if column not in columns]
+        if not key_columns or missing_keys:
+            raise ValueError(f"Merge key columns {missing_keys or key_columns} are not among the loaded columns")
+
+    # Columns the staging adds to every row: they differ between extractions of the same data
+    bookkeeping_columns = ('File Name', 'Unnamed: 0')
+
+    def merge_into(self, col_def_str: str, key_columns: List[str]) -> Tuple[str, int, int]:
+        """
+        Upsert the stage into the table on the given key columns and return the query ID and the
+        number of rows inserted and updated.
+
+        The stage is copied into a transient table and applied with a single MERGE, so reloading
+        an overlapping window or rerunning a day updates the existing rows instead of adding
+        duplicates. Within the stage one row per key is kept, chosen by its values alone, and matched
+        rows whose values did not change are left untouched. The bookkeeping columns ('File Name' and the
+        row index) are assigned on update but neither compared nor used to choose, so re-extracting or
+        resuming a day with unchanged data updates nothing.
+        """
+        if not self.table_name:
+            raise ValueError("Table name is not set")
+        self.validate_key_columns(col_def_str, key_columns)
+        columns = list(SchemaRegistry.parse_col_definitions(col_def_str))
+
+        self.create_table(col_def_str=col_def_str, temp_table=True, transient=True)
+        _, temp_table_name = self.copy_into(col_def_str=col_def_str, temp_table=True, create=False)
+
+        quoted = {column: f'"{column}"' for column in columns}
+        value_columns = [column for column in columns if column not in key_columns]
+        compared_columns = [column for column in value_columns if column not in self.bookkeeping_columns]
+        column_list = ', '.join(quoted.values())
+        key_list = ', '.join(quoted[column] for column in key_columns)
+        order_by = ', '.join(quoted[column] for column in compared_columns) or 'NULL'
+        source = f"SELECT {column_list} FROM {temp_table_name} QUALIFY ROW_NUMBER() OVER (PARTITION BY {key_list} ORDER BY {order_by}) = 1"
+        merge_query = f"MERGE INTO {self.snowflake_database}.{self.snowflake_schema}.{self.table_name} AS target USING ({source}) AS source ON "
+        merge_query += ' AND '.join(f'target.{quoted[column]} = source.{quoted[column]}' for column in key_columns)
+        if compared_columns:
+            changed = ' OR '.join(f'target.{quoted[column]} IS DISTINCT FROM source.{quoted[column]}' for column in compared_columns)
+            assignments = ', '.join(f'target.{quoted[column]} = source.{quoted[column]}' for column in value_columns)
+            merge_query += f" WHEN MATCHED AND ({changed}) THEN UPDATE SET {assignments}"
+        merge_query += f" WHEN NOT MATCHED THEN INSERT ({column_list}) VALUES ({', '.join(f'source.{quoted[column]}' for column in columns)});"
+
+        with self.cursor() as cursor:
+            start = time.monotonic()
+            cursor.execute(merge_query)
+            merge_qid = cursor.sfqid
+            row = cursor.fetchone() or ()
+            result = {description[0].lower(): value for description, value in zip(cursor.description or [], row)}
+        rows_inserted = int(result.get('number of rows inserted', 0))
+        rows_updated = int(result.get('number of rows updated', 0))
+        self.record_query(merge_qid, merge_query, time.monotonic() - start, rows_inserted + rows_updated)
+        self.record_rows_loaded(rows_inserted + rows_updated)
+        self.execute_query(f"DROP TABLE IF EXISTS {temp_table_name};")
+        logger.info(f"Merged into {self.table_name}: {rows_inserted} rows inserted, {rows_updated} rows updated.")
+        return merge_qid, rows_inserted, rows_updated
+
     def truncate_table(self) -> str:
         """Truncate the table in Snowflake and return the query ID."""
         truncate_query = f"TRUNCATE TABLE {self.snowflake_database}.{self.snowflake_schema}.{self.table_name};"
         return self.execute_query(truncate_query)
 
-    def manage_data_loading(self,name: str,  local_stage_path: str, col_def_str: str, load_type: str = 'truncate') -> None:
-        """
-        Manages data loading by checking if the table exists, and based on the operation type,
-        it either truncates, inserts, or creates a new table and loads data into it.
+    def delete_rows(self) -> str:
+        """Delete every row of the table and return the query ID; unlike TRUNCATE this rolls back with its transaction."""
+        delete_query = f"DELETE FROM {self.snowflake_database}.{self.snowflake_schema}.{self.table_name};"
+        return self.execute_query(delete_query)
 
-        Parameters:
-        - local_stage_path: The local directory path containing CSV files to load.
-        - col_def_str: Column definition string for creating a new table, if necessary.
-        - load_type: The type of load operation ('truncate', 'insert'). Defaults to 'insert'.
+    def replace_table(self, col_def_str: str) -> str:
+        """
+        Build the table anew from the stage in a temporary table and swap it in, so the table keeps
+        its old rows until the new ones are fully loaded. Returns the query ID of the swap.
         """
-        self.local_stage_sf_stage(name=name, local_stage_path=local_stage_path)
-        # self.file_format()
+        _, temp_table_name = self.copy_into(col_def_str=col_def_str, temp_table=True, count_rows=True)
+        swap_qid = self.execute_query(f"ALTER TABLE {self.snowflake_database}.{self.snowflake_schema}.{self.table_name} SWAP WITH {temp_table_name};")
+        self.execute_query(f"DROP TABLE IF EXISTS {temp_table_name};")
+        return swap_qid
 
-        # Check if the table exists
-        if self.table_exists(self.table_name):
-            if load_type == 'truncate':
-                # Truncate the table before loading data
+    def load_registered_table(self, col_def_str: str, load_type: str, key_columns: Optional[List[str]] = None,
+                              atomic: bool = True) -> Optional[Dict[str, int]]:
+        """
+        Load the stage into a table whose schema is tracked by the schema registry: the table is
+        only created or altered on drift, and loads copy into it without recreating it.
+        With atomic, a truncate load deletes and copies in one transaction (see manage_data_loading).
+        """
+        if load_type not in ('truncate', 'insert', 'merge'):
+            logger.error("Invalid load type specified. Only 'truncate', 'insert' and 'merge' are supported.")
+            return None
+        full_table_name = f"{self.snowflake_database}.{self.snowflake_schema}.{self.table_name}"
+        try:
+            created = self.ensure_table(col_def_str=col_def_str, load_type=load_type)
+            if load_type == 'merge':
+                logger.info(f"Merging data into table {self.table_name}.")
+                _, rows_inserted, rows_updated = self.merge_into(col_def_str=col_def_str, key_columns=key_columns)
+                return {'rows_inserted': rows_inserted, 'rows_updated': rows_updated}
+            if created:
+                logger.info(f"Loading data into new table {self.table_name}.")
+                self.copy_into(col_def_str=col_def_str, temp_table=False, create=False)
+            elif load_type == 'truncate' and atomic:
+                logger.info(f"Replacing the rows of table {self.table_name} in one transaction.")
+                with self.transaction():
+                    self.delete_rows()
+                    self.copy_into(col_def_str=col_def_str, temp_table=False, create=False)
+            elif load_type == 'truncate':
                 logger.info(f"Truncating table {self.table_name} before loading data.")
                 self.truncate_table()
-                self.copy_into(col_def_str=col_def_str, temp_table=False)
-            elif load_type == 'insert':
-                # Insert data into the table
+                self.copy_into(col_def_str=col_def_str, temp_table=False, create=False)
+            else:
                 logger.info(f"Inserting data into table {self.table_name}.")
                 self.insert_into(col_def_str=col_def_str)
-            else:
-                logger.error("Invalid load type specified. Only 'truncate' and 'insert' are supported.")
-        else:
-            # Table does not exist, create it and then load data
-            logger.info(f"Table {self.table_name} does not exist. Creating table and loading data.")
-            self.create_table(col_def_str=col_def_str, temp_table=False)
-            self.copy_into(col_def_str=col_def_str, temp_table=False)
+            return None
+        except Exception:
+            # The cached schema may be what went wrong (e.g. the table was changed outside the loader)
+            self.schema_registry.invalidate(full_table_name)
+            raise
+
+    def load_tables(self, loads: List[Dict[str, Any]], max_parallel: int = 4) -> Dict[str, Dict[str, Any]]:
+        """
+        Load several independent tables concurrently and collect the outcome of each one.
+
+        Every table is loaded by manage_data_loading on a worker thread with its own Snowflake
+        session, so one table's PUT and COPY do not wait on another's. A failing table does not
+        stop the others; its error is reported in the results instead of being raised.
 
+        Parameters:
+        - loads: Keyword arguments of manage_data_loading for each table; 'name' identifies the table.
+        - max_parallel: Maximum number of tables loading at the same time. 1 loads them one after another.
 
+        Returns {name: {'status': 'succeeded' or 'failed', 'result': ..., 'error': ..., 'seconds': ...}} in input order.
+        """
+        concurrent = max_parallel > 1 and len(loads) > 1
+
+        def load(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+            start = time.monotonic()
+            try:
+                with self.session(dedicated=concurrent):
+                    result = self.manage_data_loading(**kwargs)
+                outcome = {'status': 'succeeded', 'result': result, 'error': None}
+            except Exception as e:
+                logger.error(f"Loading {kwargs['name']} failed: {e}")
+                outcome = {'status': 'failed', 'result': None, 'error': str(e)}
+            finally:
+                self.stage_name = None
+                self.table_name = None
+            outcome['seconds'] = round(time.monotonic() - start, 3)
+            if self.metrics is not None:
+                self.metrics.inc('stage_seconds_total', outcome['seconds'], stage='load', dataset=kwargs['name'])
+                self.metrics.set('table_load_seconds', outcome['seconds'], dataset=kwargs['name'])
+                self.metrics.set('table_load_success', 1 if outcome['status'] == 'succeeded' else 0, dataset=kwargs['name'])
+            return outcome
+
+        outcomes = fan_out(load, loads, max_workers=max_parallel if concurrent else 1)
+        results = {kwargs['name']: outcome for kwargs, outcome in zip(loads, outcomes)}
+        failed = [name for name, outcome in results.items() if outcome['status'] == 'failed']
+        logger.info(f"Loaded {len(results) - len(failed)} of {len(results)} tables" + (f"; failed: {', '.join(failed)}" if failed else ""))
+        return results
+
+    def manage_data_loading(self,name: str,  local_stage_path: str, col_def_str: str, load_type: str = 'truncate', single_session: bool = True,
+                            key_columns: Optional[List[str]] = None, atomic: bool = True) -> Optional[Dict[str, int]]:
+        """
+        Manages data loading by checking if the table exists, and based on the operation type,
+        it either truncates, inserts, merges, or creates a new table and loads data into it.
+
+        Parameters:
+        - local_stage_path: The local directory path containing the staged CSV or Parquet files to load.
+        - col_def_str: Column definition string for creating a new table, if necessary.
+        - load_type: The type of load operation ('truncate', 'insert', 'merge'). Defaults to 'insert'.
+        - single_session: Issue every statement of the load (stage, PUT, DDL, COPY, DML) on one session.
+        - key_columns: Columns identifying a row, required by the 'merge' load type.
+        - atomic: Replace the rows of a 'truncate' load all at once, so a failed load leaves the table as it
+          was: the delete and COPY run in one transaction, or the new table is swapped in once loaded when
+          it is recreated without a schema registry. 'insert' and 'merge' loads change the table with a
+          single statement and are atomic either way.
+
+        Returns the rows inserted and updated for a 'merge' load, otherwise None.
+        """
+        if load_type == 'merge':
+            self.validate_key_columns(col_def_str, key_columns)
+        with self.session() if single_session else nullcontext():
+            self.local_stage_sf_stage(name=name, local_stage_path=local_stage_path)
+            # self.file_format()
+            if self.staging_format == 'parquet':
+                self.parquet_file_format()
+
+            if self.schema_registry is not None:
+                return self.load_registered_table(col_def_str=col_def_str, load_type=load_type, key_columns=key_columns, atomic=atomic)
+            # Check if the table exists
+            if self.table_exists(self.table_name):
+                if load_type == 'truncate' and atomic:
+                    # Load the new rows next to the table and swap them in once complete
+                    logger.info(f"Replacing table {self.table_name} once the new data is loaded.")
+                    self.replace_table(col_def_str=col_def_str)
+                elif load_type == 'truncate':
+                    # Truncate the table before loading data
+                    logger.info(f"Truncating table {self.table_name} before loading data.")
+                    self.truncate_table()
+                    self.copy_into(col_def_str=col_def_str, temp_table=False)
+                elif load_type == 'insert':
+                    # Insert data into the table
+                    logger.info(f"Inserting data into table {self.table_name}.")
+                    self.insert_into(col_def_str=col_def_str)
+                elif load_type == 'merge':
+                    # Upsert data into the table on its key columns
+                    logger.info(f"Merging data into table {self.table_name}.")
+                    _, rows_inserted, rows_updated = self.merge_into(col_def_str=col_def_str, key_columns=key_columns)
+                    return {'rows_inserted': rows_inserted, 'rows_updated': rows_updated}
+                else:
+                    logger.error("Invalid load type specified. Only 'truncate', 'insert' and 'merge' are supported.")
+            elif load_type == 'merge':
+                # Table does not exist, create it and merge into it so the stage is still deduplicated on its keys
+                logger.info(f"Table {self.table_name} does not exist. Creating table and merging data.")
+                self.create_table(col_def_str=col_def_str, temp_table=False)
+                _, rows_inserted, rows_updated = self.merge_into(col_def_str=col_def_str, key_columns=key_columns)
+                return {'rows_inserted': rows_inserted, 'rows_updated': rows_updated}
+            else:
+                # Table does not exist, create it and then load data
+                logger.info(f"Table {self.table_name} does not exist. Creating table and loading data.")
+                self.create_table(col_def_str=col_def_str, temp_table=False)
+                self.copy_into(col_def_str=col_def_str, temp_table=False)
+        return None
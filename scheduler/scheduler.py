@@ -1,11 +1,193 @@
 # scheduler/scheduler.py
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils.logger import setup_logging
+
+logger = setup_logging(__name__)
+
+class ScheduledJob:
+    def __init__(self, name, function, args=(), kwargs=None, interval=3600, jitter=0.0):
+        """
+        A function run every `interval` seconds by the Scheduler.
+
+        :param name: str - Name of the job, used in logs and statistics.
+        :param function: callable - The function to execute, e.g. the bound run method of a connector
+            instance that is kept between runs.
+        :param args: tuple - Positional arguments for the function.
+        :param kwargs: dict - Keyword arguments for the function.
+        :param interval: float - Seconds between the scheduled starts of two runs.
+        :param jitter: float - Up to this many seconds are added at random to every start, so jobs
+            sharing an interval do not hit the API and Snowflake at the same moment.
+        """
+        self.name = name
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.interval = interval
+        self.jitter = jitter
+        self.due_at = None
+        self.next_run = None
+        self.running = False
+
+        # Counters
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_duration = None
+        self.last_error = None
+
+    def schedule(self, due_at):
+        """
+        Set the next start to `due_at` plus a random jitter. The jitter does not carry over into
+        later starts, which stay on the job's interval grid.
+        """
+        self.due_at = due_at
+        self.next_run = due_at + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+    def advance(self, now):
+        """
+        Schedule the next start on the interval grid, skipping starts already in the past.
+        """
+        due_at = self.due_at + self.interval
+        if due_at <= now:
+            due_at += ((now - due_at) // self.interval + 1) * self.interval
+        self.schedule(due_at)
+
+    def get_stats(self):
+        return {
+            'runs': self.runs, 'failures': self.failures, 'skipped': self.skipped, 'running': self.running,
+            'last_duration': self.last_duration, 'last_error': self.last_error,
+            'next_run_in': None if self.next_run is None else round(self.next_run - time.monotonic(), 3),
+        }
+
 
 class Scheduler:
-    def schedule_task(self, interval, function, *args):
+    """
+    Long-running scheduler executing several jobs in one process.
+
+    Jobs keep their connector objects between runs, so HTTP connection pools and Snowflake
+    sessions stay warm instead of every run paying for a new process, imports, login and
+    connection. At most `max_concurrent` runs execute at the same time across all jobs; a job
+    whose previous run is still going when it comes due skips that start instead of overlapping it.
+    """
+    def __init__(self, max_concurrent=2, poll_interval=1.0):
+        """
+        :param max_concurrent: int - Maximum number of runs executing at the same time across all jobs.
+            Runs coming due while every slot is busy wait for a free slot.
+        :param poll_interval: float - Longest the scheduler sleeps before checking the jobs again.
+        """
+        self.max_concurrent = max_concurrent
+        self.poll_interval = poll_interval
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.executor = None
+
+    def schedule_task(self, interval, function, *args, name=None, jitter=0.0, run_immediately=True, **kwargs):
         """
         Schedule a task to run at a fixed interval.
-        
+
         :param interval: int - The interval in seconds between task executions.
         :param function: callable - The function to execute.
         :param args: list - The arguments to pass to the function.
+        :param name: str - Unique name of the job; defaults to the function's name.
+        :param jitter: float - Up to this many seconds are added at random to every start.
+        :param run_immediately: bool - Start the first run right away instead of after one interval.
+        :param kwargs: dict - Keyword arguments to pass to the function.
+        :return: ScheduledJob - The registered job.
+        """
+        name = name or getattr(function, '__qualname__', None) or repr(function)
+        job = ScheduledJob(name, function, args=args, kwargs=kwargs, interval=interval, jitter=jitter)
+        now = time.monotonic()
+        job.schedule(now if run_immediately else now + interval)
+        with self.lock:
+            if name in self.jobs:
+                raise ValueError(f"A job named '{name}' is already scheduled")
+            self.jobs[name] = job
+        self.wakeup.set()
+        logger.info(f"Scheduled job {name} every {interval}s" + (f" with up to {jitter}s jitter" if jitter else ""))
+        return job
+
+    def run_job(self, job):
+        start = time.monotonic()
+        try:
+            job.function(*job.args, **job.kwargs)
+            job.last_error = None
+        except Exception as e:
+            job.failures += 1
+            job.last_error = str(e)
+            logger.error(f"Job {job.name} failed: {e}", exc_info=True)
+        finally:
+            job.runs += 1
+            job.last_duration = round(time.monotonic() - start, 3)
+            with self.lock:
+                job.running = False
+            logger.info(f"Job {job.name} finished in {job.last_duration}s")
+
+    def run_pending(self):
+        """
+        Start every job that has come due and is not still running.
+
+        :return: float - Seconds until the next job comes due.
+        """
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix='scheduler')
+        now = time.monotonic()
+        with self.lock:
+            for job in self.jobs.values():
+                if job.next_run > now:
+                    continue
+                if job.running:
+                    job.skipped += 1
+                    logger.warning(f"Job {job.name} is still running; skipping this start")
+                else:
+                    job.running = True
+                    self.executor.submit(self.run_job, job)
+                job.advance(now)
+            next_run = min((job.next_run for job in self.jobs.values()), default=now + self.poll_interval)
+        return max(0.0, next_run - time.monotonic())
+
+    def run_forever(self):
+        """
+        Run the jobs on their schedules until stop() is called.
+        """
+        self.stopped.clear()
+        logger.info(f"Scheduler started with {len(self.jobs)} jobs and at most {self.max_concurrent} concurrent runs")
+        try:
+            while not self.stopped.is_set():
+                wait = self.run_pending()
+                self.wakeup.wait(min(wait, self.poll_interval))
+                self.wakeup.clear()
+        finally:
+            self.shutdown()
+
+    def start(self):
+        """
+        Run the scheduler on a daemon thread and return the thread.
+        """
+        thread = threading.Thread(target=self.run_forever, name='scheduler', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        """
+        Stop scheduling new runs; run_forever returns once the runs in progress have finished.
+        """
+        self.stopped.set()
+        self.wakeup.set()
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        logger.info("Scheduler stopped")
+
+    def get_stats(self):
+        """
+        :return: dict - Run counters of every job.
         """
+        with self.lock:
+            return {name: job.get_stats() for name, job in self.jobs.items()}
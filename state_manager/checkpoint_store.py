@@ -0,0 +1,118 @@
+# state_manager/checkpoint_store.py
+import os
+import sqlite3
+import datetime as dt
+from contextlib import contextmanager
+
+class CheckpointStore():
+    """
+    Records completed extraction units (endpoint, unit key, day) for a connector, and the
+    content fingerprint of the last snapshot loaded per endpoint.
+
+    Backed by SQLite in WAL mode: each write is an atomic transaction, a crash never
+    leaves a half written file behind, and several threads or processes can record
+    progress at the same time.
+    """
+    def __init__(self, name, db_path='.', db_file='checkpoints.db') -> None:
+        self.db_file = os.path.join(db_path, db_file)
+        self.name = name
+        with self.connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS checkpoints (
+                    name TEXT NOT NULL,
+                    endpoint TEXT NOT NULL,
+                    unit_key TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    completed_at TEXT NOT NULL,
+                    PRIMARY KEY (name, endpoint, unit_key, day)
+                )"""
+            )
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS fingerprints (
+                    name TEXT NOT NULL,
+                    endpoint TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    loaded_at TEXT NOT NULL,
+                    PRIMARY KEY (name, endpoint)
+                )"""
+            )
+
+    @contextmanager
+    def connection(self):
+        """
+        Open a short lived connection; the block commits on success and rolls back on error.
+        """
+        conn = sqlite3.connect(self.db_file, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def mark_done(self, endpoint, unit_keys, day):
+        """
+        Record a batch of units as completed in a single transaction.
+
+        :param endpoint: str - Logical endpoint or table the units belong to.
+        :param unit_keys: iterable of str - Unit identifiers, e.g. store ids.
+        :param day: str - The day the units cover, formatted as YYYY-MM-DD.
+        """
+        completed_at = dt.datetime.now().isoformat()
+        with self.connection() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO checkpoints (name, endpoint, unit_key, day, completed_at) VALUES (?, ?, ?, ?, ?)",
+                [(self.name, endpoint, str(unit_key), day, completed_at) for unit_key in unit_keys]
+            )
+
+    def done_units(self, endpoint, day):
+        """
+        :return: set of str - Unit keys already completed for the endpoint and day.
+        """
+        with self.connection() as conn:
+            rows = conn.execute(
+                "SELECT unit_key FROM checkpoints WHERE name = ? AND endpoint = ? AND day = ?",
+                (self.name, endpoint, day)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def get_fingerprint(self, endpoint):
+        """
+        :return: str - Fingerprint of the endpoint's last loaded snapshot, or None if none was recorded.
+        """
+        with self.connection() as conn:
+            row = conn.execute(
+                "SELECT fingerprint FROM fingerprints WHERE name = ? AND endpoint = ?",
+                (self.name, endpoint)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_fingerprint(self, endpoint, fingerprint):
+        """
+        Record the fingerprint of a snapshot once it has been loaded.
+
+        :param endpoint: str - Logical endpoint or table the snapshot belongs to.
+        :param fingerprint: str - The content hash of the loaded snapshot.
+        """
+        with self.connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO fingerprints (name, endpoint, fingerprint, loaded_at) VALUES (?, ?, ?, ?)",
+                (self.name, endpoint, fingerprint, dt.datetime.now().isoformat())
+            )
+
+    def clear_fingerprint(self, endpoint):
+        """
+        Forget the fingerprint of an endpoint's snapshot, so it is loaded again whatever its content.
+
+        :param endpoint: str - Logical endpoint or table the snapshot belongs to.
+        """
+        with self.connection() as conn:
+            conn.execute("DELETE FROM fingerprints WHERE name = ? AND endpoint = ?", (self.name, endpoint))
+
+    def clear(self):
+        """
+        Remove every checkpoint of this connector, e.g. once a run has been fully loaded. Snapshot
+        fingerprints are kept.
+        """
+        with self.connection() as conn:
+            conn.execute("DELETE FROM checkpoints WHERE name = ?", (self.name,))
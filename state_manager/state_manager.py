@@ -43,6 +43,11 @@ class StateManager():
             state[self.name] = {}
         state[self.name]['last_run'] = last_run_date
 
-        # Then, open the file in 'w' mode to write the updated state back.
-        with open(self.json_file, 'w') as file:
+        # Then write the updated state to a temporary file and atomically swap it in,
+        # so a crash mid-write can never leave a truncated state file behind.
+        tmp_file = f"{self.json_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w') as file:
             json.dump(state, file, indent=4)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_file, self.json_file)
@@ -0,0 +1,43 @@
+import json
+import datetime as dt
+import pytest
+import snowflake.connector
+from benchmarks.bench_e2e import CONFIG
+from benchmarks.mock_xpand_api import MockXpandAPI
+from benchmarks.snowflake_standin import SnowflakeStandIn
+
+
+class StateFile:
+    """The state.json of the xpand_retail connector, read and written by day."""
+    def __init__(self, path):
+        self.path = path
+
+    def set_last_run(self, day):
+        self.path.write_text(json.dumps({'xpand_retail': {'last_run': day.isoformat()}}))
+
+    def last_run(self):
+        return dt.date.fromisoformat(json.loads(self.path.read_text())['xpand_retail']['last_run'])
+
+
+@pytest.fixture
+def mock_api():
+    api = MockXpandAPI(stores=3, latency=0.005).start()
+    yield api
+    api.stop()
+
+
+@pytest.fixture
+def snowflake_standin(tmp_path, monkeypatch):
+    standin = SnowflakeStandIn(str(tmp_path / 'snowflake'))
+    monkeypatch.setattr(snowflake.connector, 'connect', standin.connect)
+    return standin
+
+
+@pytest.fixture
+def state_file(tmp_path, monkeypatch):
+    """Run connectors in a scratch directory holding the benchmark credentials and the state file."""
+    workdir = tmp_path / 'work'
+    workdir.mkdir()
+    monkeypatch.chdir(workdir)
+    (workdir / 'config.ini').write_text(CONFIG)
+    return StateFile(workdir / 'state.json')
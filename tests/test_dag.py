@@ -0,0 +1,156 @@
+import time
+import threading
+import datetime as dt
+import pytest
+from utils.dag import TaskGraph
+from xpand_retail import XpandRetail
+
+
+class Recorder:
+    """Tasks that record when they start and finish."""
+    def __init__(self):
+        self.events = []
+        self.lock = threading.Lock()
+
+    def task(self, name, seconds=0.0, error=None):
+        def run():
+            with self.lock:
+                self.events.append(('start', name))
+            time.sleep(seconds)
+            with self.lock:
+                self.events.append(('end', name))
+            if error is not None:
+                raise error
+            return name.upper()
+        return run
+
+    def index(self, event, name):
+        return self.events.index((event, name))
+
+
+def test_order_puts_every_task_after_its_dependencies():
+    graph = TaskGraph()
+    graph.add('load', lambda: None, depends_on=['extract', 'schema'])
+    graph.add('extract', lambda: None, depends_on=['login'])
+    graph.add('schema', lambda: None)
+    graph.add('login', lambda: None)
+
+    order = graph.order()
+    assert sorted(order) == ['extract', 'load', 'login', 'schema']
+    assert order.index('login') < order.index('extract') < order.index('load')
+    assert order.index('schema') < order.index('load')
+
+
+def test_unknown_dependencies_cycles_and_duplicates_are_rejected():
+    graph = TaskGraph()
+    graph.add('a', lambda: None, depends_on=['b'])
+    with pytest.raises(ValueError, match='already in the graph'):
+        graph.add('a', lambda: None)
+    with pytest.raises(ValueError, match='unknown tasks: b'):
+        graph.order()
+
+    graph.add('b', lambda: None, depends_on=['c'])
+    graph.add('c', lambda: None, depends_on=['a'])
+    with pytest.raises(ValueError, match='cycle'):
+        graph.run()
+
+
+def test_tasks_start_once_their_dependencies_finished_and_branches_overlap():
+    recorder = Recorder()
+    graph = TaskGraph()
+    graph.add('extract:a', recorder.task('extract:a', 0.2))
+    graph.add('extract:b', recorder.task('extract:b', 0.2))
+    graph.add('load:a', recorder.task('load:a'), depends_on=['extract:a'])
+    graph.add('load:b', recorder.task('load:b'), depends_on=['extract:b', 'load:a'])
+
+    start = time.monotonic()
+    results = graph.run(max_parallel=4)
+    assert time.monotonic() - start < 0.35
+
+    assert {name: outcome['result'] for name, outcome in results.items()} == {
+        'extract:a': 'EXTRACT:A', 'extract:b': 'EXTRACT:B', 'load:a': 'LOAD:A', 'load:b': 'LOAD:B'
+    }
+    assert recorder.index('end', 'extract:a') < recorder.index('start', 'load:a')
+    assert recorder.index('end', 'load:a') < recorder.index('start', 'load:b')
+    assert recorder.index('end', 'extract:b') < recorder.index('start', 'load:b')
+
+
+def test_max_parallel_1_runs_one_task_at_a_time():
+    recorder = Recorder()
+    graph = TaskGraph()
+    for name in ('a', 'b', 'c'):
+        graph.add(name, recorder.task(name, 0.01))
+
+    graph.run(max_parallel=1)
+    assert [event for event, _ in recorder.events] == ['start', 'end'] * 3
+
+
+def test_a_failure_skips_its_dependents_and_lets_other_branches_finish():
+    recorder = Recorder()
+    graph = TaskGraph()
+    graph.add('extract:a', recorder.task('extract:a', error=RuntimeError('API down')))
+    graph.add('load:a', recorder.task('load:a'), depends_on=['extract:a'])
+    graph.add('report', recorder.task('report'), depends_on=['load:a'])
+    graph.add('extract:b', recorder.task('extract:b', 0.05))
+    graph.add('load:b', recorder.task('load:b'), depends_on=['extract:b'])
+
+    results = graph.run()
+    assert {name: outcome['status'] for name, outcome in results.items()} == {
+        'extract:a': 'failed', 'load:a': 'skipped', 'report': 'skipped', 'extract:b': 'succeeded', 'load:b': 'succeeded'
+    }
+    assert results['extract:a']['error'] == 'API down'
+    assert results['report']['error'] == 'Skipped after load:a'
+    assert ('start', 'load:a') not in recorder.events and ('start', 'report') not in recorder.events
+
+
+def test_run_extraction_resumes_with_the_stores_that_failed(mock_api, snowflake_standin, state_file):
+    start = dt.date.today() - dt.timedelta(days=4)
+    state_file.set_last_run(start)
+    failing_store = mock_api.store_id(1)
+    payload = mock_api.payload
+    requested_stores = []
+
+    def flaky_payload(path, params):
+        if path.endswith('/storeCountingDataHourly'):
+            requested_stores.append(params.get('plaza_unid'))
+            if failing and params.get('plaza_unid') == failing_store:
+                return None
+        return payload(path, params)
+
+    mock_api.payload = flaky_payload
+    rows_per_store = 4 * 24
+
+    failing = True
+    connector = XpandRetail(base_url=mock_api.url, cache_path=None, metrics_dir=None, requests_per_second=1000, burst=100)
+    try:
+        connector.extract_and_stage()
+    finally:
+        connector.close()
+    # Every day misses the failed store, so the state holds at the first day
+    assert state_file.last_run() == start
+    assert snowflake_standin.row_counts()['STORE_COUNTS_TABLE'] == (mock_api.stores - 1) * rows_per_store
+    assert set(requested_stores) == {mock_api.store_id(i) for i in range(mock_api.stores)}
+
+    failing = False
+    requested_stores.clear()
+    connector = XpandRetail(base_url=mock_api.url, cache_path=None, metrics_dir=None, requests_per_second=1000, burst=100)
+    try:
+        connector.extract_and_stage()
+    finally:
+        connector.close()
+    # Only the failed store is requested again, and no day is loaded twice
+    assert set(requested_stores) == {failing_store}
+    assert state_file.last_run() == dt.date.today() - dt.timedelta(days=1)
+    assert snowflake_standin.row_counts()['STORE_COUNTS_TABLE'] == mock_api.stores * rows_per_store
+
+
+def test_an_up_to_date_run_requests_nothing(mock_api, snowflake_standin, state_file):
+    state_file.set_last_run(dt.date.today() - dt.timedelta(days=1))
+    connector = XpandRetail(base_url=mock_api.url, cache_path=None, metrics_dir=None)
+    try:
+        connector.extract_and_stage()
+    finally:
+        connector.close()
+
+    assert mock_api.requests == 0
+    assert snowflake_standin.row_counts() == {}
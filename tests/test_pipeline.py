@@ -0,0 +1,102 @@
+import time
+import threading
+import datetime as dt
+import pytest
+from utils.pipeline import BatchPipeline
+from xpand_retail import XpandRetail
+
+
+def test_items_are_consumed_in_order_in_batches_of_at_most_max_batch():
+    batches = []
+    release = threading.Event()
+
+    def consume(batch):
+        release.wait()
+        batches.append(batch)
+
+    with BatchPipeline(consume, max_pending=8, max_batch=3) as pipeline:
+        for item in range(8):
+            pipeline.put(item)
+        release.set()
+
+    assert [item for batch in batches for item in batch] == list(range(8))
+    assert all(1 <= len(batch) <= 3 for batch in batches)
+    assert pipeline.get_stats()['items'] == 8 and pipeline.get_stats()['batches'] == len(batches)
+
+
+def test_put_blocks_while_max_pending_items_wait():
+    release = threading.Event()
+    pipeline = BatchPipeline(lambda batch: release.wait(), max_pending=2, max_batch=1).start()
+    pipeline.put(0)
+    time.sleep(0.05)
+
+    # The consumer holds item 0; items 1 and 2 fill the queue, item 3 has to wait
+    producer = threading.Thread(target=lambda: [pipeline.put(item) for item in (1, 2, 3)])
+    producer.start()
+    producer.join(0.2)
+    assert producer.is_alive()
+
+    release.set()
+    producer.join(1.0)
+    assert not producer.is_alive()
+    pipeline.close()
+    assert pipeline.get_stats()['items'] == 4
+
+
+def test_a_failing_consumer_stops_the_producer():
+    consumed = []
+
+    def consume(batch):
+        if batch[0] == 2:
+            raise ValueError('load failed')
+        consumed.extend(batch)
+
+    pipeline = BatchPipeline(consume, max_pending=1, max_batch=1).start()
+    with pytest.raises(RuntimeError, match='load failed'):
+        for item in range(100):
+            pipeline.put(item)
+            time.sleep(0.01)
+    assert item < 10
+    with pytest.raises(RuntimeError, match='load failed'):
+        pipeline.close()
+    assert consumed == [0, 1]
+
+
+def test_the_producers_own_error_is_not_masked():
+    with pytest.raises(KeyError):
+        with BatchPipeline(lambda batch: None) as pipeline:
+            pipeline.put(0)
+            raise KeyError('extraction failed')
+
+
+def test_watermark_only_advances_past_committed_batches(mock_api, snowflake_standin, state_file):
+    start = dt.date.today() - dt.timedelta(days=10)
+    state_file.set_last_run(start)
+    connector = XpandRetail(base_url=mock_api.url, cache_path=None, metrics_dir=None, requests_per_second=1000, burst=100,
+                            pipelined=True, pipeline_depth=2, micro_batch_days=2)
+    load = connector.dataloader.manage_data_loading
+    loads = []
+
+    def failing_third_load(**kwargs):
+        if kwargs['name'] == 'store_counts':
+            loads.append(kwargs)
+            if len(loads) == 3:
+                raise RuntimeError('COPY failed')
+        return load(**kwargs)
+
+    connector.dataloader.manage_data_loading = failing_third_load
+    try:
+        with pytest.raises(RuntimeError, match='COPY failed'):
+            connector.extract_and_stage()
+
+        # The state sits on the first day of store_counts that did not reach Snowflake
+        committed_days = snowflake_standin.row_counts()['STORE_COUNTS_TABLE'] // (mock_api.stores * 24)
+        assert 2 <= committed_days < 10
+        assert state_file.last_run() == start + dt.timedelta(days=committed_days)
+
+        connector.dataloader.manage_data_loading = load
+        connector.extract_and_stage()
+        assert state_file.last_run() == dt.date.today() - dt.timedelta(days=1)
+        assert snowflake_standin.row_counts()['STORE_COUNTS_TABLE'] == 10 * mock_api.stores * 24
+    finally:
+        connector.close()
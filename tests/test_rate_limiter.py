@@ -0,0 +1,122 @@
+import datetime as dt
+from email.utils import format_datetime
+import pytest
+from api import rate_limiter
+from api.rate_limiter import RateLimiter, RetryPolicy, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, 'monotonic', clock)
+    return clock
+
+
+def test_token_bucket_serves_the_burst_then_hands_out_consecutive_slots(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert [bucket.reserve() for _ in range(3)] == [0.5, 1.0, 1.5]
+
+
+def test_token_bucket_refills_at_its_rate_up_to_the_burst(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+    for _ in range(3):
+        bucket.reserve()
+
+    clock.now += 1.0
+    assert [bucket.reserve() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.reserve() == 0.5
+
+    clock.now += 60.0
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve() == 0.5
+
+
+def test_rate_limiter_cuts_the_rate_once_per_cooldown(clock):
+    limiter = RateLimiter(rate=8.0, min_rate=1.0, cooldown=1.0)
+    url = 'https://api.example.com/v1/counts'
+
+    limiter.on_throttle(url)
+    limiter.on_throttle(url)
+    assert limiter.get_stats()['rates'] == {'api.example.com': 4.0}
+
+    clock.now += 1.0
+    limiter.on_throttle(url)
+    assert limiter.get_stats()['rates'] == {'api.example.com': 2.0}
+
+    for _ in range(3):
+        clock.now += 1.0
+        limiter.on_throttle(url)
+    stats = limiter.get_stats()
+    assert stats['rates'] == {'api.example.com': 1.0}
+    assert stats['throttle_events'] == 6
+
+
+def test_rate_limiter_raises_the_rate_additively_up_to_the_maximum(clock):
+    limiter = RateLimiter(rate=4.0, increase_step=2.0, max_rate=5.0)
+    url = 'https://api.example.com/v1/counts'
+
+    limiter.on_success(url)
+    assert limiter.get_stats()['rates'] == {'api.example.com': 4.5}
+    for _ in range(5):
+        limiter.on_success(url)
+    assert limiter.get_stats()['rates'] == {'api.example.com': 5.0}
+
+
+def test_rate_limiter_keeps_a_bucket_per_host(clock):
+    limiter = RateLimiter(rate=1.0, burst=1)
+
+    assert limiter.reserve('https://a.example.com/x') == 0.0
+    assert limiter.reserve('https://b.example.com/x') == 0.0
+    assert limiter.reserve('https://a.example.com/y') == 1.0
+    assert limiter.get_stats()['throttle_waits'] == 1
+
+
+@pytest.mark.parametrize('value, expected', [('3', 3.0), ('0.5', 0.5), ('-2', 0.0), (None, None), ('', None), ('soon', None),
+                                             ('inf', None), ('-inf', None), ('nan', None)])
+def test_retry_after_is_parsed_as_seconds(value, expected):
+    assert RetryPolicy.parse_retry_after(value) == expected
+
+
+def test_retry_after_is_parsed_as_an_http_date():
+    retry_at = dt.datetime.now(dt.timezone.utc) + dt.timedelta(seconds=30)
+
+    assert 28 <= RetryPolicy.parse_retry_after(format_datetime(retry_at, usegmt=True)) <= 30
+    assert RetryPolicy.parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+
+
+def test_backoff_honours_retry_after_and_otherwise_jitters_below_the_cap():
+    policy = RetryPolicy(backoff_factor=0.5, max_backoff=3.0)
+
+    assert policy.get_backoff(0, retry_after='2') == 2.0
+    for attempt in range(8):
+        assert 0.0 <= policy.get_backoff(attempt) <= min(3.0, 0.5 * 2 ** attempt)
+    assert policy.get_stats() == {'retries': 9}
+
+
+def test_backoff_caps_a_long_or_unusable_retry_after():
+    policy = RetryPolicy(backoff_factor=0.5, max_backoff=3.0)
+
+    assert policy.get_backoff(0, retry_after='86400') == 3.0
+    far_future = dt.datetime.now(dt.timezone.utc) + dt.timedelta(days=1)
+    assert policy.get_backoff(0, retry_after=format_datetime(far_future, usegmt=True)) == 3.0
+    # A non-finite Retry-After is ignored in favour of the jittered delay, which time.sleep accepts
+    assert 0.0 <= policy.get_backoff(1, retry_after='inf') <= 1.0
+
+
+def test_only_retryable_statuses_are_retried_up_to_the_limit():
+    policy = RetryPolicy(max_retries=2)
+
+    assert policy.should_retry(503, 0) and policy.should_retry(429, 1)
+    assert not policy.should_retry(429, 2)
+    assert not policy.should_retry(404, 0)
+    assert policy.is_throttle(429) and policy.is_throttle(503) and not policy.is_throttle(500)
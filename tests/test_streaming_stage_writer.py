@@ -0,0 +1,64 @@
+import io
+import os
+import pandas as pd
+import pytest
+from data_processor.data_processor import DataProcessor, LocalStageOrchestrator, StreamingStageWriter
+
+RESPONSES = [
+    {'data': [
+        {'plaza_unid': 'a', 'code': '0012', 'count': '5', 'ratio': '1e5', 'note': 'NaN', 'in_count': 3, 'is_open': True},
+        {'plaza_unid': 'b', 'code': '0100', 'count': '7', 'ratio': '2.5', 'note': 'shut', 'in_count': None, 'is_open': False},
+    ]},
+    {'data': [
+        {'plaza_unid': 'c', 'code': '0003', 'count': None, 'ratio': '0', 'note': None, 'in_count': 8, 'is_open': None},
+    ]},
+]
+
+# Columns each exercising one way pd.read_csv types the text of the intermediate file
+BATCH = pd.DataFrame({
+    'ints': [1, 2, 3], 'floats': [1.5, None, 2.0], 'bools': [True, False, True], 'bools_with_nulls': [True, None, False],
+    'numeric_text': ['0012', '0100', '3'], 'float_text': ['1e5', '2.5', None], 'null_markers': ['NaN', 'x', ''],
+    'nulls': [None, None, None], 'mixed': [1, 'a', 2.5], 'nested': [{'k': 1}, [1, 2], None],
+    'boolean_text': ['True', 'false', 'TRUE'], 'boolean_text_with_nulls': ['True', None, 'False'],
+    'text': ['a "q"', 'b\nc', 'null'], 'empty_text': ['', '', ''],
+}, index=[5, 7, 9])
+
+
+def stage_both(tmp_path, file_format):
+    df = DataProcessor().list_json_to_dataframe(RESPONSES, key='data')
+
+    extracted = tmp_path / 'extracted'
+    file_stage = tmp_path / 'file_stage'
+    stream_stage = tmp_path / 'stream_stage'
+    for directory in (extracted, file_stage, stream_stage):
+        directory.mkdir()
+
+    df.to_csv(extracted / 'batch.csv')
+    file_ddl = LocalStageOrchestrator(str(file_stage), file_format=file_format).process_flat_files(str(extracted))
+
+    writer = StreamingStageWriter(LocalStageOrchestrator(str(stream_stage), file_format=file_format), str(stream_stage))
+    assert writer.write_batch(df, 'batch.csv')
+    return file_ddl, writer.generate_col_definitions(), file_stage, stream_stage
+
+
+@pytest.mark.parametrize('file_format', ['csv', 'parquet'])
+def test_streaming_and_file_paths_create_the_same_table(tmp_path, file_format):
+    file_ddl, stream_ddl, _, _ = stage_both(tmp_path, file_format)
+
+    assert stream_ddl == file_ddl
+    assert '"code" NUMBER' in file_ddl
+    assert '"ratio" FLOAT' in file_ddl
+
+
+def test_streaming_and_file_paths_stage_the_same_csv(tmp_path):
+    _, _, file_stage, stream_stage = stage_both(tmp_path, 'csv')
+
+    with open(os.path.join(file_stage, 'batch.csv'), 'rb') as file_staged, open(os.path.join(stream_stage, 'batch.csv'), 'rb') as stream_staged:
+        assert stream_staged.read() == file_staged.read()
+
+
+@pytest.mark.parametrize('batch', [BATCH, BATCH.iloc[:0]], ids=['rows', 'empty'])
+def test_batches_are_typed_as_read_back_from_the_intermediate_csv(batch):
+    read_back = pd.read_csv(io.StringIO(batch.reset_index(drop=True).to_csv()))
+
+    pd.testing.assert_frame_equal(StreamingStageWriter.type_like_csv(batch), read_back)
@@ -0,0 +1,124 @@
+import os
+import stat
+import time
+import threading
+import pytest
+from api import token_provider
+from api.token_provider import TokenProvider
+from api.api_handler import APIHandler
+from api.async_api_handler import SyncAPIHandlerFacade
+from benchmarks.mock_xpand_api import MockXpandAPI
+
+
+class FakeLogin:
+    def __init__(self, expires_in=None, delay=0.0):
+        self.expires_in = expires_in
+        self.delay = delay
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        time.sleep(self.delay)
+        with self.lock:
+            self.calls += 1
+            return f'token-{self.calls}', self.expires_in
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(token_provider.time, 'time', lambda: now[0])
+    return now
+
+
+def test_token_is_replaced_refresh_margin_seconds_before_it_expires(clock):
+    login = FakeLogin(expires_in=100)
+    provider = TokenProvider(login, refresh_margin=10)
+
+    assert provider.get_token() == 'token-1'
+    clock[0] += 89
+    assert provider.get_token() == 'token-1'
+    clock[0] += 2
+    assert provider.current_token() is None
+    assert provider.get_token() == 'token-2'
+    assert login.calls == 2
+
+
+def test_ttl_applies_when_the_login_does_not_tell_the_lifetime(clock):
+    provider = TokenProvider(FakeLogin(), ttl=600, refresh_margin=60)
+
+    provider.get_token()
+    clock[0] += 539
+    assert provider.current_token() == 'token-1'
+    clock[0] += 2
+    assert provider.current_token() is None
+
+
+def test_token_is_shared_through_its_file_within_its_scope(tmp_path, clock):
+    path = str(tmp_path / 'cache' / 'token.json')
+    login = FakeLogin(expires_in=3600)
+
+    assert TokenProvider(login, path=path, scope='https://a').get_token() == 'token-1'
+    second_run = TokenProvider(login, path=path, scope='https://a')
+    assert second_run.get_token() == 'token-1'
+    assert second_run.get_stats() == {'logins': 0, 'token_reuses': 1, 'token_rejections': 0}
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+    assert TokenProvider(login, path=path, scope='https://b').get_token() == 'token-2'
+
+
+def test_invalidate_only_drops_the_rejected_token(tmp_path, clock):
+    path = str(tmp_path / 'token.json')
+    provider = TokenProvider(FakeLogin(expires_in=3600), path=path)
+
+    provider.invalidate(provider.get_token())
+    assert provider.current_token() is None and not os.path.exists(path)
+    assert provider.get_token() == 'token-2'
+
+    provider.invalidate('token-1')
+    assert provider.current_token() == 'token-2' and os.path.exists(path)
+
+
+@pytest.mark.skipif(token_provider.fcntl is None, reason="The token file is only locked where fcntl is available")
+def test_processes_sharing_the_token_file_log_in_once(tmp_path):
+    path = str(tmp_path / 'token.json')
+    login = FakeLogin(expires_in=3600, delay=0.05)
+    # One provider per caller, as separate processes have; only the file lock serializes them
+    providers = [TokenProvider(login, path=path) for _ in range(8)]
+    tokens = []
+
+    threads = [threading.Thread(target=lambda provider=provider: tokens.append(provider.get_token())) for provider in providers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert login.calls == 1
+    assert tokens == ['token-1'] * 8
+
+
+@pytest.fixture
+def api():
+    api = MockXpandAPI(stores=2, token_lifetime=0.2).start()
+    yield api
+    api.stop()
+
+
+@pytest.mark.parametrize('handler_class', [APIHandler, SyncAPIHandlerFacade])
+def test_request_rejected_with_401_logs_in_again_and_is_retried_once(api, handler_class):
+    provider = TokenProvider(lambda: (api.issue_token(), None), refresh_margin=0)
+    handler = handler_class(api.url, token_provider=provider)
+    try:
+        assert len(handler.make_request('api/plazaInfo')['data']) == 2
+        time.sleep(0.3)
+        assert len(handler.make_request('api/plazaInfo')['data']) == 2
+        assert api.logins == 2
+
+        # A token rejected right away is not retried a second time
+        api.token_lifetime = 0
+        assert handler.make_request('api/plazaInfo') is None
+        assert api.logins == 3
+        assert provider.get_stats()['token_rejections'] == 2
+    finally:
+        if hasattr(handler, 'close'):
+            handler.close()
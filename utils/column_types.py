@@ -0,0 +1,54 @@
+# utils/column_types.py
+import re
+from typing import Dict, Iterable, Tuple
+
+# Snowflake column types of staged files and table schemas, kept as ordered {column: type} mappings.
+# Shared by the staging in data_processor and the schema registry of the loader.
+
+# INFORMATION_SCHEMA.COLUMNS.DATA_TYPE values and the types generated for staged files
+TYPE_ALIASES = {
+    'FIXED': 'NUMBER', 'DECIMAL': 'NUMBER', 'NUMERIC': 'NUMBER', 'INT': 'NUMBER', 'INTEGER': 'NUMBER',
+    'REAL': 'FLOAT', 'DOUBLE': 'FLOAT',
+    'VARCHAR': 'TEXT', 'STRING': 'TEXT',
+    'TIMESTAMP_NTZ': 'TIMESTAMP',
+}
+COL_DEFINITION_PATTERN = re.compile(r'"((?:[^"]|"")+)"\s+(\w+)')
+
+
+def normalize_type(sf_type: str) -> str:
+    """Reduce a Snowflake type name to the generic type used for comparisons."""
+    sf_type = sf_type.upper().split('(')[0].strip()
+    return TYPE_ALIASES.get(sf_type, sf_type)
+
+
+def widen_type(current: str, new: str) -> str:
+    """Widen two Snowflake types to one that can hold both."""
+    current, new = normalize_type(current), normalize_type(new)
+    if current == new:
+        return current
+    if {current, new} == {'NUMBER', 'FLOAT'}:
+        return 'FLOAT'
+    return 'TEXT'
+
+
+def merge_columns(columns: Dict[str, str], new_columns: Iterable[Tuple[str, str]]) -> Dict[str, str]:
+    """
+    Merge (column, type) pairs into an ordered column mapping in place and return it.
+    Unknown columns are appended in the order they are first seen; known columns are widened.
+    """
+    for column, sf_type in new_columns:
+        columns[column] = widen_type(columns[column], sf_type) if column in columns else normalize_type(sf_type)
+    return columns
+
+
+def parse_col_definitions(col_def_str: str) -> Dict[str, str]:
+    """Parse a '"col" TYPE, ...' definition string into an ordered column mapping."""
+    return {
+        column.replace('""', '"'): normalize_type(sf_type)
+        for column, sf_type in COL_DEFINITION_PATTERN.findall(col_def_str)
+    }
+
+
+def format_col_definitions(columns: Dict[str, str]) -> str:
+    """Format an ordered column mapping as a '"col" TYPE, ...' definition string."""
+    return ', '.join(f'"{column}" {sf_type}' for column, sf_type in columns.items())
@@ -0,0 +1,109 @@
+# utils/dag.py
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from .logger import setup_logging
+
+logger = setup_logging(__name__)
+
+class TaskGraph:
+    """
+    Dependency graph of callables, run with every task starting as soon as the tasks it depends on
+    have succeeded, so independent branches run side by side and the whole graph finishes in the
+    time of its critical path.
+
+    A failing task does not stop the graph: the tasks depending on it are skipped, every other
+    branch runs to completion, and the outcome of each task is reported.
+    """
+    def __init__(self):
+        self.tasks = {}
+
+    def add(self, name, function, depends_on=()):
+        """
+        Add a task.
+
+        :param name: str - Unique name of the task.
+        :param function: callable - Called without arguments; its return value is kept as the task's result.
+        :param depends_on: iterable - Names of the tasks that must succeed before this one starts.
+        """
+        if name in self.tasks:
+            raise ValueError(f"A task named '{name}' is already in the graph")
+        self.tasks[name] = {'function': function, 'depends_on': tuple(depends_on)}
+
+    def order(self):
+        """
+        :return: list - The task names in a dependency respecting order.
+        :raises ValueError: If a task depends on an unknown task or the dependencies form a cycle.
+        """
+        for name, task in self.tasks.items():
+            unknown = [dependency for dependency in task['depends_on'] if dependency not in self.tasks]
+            if unknown:
+                raise ValueError(f"Task '{name}' depends on unknown tasks: {', '.join(unknown)}")
+        ordered = []
+        visiting, visited = set(), set()
+
+        def visit(name, path):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Tasks form a cycle: {' -> '.join(path + [name])}")
+            visiting.add(name)
+            for dependency in self.tasks[name]['depends_on']:
+                visit(dependency, path + [name])
+            visiting.discard(name)
+            visited.add(name)
+            ordered.append(name)
+
+        for name in self.tasks:
+            visit(name, [])
+        return ordered
+
+    def run(self, max_parallel=4):
+        """
+        Run every task of the graph.
+
+        :param max_parallel: int - Maximum number of tasks running at the same time. 1 runs them one after another.
+        :return: dict - {name: {'status': 'succeeded', 'failed' or 'skipped', 'result': ..., 'error': ..., 'seconds': ...}}
+            in dependency order.
+        """
+        order = self.order()
+        outcomes = {}
+        running = {}
+
+        def execute(name):
+            start = time.monotonic()
+            try:
+                outcome = {'status': 'succeeded', 'result': self.tasks[name]['function'](), 'error': None}
+            except Exception as e:
+                logger.error(f"Task {name} failed: {e}", exc_info=True)
+                outcome = {'status': 'failed', 'result': None, 'error': str(e)}
+            outcome['seconds'] = round(time.monotonic() - start, 3)
+            return outcome
+
+        def ready():
+            # One pass in dependency order settles every task: a task behind a failure is skipped
+            # before its own dependents are looked at, so they are skipped in the same pass
+            runnable = []
+            for name in order:
+                if name in outcomes or name in running:
+                    continue
+                depends_on = self.tasks[name]['depends_on']
+                if any(dependency not in outcomes for dependency in depends_on):
+                    continue
+                failed = [dependency for dependency in depends_on if outcomes[dependency]['status'] != 'succeeded']
+                if failed:
+                    logger.warning(f"Skipping task {name} because {', '.join(failed)} did not succeed")
+                    outcomes[name] = {'status': 'skipped', 'result': None, 'error': f"Skipped after {', '.join(failed)}", 'seconds': 0.0}
+                else:
+                    runnable.append(name)
+            return runnable
+
+        with ThreadPoolExecutor(max_workers=max(1, max_parallel), thread_name_prefix='task') as executor:
+            while len(outcomes) < len(order):
+                for name in ready():
+                    running[name] = executor.submit(execute, name)
+                if not running:
+                    break
+                done, _ = wait(running.values(), return_when=FIRST_COMPLETED)
+                for name in [name for name, future in running.items() if future in done]:
+                    outcomes[name] = running.pop(name).result()
+        return {name: outcomes[name] for name in order}
@@ -0,0 +1,248 @@
+# utils/metrics.py
+import os
+import json
+import time
+import bisect
+import threading
+import datetime as dt
+from contextlib import contextmanager
+from .logger import setup_logging
+
+logger = setup_logging(__name__)
+
+class RunMetrics:
+    """
+    Thread-safe collector of the counters, gauges and latency histograms of one connector run.
+
+    Components receive the collector as an optional dependency and record into it while the
+    run progresses; at the end the run is exported as a JSON summary and as a Prometheus
+    textfile for node_exporter's textfile collector. Every series carries a `job` label.
+
+    Sent to a worker process (e.g. as part of an object handed to a process pool), the
+    collector arrives empty and detached; only the parent's records are exported.
+    """
+    default_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+    descriptions = {
+        'api_requests_total': 'API requests by endpoint and outcome.',
+        'api_request_seconds': 'Latency of API requests, including retries and rate limit waits.',
+        'api_response_bytes_total': 'Bytes of API response bodies received.',
+        'api_cache_hits_total': 'API requests answered from the response cache.',
+        'records_extracted_total': 'Records extracted from the API per dataset.',
+        'dataframe_rows_total': 'Rows built into DataFrames from API responses.',
+        'stage_seconds_total': 'Wall time spent per pipeline stage.',
+        'files_staged_total': 'Files written to the local Snowflake stage.',
+        'rows_staged_total': 'Rows written to the local Snowflake stage.',
+        'bytes_staged_total': 'Bytes written to the local Snowflake stage.',
+        'snowflake_queries_total': 'Snowflake statements by statement type.',
+        'snowflake_query_seconds': 'Elapsed time of Snowflake statements.',
+        'rows_loaded_total': 'Rows loaded into Snowflake tables.',
+        'table_load_seconds': 'Time the last load of a table took.',
+        'table_load_success': '1 if the last load of a table succeeded, 0 if it failed.',
+        'pipeline_batches_total': 'Micro-batches loaded while the extraction went on.',
+        'pipeline_blocked_seconds_total': 'Seconds the extraction waited for the pipelined loads to catch up.',
+        'snapshots_unchanged_total': 'Snapshots skipped because their content matched the last load.',
+        'api_retries': 'Retried API requests.',
+        'api_throttle_waits': 'API requests delayed by the rate limiter.',
+        'api_throttle_wait_seconds': 'Seconds API requests were delayed by the rate limiter.',
+        'api_throttle_events': 'Responses signalling the API throttled the run.',
+        'api_cache_hits': 'API requests answered from the response cache.',
+        'api_cache_misses': 'API requests that missed the response cache.',
+        'run_start_timestamp_seconds': 'Unix time the run started.',
+        'run_duration_seconds': 'Wall time of the run.',
+        'run_success': '1 if the run completed, 0 if it failed.',
+    }
+
+    def __init__(self, job, buckets=default_buckets, prefix='ingestion'):
+        """
+        :param job: str - Name of the connector, recorded as the `job` label.
+        :param buckets: tuple - Upper bounds in seconds of the latency histogram buckets.
+        :param prefix: str - Prefix of the exported Prometheus metric names.
+        """
+        self.job = job
+        self.buckets = tuple(sorted(buckets))
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.queries = []
+
+    def reset(self):
+        """
+        Forget everything recorded and restart the run clock, e.g. before the next run of a scheduled connector.
+        """
+        with self.lock:
+            self.started_at = time.time()
+            self.counters = {}
+            self.gauges = {}
+            self.histograms = {}
+            self.queries = []
+
+    def __getstate__(self):
+        return {'job': self.job, 'buckets': self.buckets, 'prefix': self.prefix}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items() if value is not None))
+
+    def inc(self, name, value=1, **labels):
+        """
+        Add to a counter.
+        """
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        """
+        Set a gauge.
+        """
+        with self.lock:
+            self.gauges[self._key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        """
+        Record an observation, e.g. a latency in seconds, into a histogram.
+        """
+        key = self._key(name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {'buckets': [0] * len(self.buckets), 'count': 0, 'sum': 0.0, 'max': 0.0}
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                histogram['buckets'][index] += 1
+            histogram['count'] += 1
+            histogram['sum'] += value
+            histogram['max'] = max(histogram['max'], value)
+
+    @contextmanager
+    def stage(self, stage, **labels):
+        """
+        Add the wall time of the block to `stage_seconds_total` for the given stage.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.inc('stage_seconds_total', time.perf_counter() - start, stage=stage, **labels)
+
+    def record_query(self, query_id, statement, seconds, table=None, rows=None):
+        """
+        Record a Snowflake statement: its type and elapsed time go into the aggregated series,
+        the query ID is kept for the JSON summary so slow statements can be looked up in QUERY_HISTORY.
+        """
+        self.inc('snowflake_queries_total', statement=statement)
+        self.observe('snowflake_query_seconds', seconds, statement=statement)
+        with self.lock:
+            self.queries.append({
+                'query_id': query_id, 'statement': statement, 'table': table,
+                'seconds': round(seconds, 4), 'rows': rows,
+            })
+
+    def summary(self):
+        """
+        :return: dict - The run as a JSON serializable summary.
+        """
+        def series(values):
+            grouped = {}
+            for (name, labels), value in sorted(values.items()):
+                grouped.setdefault(name, []).append({'labels': dict(labels), 'value': value})
+            return grouped
+
+        with self.lock:
+            histograms = {}
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                histograms.setdefault(name, []).append({
+                    'labels': dict(labels),
+                    'count': histogram['count'],
+                    'sum': round(histogram['sum'], 6),
+                    'mean': round(histogram['sum'] / histogram['count'], 6) if histogram['count'] else None,
+                    'max': round(histogram['max'], 6),
+                    'buckets': dict(zip(map(str, self.buckets), histogram['buckets'])),
+                })
+            return {
+                'job': self.job,
+                'started_at': dt.datetime.fromtimestamp(self.started_at).isoformat(),
+                'counters': series(self.counters),
+                'gauges': series(self.gauges),
+                'histograms': histograms,
+                'queries': list(self.queries),
+            }
+
+    def to_prometheus(self):
+        """
+        :return: str - The run in the Prometheus text exposition format.
+        """
+        def escape(value):
+            return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+        def number(value):
+            return str(value) if isinstance(value, int) else repr(float(value))
+
+        def label_string(labels, **extra):
+            pairs = [('job', self.job), *labels, *extra.items()]
+            return '{' + ','.join(f'{key}="{escape(value)}"' for key, value in pairs) + '}'
+
+        lines = []
+        described = set()
+
+        def describe(name, metric_type):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {self.prefix}_{name} {self.descriptions.get(name, name)}")
+                lines.append(f"# TYPE {self.prefix}_{name} {metric_type}")
+
+        with self.lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                describe(name, 'counter')
+                lines.append(f"{self.prefix}_{name}{label_string(labels)} {number(value)}")
+            for (name, labels), value in sorted(self.gauges.items()):
+                describe(name, 'gauge')
+                lines.append(f"{self.prefix}_{name}{label_string(labels)} {number(value)}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                describe(name, 'histogram')
+                cumulative = 0
+                for bound, count in zip(self.buckets, histogram['buckets']):
+                    cumulative += count
+                    lines.append(f"{self.prefix}_{name}_bucket{label_string(labels, le=f'{bound:g}')} {cumulative}")
+                lines.append(f"{self.prefix}_{name}_bucket{label_string(labels, le='+Inf')} {histogram['count']}")
+                lines.append(f"{self.prefix}_{name}_sum{label_string(labels)} {number(histogram['sum'])}")
+                lines.append(f"{self.prefix}_{name}_count{label_string(labels)} {histogram['count']}")
+        return '\n'.join(lines) + '\n'
+
+    def finish(self, success=True):
+        """
+        Record the run's start time, duration and outcome.
+        """
+        self.set('run_start_timestamp_seconds', self.started_at)
+        self.set('run_duration_seconds', time.time() - self.started_at)
+        self.set('run_success', 1 if success else 0)
+
+    @staticmethod
+    def _write_atomic(path, content):
+        # Write to a temporary file and swap it in, so readers such as node_exporter never see a partial file
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as file:
+            file.write(content)
+        os.replace(tmp_path, path)
+
+    def write(self, json_path=None, prometheus_path=None):
+        """
+        Export the run as a JSON summary and/or a Prometheus textfile.
+
+        :param json_path: str - Path of the JSON summary (optional).
+        :param prometheus_path: str - Path of the Prometheus textfile, conventionally ending in .prom (optional).
+        """
+        if json_path:
+            self._write_atomic(json_path, json.dumps(self.summary(), indent=4))
+        if prometheus_path:
+            self._write_atomic(prometheus_path, self.to_prometheus())
+        logger.info(f"Run metrics written to {', '.join(path for path in (json_path, prometheus_path) if path)}")
@@ -0,0 +1,107 @@
+# utils/pipeline.py
+import time
+import queue
+import threading
+from .logger import setup_logging
+
+logger = setup_logging(__name__)
+
+class BatchPipeline:
+    """
+    Bounded producer/consumer queue with one consumer thread handling the items in micro-batches.
+
+    The producer keeps working while the consumer handles earlier items; once `max_pending` items
+    are waiting, put() blocks so a slow consumer holds the producer back instead of letting the
+    backlog grow in memory. The consumer takes every item already waiting, up to `max_batch`, as one batch.
+
+    If the consumer fails, the items still arriving are discarded and the next put() raises the
+    failure, so the producer stops early. Used as a context manager, the pipeline is started on
+    entry and drained on exit.
+    """
+    _closed = object()
+
+    def __init__(self, consume, max_pending=4, max_batch=4, name='pipeline'):
+        """
+        :param consume: callable - Called on the consumer thread with a list of up to `max_batch` items.
+        :param max_pending: int - Items waiting in the queue before put() blocks.
+        :param max_batch: int - Most items handed to one call of `consume`.
+        :param name: str - Name of the consumer thread, used in logs.
+        """
+        self.consume = consume
+        self.max_batch = max(1, max_batch)
+        self.name = name
+        self.queue = queue.Queue(maxsize=max(1, max_pending))
+        self.thread = None
+        self.error = None
+
+        # Counters
+        self.items = 0
+        self.batches = 0
+        self.blocked_seconds = 0.0
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name=self.name, daemon=True)
+        self.thread.start()
+        return self
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            while batch[-1] is not self._closed and len(batch) < self.max_batch:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            closed = batch[-1] is self._closed
+            items = batch[:-1] if closed else batch
+            if items and self.error is None:
+                try:
+                    self.consume(items)
+                    self.items += len(items)
+                    self.batches += 1
+                except Exception as e:
+                    logger.error(f"{self.name} failed: {e}", exc_info=True)
+                    self.error = e
+            if closed:
+                return
+
+    def put(self, item):
+        """
+        Hand an item to the consumer, waiting while `max_pending` items are queued.
+
+        :raises RuntimeError: If the consumer has failed.
+        """
+        if self.error is not None:
+            raise RuntimeError(f"{self.name} failed: {self.error}") from self.error
+        start = time.perf_counter()
+        self.queue.put(item)
+        self.blocked_seconds += time.perf_counter() - start
+
+    def close(self):
+        """
+        Wait for the consumer to handle every queued item and stop it.
+
+        :raises RuntimeError: If the consumer failed.
+        """
+        if self.thread is not None:
+            self.queue.put(self._closed)
+            self.thread.join()
+            self.thread = None
+        if self.error is not None:
+            raise RuntimeError(f"{self.name} failed: {self.error}") from self.error
+
+    def get_stats(self):
+        return {'items': self.items, 'batches': self.batches, 'blocked_seconds': round(self.blocked_seconds, 3)}
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # Drain without masking the producer's own exception
+            try:
+                self.close()
+            except RuntimeError:
+                pass
@@ -1,4 +1,6 @@
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from .logger import setup_logging
 
 # Initializing helper classes and functions
@@ -38,14 +40,71 @@ def has_csv_files(folder_path):
         """
         Check if the given folder contains any CSV files
         """
+        return has_files(folder_path, extension='.csv')
+
+def has_files(folder_path, extension):
+        """
+        Check if the given folder contains any files with the given extension
+        """
         for file_name in os.listdir(folder_path):
             file_path = os.path.join(folder_path, file_name)
-            # Check if the file is a CSV file
-            if file_name.endswith('.csv') and os.path.isfile(file_path):
+            # Check if the file has the requested extension
+            if file_name.endswith(extension) and os.path.isfile(file_path):
                 return True
 
-        # No CSV files were found
+        # No matching files were found
         return False
 
 def py_file_name():
-    return os.path.basename(__file__).replace('.py','')
\ No newline at end of file
+    return os.path.basename(__file__).replace('.py','')
+
+
+def fan_out(function, items, max_workers=1):
+    """
+    Apply a function to every item, optionally over a bounded thread pool.
+
+    Results are returned in the same order as the input items regardless of
+    completion order, so downstream concatenation stays deterministic.
+
+    :param function: callable - The function to call with each item.
+    :param items: iterable - The items to process.
+    :param max_workers: int - Maximum number of calls in flight. 1 runs serially.
+    :return: list - The results, in input order.
+    """
+    items = list(items)
+    if not max_workers or max_workers <= 1 or len(items) <= 1:
+        return [function(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        return list(executor.map(function, items))
+
+
+class lazy_property:
+    """
+    Attribute built by the decorated method on first access and then kept on the instance, like
+    functools.cached_property but safe under threads: concurrent first accesses build it only once.
+    Later accesses read the instance attribute directly and never take the lock.
+    """
+    def __init__(self, function):
+        self.function = function
+        self.name = function.__name__
+        self.__doc__ = function.__doc__
+        self.lock = threading.RLock()
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        with self.lock:
+            if self.name not in instance.__dict__:
+                instance.__dict__[self.name] = self.function(instance)
+            return instance.__dict__[self.name]
+
+    @staticmethod
+    def is_built(instance, name):
+        """
+        :return: bool - Whether the lazy attribute `name` of the instance has been built yet.
+        """
+        return name in instance.__dict__